@@ -1,49 +1,217 @@
 """
 Life Restart Simulator - CLI (ASCII-only, English-only)
 Usage:
-    python3 life_restart.py
+    python3 life_restart.py [seed]
+    python3 life_restart.py --lives 100000 --workers 8 --seed 1   (headless batch)
+    python3 life_restart.py --lives 1000000 --stats cells.json    (per-cell streaming statistics)
+    python3 life_restart.py --seed 1 --life 7342119               (narrate one life of a batch run)
+    python3 life_restart.py --lives 100000 --history hist/ --seed 1   (columnar per-chapter store)
+    python3 life_restart.py --query hist/ --where era==habsburg --where "age<30" --where ending~bankruptcy
+                            --after "template~bold gambit"        (query it)
+    python3 life_restart.py --sweep grid.json --sweep-cache sw.db --seed 1   (parameter sweep)
+    python3 life_restart.py --tournament --lives 5000 --workers 8 (rank the built-in agents)
+    python3 life_restart.py --rare "Virtue perfected" --lives 1000 --era tang   (rare-ending estimate)
+    python3 life_restart.py --solve tang.pol --era tang           (solve an approximate policy table)
+    python3 life_restart.py --hints tang.pol [seed]               (play with hints)
+    python3 life_restart.py --record bug.rpl [seed]               (append the session to a replay file)
+    python3 life_restart.py --replay bug.rpl                      (re-run recorded lives, no prompts)
+    python3 life_restart.py --bench --baseline bench.json         (hot-path benchmarks)
+    python3 life_restart.py --profile-out play.folded [seed]      (per-phase profile of a session)
+    python3 life_restart.py --serve --port 9001                   (asyncio multi-session TCP server)
+    python3 life_restart.py --users users.db [seed]               (keep accounts between runs)
+    python3 life_restart.py --users u.db --saves s.db [seed]      (resume a life left mid-game)
+    python3 life_restart.py --leaderboard lb.db [seed]            (rank each finished life)
+    python3 life_restart.py --leaderboard lb.db --top 10 --era tang   (best recorded lives)
+    python3 life_restart.py --pack norse.json [seed]              (add eras from a content pack; any mode)
 """
 
+import argparse
+import asyncio
+import gc
+import hashlib
+import hmac
+import json
+import marshal
+import mmap
+import os
 import random
+import sqlite3
+import struct
 import sys
-from dataclasses import dataclass, asdict
-from typing import Dict, List, Tuple, Optional, Set
+import threading
+import time
+import tracemalloc
+import zlib
+from array import array
+from bisect import insort
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, asdict, field
+from fractions import Fraction
+from itertools import product
+from math import ceil, comb, exp, gcd, log
+from types import MappingProxyType
+from typing import AbstractSet, Callable, Dict, FrozenSet, List, Tuple, Optional, Set
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11: JSON content packs only
+    tomllib = None
+
+try:
+    import numpy as np
+except ImportError:  # only the batch kernel needs NumPy; the CLI game runs without it
+    np = None
 
 # ------------- Auth (Register/Login) -------------
 
-def auth_flow() -> Tuple[str, str]:
-    """Force user to register first, then return to login page to login."""
-    print("=== Life Restart Simulator (Login Required) ===")
-    user_db = {}
+class UserStore:
+    """
+    Accounts in SQLite with salted scrypt hashes. Hashing is slow on purpose,
+    so register()/verify() are meant to run on self.pool (the session flow
+    yields Blocking for them). Each pool thread keeps one connection, and the
+    SQL is constant, so sqlite3's per-connection statement cache keeps the
+    lookups prepared. Verified logins are remembered as a keyed HMAC of the
+    password (per-process secret, TTL, LRU-bounded), which lets reconnect
+    storms skip the slow hash. path=None keeps the accounts in memory.
+    """
+
+    SCHEMA = "CREATE TABLE IF NOT EXISTS users (name TEXT PRIMARY KEY, kdf TEXT NOT NULL, salt BLOB NOT NULL, hash BLOB NOT NULL)"
+    LOOKUP = "SELECT kdf, salt, hash FROM users WHERE name = ?"
+    INSERT = "INSERT OR IGNORE INTO users (name, kdf, salt, hash) VALUES (?, ?, ?, ?)"
+
+    def __init__(self, path: Optional[str] = None, scrypt_n: int = 1 << 14, workers: Optional[int] = None,
+                 cache_size: int = 10000, cache_ttl: float = 900.0):
+        self.memory = path is None
+        # a shared-cache memory DB lets every thread's connection see the same tables
+        self.target = "file:users-{0:x}?mode=memory&cache=shared".format(id(self)) if self.memory else path
+        self.kdf = "scrypt:{0}:8:1".format(scrypt_n)
+        # two threads beyond the cores, so quick store calls never queue behind the hashes
+        self.pool = ThreadPoolExecutor(max_workers=workers or (os.cpu_count() or 2) + 2, thread_name_prefix="auth")
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._cache: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._secret = os.urandom(32)
+        self._dummy_salt = os.urandom(16)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._conns: List[sqlite3.Connection] = []
+        self._conn().execute(self.SCHEMA)     # this connection also keeps a memory DB alive
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.target, uri=self.memory, timeout=30.0,
+                                   isolation_level=None, check_same_thread=False)
+            if not self.memory:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._conns.append(conn)
+        return conn
+
+    @staticmethod
+    def _hash(password: str, salt: bytes, kdf: str) -> bytes:
+        _name, n, r, p = kdf.split(":")
+        return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=int(n), r=int(r), p=int(p),
+                              maxmem=256 * int(n) * int(r), dklen=32)
+
+    def _tag(self, name: str, password: str) -> bytes:
+        return hmac.new(self._secret, (name + "\0" + password).encode("utf-8"), hashlib.sha256).digest()
+
+    def _remember(self, name: str, password: str):
+        with self._lock:
+            self._cache[name] = (self._tag(name, password), time.monotonic() + self.cache_ttl)
+            self._cache.move_to_end(name)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _cached(self, name: str, password: str) -> bool:
+        tag = self._tag(name, password)
+        with self._lock:
+            hit = self._cache.get(name)
+            if hit is None or hit[1] <= time.monotonic() or not hmac.compare_digest(hit[0], tag):
+                return False
+            self._cache.move_to_end(name)     # least recently *used* goes first, not least recently hashed
+        return True
+
+    def exists(self, name: str) -> bool:
+        return self._conn().execute(self.LOOKUP, (name,)).fetchone() is not None
+
+    def register(self, name: str, password: str) -> bool:
+        """Create the account; False if the name is taken. Blocking (slow hash)."""
+        if self.exists(name):
+            return False
+        salt = os.urandom(16)
+        cur = self._conn().execute(self.INSERT, (name, self.kdf, salt, self._hash(password, salt, self.kdf)))
+        if cur.rowcount != 1:        # lost a race with another registration
+            return False
+        self._remember(name, password)
+        return True
+
+    def verify(self, name: str, password: str) -> bool:
+        """Check a login. Blocking (slow hash) unless recently verified."""
+        if self._cached(name, password):
+            return True
+        row = self._conn().execute(self.LOOKUP, (name,)).fetchone()
+        if row is None:
+            self._hash(password, self._dummy_salt, self.kdf)     # same cost whether or not the user exists
+            return False
+        kdf, salt, digest = row
+        if not hmac.compare_digest(self._hash(password, salt, kdf), digest):
+            return False
+        self._remember(name, password)
+        return True
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        with self._lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns = []
+
+def auth_flow(out: "TextOut", users: UserStore):
+    """
+    Force user to register first, then return to login page to login.
+    Generator (see GameSession): yields prompts and Blocking store calls,
+    returns (user, password) or None after too many failed attempts. A name
+    that already exists counts as registered if its password matches.
+    """
+    out.print("=== Life Restart Simulator (Login Required) ===")
     # Register
-    print("\n-- Register --")
+    out.print("\n-- Register --")
     while True:
-        u = input("Choose a username: ").strip()
-        p = input("Choose a password: ").strip()
+        u = (yield "Choose a username: ").strip()
+        p = (yield "Choose a password: ").strip()
         if not u or not p:
-            print("Username/password cannot be empty.")
+            out.print("Username/password cannot be empty.")
             continue
-        if u in user_db:
-            print("Username already exists.")
+        if not (yield Blocking(users.register, (u, p), slow=True)):
+            if (yield Blocking(users.verify, (u, p), slow=True)):
+                out.print("Welcome back, {0}.".format(u))
+                break
+            out.print("Username already exists.")
             continue
-        user_db[u] = p
-        print("Registration successful.")
+        out.print("Registration successful.")
         break
     # Back to login
-    print("\n-- Login --")
+    out.print("\n-- Login --")
     for _ in range(5):
-        u2 = input("Username: ").strip()
-        p2 = input("Password: ").strip()
-        if u2 in user_db and user_db[u2] == p2:
-            print("Login successful.\n")
+        u2 = (yield "Username: ").strip()
+        p2 = (yield "Password: ").strip()
+        if u2 and (yield Blocking(users.verify, (u2, p2), slow=True)):
+            out.print("Login successful.\n")
             return (u2, p2)
-        print("Invalid credentials, try again.")
-    print("Too many failed attempts. Exiting.")
-    raise SystemExit(1)
+        out.print("Invalid credentials, try again.")
+    out.print("Too many failed attempts. Exiting.")
+    return None
 
 # ------------- Data Models -------------
 
-@dataclass
+STAT_FIELDS = frozenset(("health", "wealth", "knowledge", "karma", "charisma"))
+
+@dataclass(slots=True)
 class Stats:
     health: int     # 0..100
     wealth: int     # 0..100
@@ -52,41 +220,111 @@ class Stats:
     charisma: int   # 0..100
 
     def clamp(self) -> "Stats":
-        def c(v, lo, hi):
-            return max(lo, min(hi, v))
-        return Stats(
-            health=c(self.health, 0, 100),
-            wealth=c(self.wealth, 0, 100),
-            knowledge=c(self.knowledge, 0, 100),
-            karma=c(self.karma, 0, 100),
-            charisma=c(self.charisma, 0, 100),
-        )
+        return self.copy().clamp_inplace()
+
+    def clamp_inplace(self) -> "Stats":
+        self.health = 0 if self.health < 0 else (100 if self.health > 100 else self.health)
+        self.wealth = 0 if self.wealth < 0 else (100 if self.wealth > 100 else self.wealth)
+        self.knowledge = 0 if self.knowledge < 0 else (100 if self.knowledge > 100 else self.knowledge)
+        self.karma = 0 if self.karma < 0 else (100 if self.karma > 100 else self.karma)
+        self.charisma = 0 if self.charisma < 0 else (100 if self.charisma > 100 else self.charisma)
+        return self
+
+    def copy(self) -> "Stats":
+        return Stats(self.health, self.wealth, self.knowledge, self.karma, self.charisma)
 
     def apply(self, delta: Dict[str, int]) -> "Stats":
-        d = asdict(self)
+        """New clamped Stats with delta added (a single allocation)."""
+        return self.copy().apply_inplace(delta)
+
+    def apply_inplace(self, delta: Dict[str, int]) -> "Stats":
+        """Add delta and clamp without allocating; only for Stats nobody else holds."""
         for k, v in (delta or {}).items():
-            if k in d:
-                d[k] += v
-        return Stats(**d).clamp()
+            if k in STAT_FIELDS:
+                setattr(self, k, getattr(self, k) + v)
+        return self.clamp_inplace()
 
     def pretty(self) -> str:
         return "H{h} W{w} K{k} Ka{ka} Ch{ch}".format(
             h=self.health, w=self.wealth, k=self.knowledge, ka=self.karma, ch=self.charisma
         )
 
-@dataclass
+@dataclass(slots=True)
 class Option:
+    """
+    Catalog options are flyweights: menu entries share the catalog's delta
+    dict and interned tag/require frozensets and only own their text.
+    Never mutate delta/tags_set/requires in place.
+    """
     text: str
     delta: Dict[str, int]
-    tags_set: Set[str]
-    requires: Set[str]
+    tags_set: AbstractSet[str]
+    requires: AbstractSet[str]
     risk_death: float
     swing_prob: float
     origin: str            # "base"/"dyn"/"milestone"
-    template_id: str
+    template_id: int       # stable_id() of a readable key, same in every process
+    weight: float = 1.0    # relative odds of reaching a menu (content packs); 1 everywhere else
+    tag_mask: int = 0      # tags_set / requires as TAG_BITS masks (set by the catalog)
+    req_mask: int = 0
+    bit: int = 0           # era-local template bit for used-template masks; 0 outside menu pools
+
+    def retitled(self, text: str) -> "Option":
+        return Option(text, self.delta, self.tags_set, self.requires, self.risk_death, self.swing_prob,
+                      self.origin, self.template_id, self.weight, self.tag_mask, self.req_mask, self.bit)
+
+# Per-life membership is kept in ints: flags as a mask over TAG_BITS, used
+# templates and triggers as masks over era-local indices (see OptionCatalog
+# and trigger_sampler). Tag bits are per process; era-local bits depend
+# only on the content, so snapshots can store them.
+TAG_BITS: Dict[str, int] = {}
+
+def tag_mask(tags: AbstractSet[str]) -> int:
+    mask = 0
+    for t in tags:
+        bit = TAG_BITS.get(t)
+        if bit is None:
+            bit = TAG_BITS[t] = 1 << len(TAG_BITS)
+        mask |= bit
+    return mask
+
+def tag_names(mask: int) -> Set[str]:
+    return {t for t, bit in TAG_BITS.items() if mask & bit}
+
+_INTERNED_TAGS: Dict[FrozenSet[str], FrozenSet[str]] = {}
+_INTERNED_DELTAS: Dict[Tuple[Tuple[str, int], ...], Dict[str, int]] = {}
+
+def intern_tags(tags: AbstractSet[str]) -> FrozenSet[str]:
+    key = frozenset(tags)
+    return _INTERNED_TAGS.setdefault(key, key)
+
+def intern_delta(delta: Dict[str, int]) -> Dict[str, int]:
+    """One shared dict per distinct delta; callers must treat it as read-only."""
+    key = tuple(sorted((k, v) for k, v in delta.items() if v))
+    return _INTERNED_DELTAS.setdefault(key, dict(key))
 
 # ------------- Content -------------
 
+class EraTable(dict):
+    """
+    Era-keyed content table. Eras from content packs are absent until first
+    looked up; the miss makes load_pack_era() fill every table for that era.
+    """
+
+    def __missing__(self, era):
+        if load_pack_era(era):
+            return dict.__getitem__(self, era)
+        raise KeyError(era)
+
+    def __contains__(self, era) -> bool:
+        return dict.__contains__(self, era) or (load_pack_era(era) and dict.__contains__(self, era))
+
+    def get(self, era, default=None):
+        try:
+            return self[era]
+        except KeyError:
+            return default
+
 ERAS: List[Tuple[str, str]] = [
     ("modern", "Modern (2000s)"),
     ("tang", "Ancient China - Tang Dynasty"),
@@ -126,6 +364,9 @@ MILESTONES = [7, 18, 24, 30, 50]
 # Achievement threshold for positive endings
 ACHIEVEMENT_TARGET = 30
 
+# Each stat moves by a uniform integer in [-VARIATION_SPREAD, VARIATION_SPREAD] after every choice
+VARIATION_SPREAD = 3
+
 BIRTH_MODS: Dict[str, Dict[str, int]] = {
     "rich":   {"wealth": 10, "health": 2, "charisma": 2},
     "middle": {"wealth": 4},
@@ -133,7 +374,7 @@ BIRTH_MODS: Dict[str, Dict[str, int]] = {
 }
 
 # (Era events / triggers data)
-ERA_AGE_EVENTS: Dict[str, Dict[str, List[Tuple[str, Dict[str, int]]]]] = {
+ERA_AGE_EVENTS: Dict[str, Dict[str, List[Tuple[str, Dict[str, int]]]]] = EraTable({
     "modern": {
         "infant": [
             ("You babble at a mobile of planets.", {"knowledge": 1}),
@@ -262,9 +503,9 @@ ERA_AGE_EVENTS: Dict[str, Dict[str, List[Tuple[str, Dict[str, int]]]]] = {
             ("You guide a migration to gentler lands.", {"charisma": 1, "knowledge": 1}),
         ],
     },
-}
+})
 
-ENV_TRIGGERS: Dict[str, Dict[str, List[Tuple[str, Dict[str, int]]]]] = {
+ENV_TRIGGERS: Dict[str, Dict[str, List[Tuple[str, Dict[str, int]]]]] = EraTable({
     "modern": {
         "child": [("Neighborhood fair boosts your mood.", {"karma": 1, "charisma": 1})],
         "teen": [("A viral challenge distracts your study.", {"knowledge": -1})],
@@ -293,7 +534,7 @@ ENV_TRIGGERS: Dict[str, Dict[str, List[Tuple[str, Dict[str, int]]]]] = {
         "adult": [("A new berry patch is found.", {"wealth": 1})],
         "elder": [("Warm springs ease your joints.", {"health": 1})],
     },
-}
+})
 
 TIME_RIFTS = [
     ("A shimmering rift appears...", "other"),
@@ -301,8 +542,78 @@ TIME_RIFTS = [
     ("The Moon turns, years rewind like silk.", "any"),
 ]
 
+# Sampling weights (content packs only; anything absent weighs 1)
+ERA_EVENT_WEIGHTS: Dict[str, Dict[str, List[float]]] = EraTable()     # era -> band -> weight per event
+ENV_TRIGGER_WEIGHTS: Dict[str, Dict[str, List[float]]] = EraTable()   # era -> band -> weight per trigger
+RIFT_WEIGHTS: Dict[str, float] = {}        # rift label -> weight
+ERA_RIFT_WEIGHTS: Dict[str, float] = {}    # era -> weight as a rift destination
+
+# ------------- Instrumentation -------------
+
+class PhaseProfiler:
+    """
+    Monotonic per-phase timers and event counters, off by default. Every hook
+    is guarded by `if PROFILER.enabled`, so a disabled profiler costs one
+    attribute test. Phase names are ';'-joined stacks ("engine;resolve") so
+    the data exports directly as a collapsed-stack profile.
+    """
+
+    now = staticmethod(time.perf_counter_ns)
+
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self.ns: Dict[str, int] = {}
+        self.calls: Dict[str, int] = {}
+        self.counters: Dict[str, int] = {}
+
+    def lap(self, phase: str, t0: int) -> int:
+        """Charge now - t0 to phase and return now, so consecutive phases chain."""
+        t = time.perf_counter_ns()
+        self.ns[phase] = self.ns.get(phase, 0) + t - t0
+        self.calls[phase] = self.calls.get(phase, 0) + 1
+        return t
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self) -> dict:
+        return {"ns": dict(self.ns), "calls": dict(self.calls), "counters": dict(self.counters)}
+
+    def merge(self, snap: dict) -> "PhaseProfiler":
+        for attr in ("ns", "calls", "counters"):
+            mine = getattr(self, attr)
+            for k, v in snap[attr].items():
+                mine[k] = mine.get(k, 0) + v
+        return self
+
+    def summary(self) -> str:
+        total = sum(self.ns.values()) or 1
+        lines = ["{0:<22} {1:>10} {2:>11} {3:>10} {4:>7}".format("phase", "calls", "total ms", "mean us", "share")]
+        for phase, ns in sorted(self.ns.items(), key=lambda kv: -kv[1]):
+            n = self.calls[phase]
+            lines.append("{0:<22} {1:>10,} {2:>11.1f} {3:>10.2f} {4:>6.1f}%".format(
+                phase, n, ns / 1e6, ns / n / 1e3, 100.0 * ns / total))
+        for name, n in sorted(self.counters.items()):
+            lines.append("{0:<22} {1:>10,}".format(name, n))
+        return "\n".join(lines)
+
+    def collapsed(self, root: str) -> str:
+        """Brendan Gregg collapsed-stack format, microseconds per stack."""
+        return "".join("{0};{1} {2}\n".format(root, phase, ns // 1000) for phase, ns in sorted(self.ns.items()))
+
+PROFILER = PhaseProfiler()
+
 # ------------- Mechanics & Helpers -------------
 
+def stable_id(key: str) -> int:
+    """Content-derived 63-bit template id; unlike hash(), not salted per process."""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little") >> 1
+
+RIFT_TEMPLATE_ID = stable_id("__RIFT__")
+
 def label_of(options: List[Tuple[str, str]], key: str) -> str:
     for k, label in options:
         if k == key:
@@ -314,8 +625,124 @@ def starting_stats(birth_key: str) -> Stats:
     mod = BIRTH_MODS.get(birth_key, {})
     return base.apply(mod)
 
-def pick(seq):
-    return random.choice(seq)
+def pick(seq, rng=None):
+    return (rng or random).choice(seq)
+
+SAMPLER_SCAN_LIMIT = 8   # pools up to this size exclude used entries by a scan (the old candidate list)
+
+class WeightedSampler:
+    """
+    Weighted draws in O(1) from a Walker/Vose alias table. With equal
+    weights a draw is one randrange(), the same stream pick() consumed, so
+    unweighted content keeps its seeded runs. Entries may carry a key bit;
+    draw() skips those whose bit is set in the `used` mask: small pools by
+    a scan, large ones by rejecting used draws (a life uses at most
+    CHAPTER_LIMIT entries), falling back to one scan only when a pool is
+    nearly used up. Zero-weight entries are never drawn.
+    """
+
+    __slots__ = ("items", "keys", "weights", "uniform", "_prob", "_alias")
+
+    def __init__(self, items, weights=None, keys=None):
+        self.items = tuple(items)
+        self.keys = tuple(keys) if keys is not None else (0,) * len(self.items)
+        n = len(self.items)
+        self.weights = tuple(float(w) for w in weights) if weights is not None else (1.0,) * n
+        if not all(0.0 <= w < float("inf") for w in self.weights) or (n and not sum(self.weights)):
+            raise ValueError("Sampler weights must be finite, non-negative and not all zero.")
+        self.uniform = len(set(self.weights)) <= 1
+        self._prob: List[float] = []
+        self._alias: List[int] = []
+        if not self.uniform:
+            total = sum(self.weights)
+            scaled = [w * n / total for w in self.weights]
+            prob, alias = [1.0] * n, list(range(n))
+            small = [i for i, p in enumerate(scaled) if p < 1.0]
+            large = [i for i, p in enumerate(scaled) if p >= 1.0]
+            while small and large:
+                lo, hi = small.pop(), large.pop()
+                prob[lo], alias[lo] = scaled[lo], hi
+                scaled[hi] -= 1.0 - scaled[lo]
+                (small if scaled[hi] < 1.0 else large).append(hi)
+            self._prob, self._alias = prob, alias     # leftovers keep probability 1 (rounding)
+
+    def index(self, rng) -> int:
+        if self.uniform:
+            return rng.randrange(len(self.items))
+        u = rng.random() * len(self.items)
+        i = int(u)
+        return i if u - i < self._prob[i] else self._alias[i]
+
+    def _draw_from(self, free: List[int], rng):
+        if self.uniform:
+            return self.items[free[rng.randrange(len(free))]]
+        total = sum(self.weights[i] for i in free)
+        if not total:
+            return None      # only zero-weight entries left
+        r = rng.random() * total
+        for i in free:
+            r -= self.weights[i]
+            if r < 0:
+                return self.items[i]
+        return self.items[max(i for i in free if self.weights[i])]
+
+    def draw(self, rng, used: int = 0):
+        """One item, skipping entries whose key bit is in used; None if none is left."""
+        items = self.items
+        if not items:
+            return None
+        if not used:
+            return items[self.index(rng)]
+        keys = self.keys
+        if len(items) > SAMPLER_SCAN_LIMIT:
+            for _ in range(2 * CHAPTER_LIMIT):
+                i = self.index(rng)
+                if not keys[i] & used:
+                    return items[i]
+        free = [i for i, k in enumerate(keys) if not k & used]
+        return self._draw_from(free, rng) if free else None
+
+_SAMPLERS: Dict[tuple, object] = {}   # samplers and trigger bit maps; cleared when a content pack registers
+
+def trigger_sampler(era: str, band: str) -> WeightedSampler:
+    """The (era, band) trigger pool, keyed by era-local bits (bands in AGE_BANDS order)."""
+    key = ("env", era, band)
+    sampler = _SAMPLERS.get(key)
+    if sampler is None:
+        table = ENV_TRIGGERS.get(era, {})
+        base = 0
+        for b, _range in AGE_BANDS:
+            if b == band:
+                break
+            base += len(table.get(b, []))
+        pool = table.get(band, [])
+        sampler = _SAMPLERS[key] = WeightedSampler(pool, ENV_TRIGGER_WEIGHTS.get(era, {}).get(band),
+                                                   [1 << (base + i) for i in range(len(pool))])
+        _SAMPLERS[("env_bits", era, band)] = {t: bit for (t, _d), bit in zip(pool, sampler.keys)}
+    return sampler
+
+def trigger_bit(era: str, band: str, text: str) -> int:
+    bits = _SAMPLERS.get(("env_bits", era, band))
+    if bits is None:
+        trigger_sampler(era, band)
+        bits = _SAMPLERS[("env_bits", era, band)]
+    return bits[text]
+
+def rift_sampler() -> WeightedSampler:
+    sampler = _SAMPLERS.get(("rift",))
+    if sampler is None:
+        sampler = _SAMPLERS[("rift",)] = WeightedSampler(TIME_RIFTS, [RIFT_WEIGHTS.get(label, 1.0)
+                                                                      for label, _mode in TIME_RIFTS])
+    return sampler
+
+def rift_destinations(exclude: Optional[str] = None) -> WeightedSampler:
+    """Eras a rift can land in (all of them, or all but `exclude`)."""
+    key = ("dest", exclude)
+    sampler = _SAMPLERS.get(key)
+    if sampler is None:
+        eras = [k for k, _label in ERAS if k != exclude]
+        sampler = _SAMPLERS[key] = WeightedSampler(eras, [ERA_RIFT_WEIGHTS.get(k, 1.0) for k in eras])
+    return sampler
 
 def current_band(age: int) -> str:
     for band, (lo, hi) in AGE_BANDS:
@@ -323,46 +750,57 @@ def current_band(age: int) -> str:
             return band
     return "elder"
 
-def open_time_rift(current_era: str) -> str:
-    label, mode = pick(TIME_RIFTS)
+def roll_time_rift(current_era: str, rng=None) -> Tuple[str, str]:
+    """Return (rift label, destination era) without any terminal output."""
+    rng = rng or random
+    label, mode = rift_sampler().draw(rng)
     if mode == "other":
-        other = [k for (k, _label) in ERAS if k != current_era]
-        next_era = pick(other)
+        next_era = rift_destinations(current_era).draw(rng)
     elif mode == "maybe":
-        next_era = current_era if random.random() < 0.5 else pick([k for (k, _label) in ERAS])
+        next_era = current_era if rng.random() < 0.5 else rift_destinations().draw(rng)
     else:
-        next_era = pick([k for (k, _label) in ERAS])
+        next_era = rift_destinations().draw(rng)
+    return label, next_era
+
+def open_time_rift(current_era: str) -> str:
+    label, next_era = roll_time_rift(current_era)
     print("Time Rift: {0}".format(label))
     print("You tumble into {0}!".format(label_of(ERAS, next_era)))
     return next_era
 
+SCORE_WEIGHTS: Dict[str, float] = {
+    "health": 1.1, "wealth": 1.2, "knowledge": 1.1, "karma": 0.8, "charisma": 0.9,
+}
+
 def score(stats: Stats) -> float:
-    return (
-        stats.health * 1.1
-        + stats.wealth * 1.2
-        + stats.knowledge * 1.1
-        + stats.karma * 0.8
-        + stats.charisma * 0.9
-    )
+    return sum(getattr(stats, k) * w for k, w in SCORE_WEIGHTS.items())
+
+BURNOUT_ENDING = "A life burned too fast. You fade before your tale completes."
+ERA_TOP_ENDINGS: Dict[str, str] = EraTable({
+    "modern": "You mentor others, open-access your research, and retire to the coast, content.",
+    "tang": "Your poems enter the anthology; officials whisper your name with reverence.",
+    "habsburg": "You become a deft diplomat; peace and prosperity mark your house.",
+    "prehistoric": "Tribe sings your legend: the one who stole fire twice and led the great migration.",
+})
+# (minimum score, ending) checked top-down after the era-specific top tier
+SCORE_ENDINGS: List[Tuple[float, str]] = [
+    (180, "A steady life: friendships held, lessons learned, and a few bright victories."),
+    (120, "You wander, but the map grows clearer. Not perfect, not wasted, simply human."),
+    (float("-inf"), "A rough road. Yet even small kindness echoes beyond the page."),
+]
+TOP_SCORE = 240
+LONG_LIFE_ENDING = "You lived a brilliant life."
 
 def ending_for(stats: Stats, era_key: str) -> str:
     s = score(stats)
     if stats.health <= 0:
-        return "A life burned too fast. You fade before your tale completes."
-    if s >= 240:
-        if era_key == "modern":
-            return "You mentor others, open-access your research, and retire to the coast, content."
-        if era_key == "tang":
-            return "Your poems enter the anthology; officials whisper your name with reverence."
-        if era_key == "habsburg":
-            return "You become a deft diplomat; peace and prosperity mark your house."
-        if era_key == "prehistoric":
-            return "Tribe sings your legend: the one who stole fire twice and led the great migration."
-    if s >= 180:
-        return "A steady life: friendships held, lessons learned, and a few bright victories."
-    if s >= 120:
-        return "You wander, but the map grows clearer. Not perfect, not wasted, simply human."
-    return "A rough road. Yet even small kindness echoes beyond the page."
+        return BURNOUT_ENDING
+    if s >= TOP_SCORE and era_key in ERA_TOP_ENDINGS:
+        return ERA_TOP_ENDINGS[era_key]
+    for threshold, text in SCORE_ENDINGS:
+        if s >= threshold:
+            return text
+    return SCORE_ENDINGS[-1][1]
 
 # ---------- Delta utilities & detailed reporting ----------
 
@@ -374,6 +812,9 @@ def add_delta(a: Dict[str,int], b: Dict[str,int]) -> Dict[str,int]:
         out[k] = out.get(k, 0) + v
     return out
 
+def _delta_row(delta: Dict[str, int]) -> List[int]:
+    return [delta.get(k, 0) for k in STATS_KEYS]
+
 def fmt_delta(d: Dict[str,int]) -> str:
     parts = []
     for k in STATS_KEYS:
@@ -396,59 +837,74 @@ def make_preview_text(o: Option) -> str:
 
 # ------------- Dynamic templates -------------
 
-ERA_FLAVOR = {
+ERA_FLAVOR: Dict[str, Dict[str, str]] = EraTable({
     "modern":   {"study": "Focus on study and projects.",
                  "work": "Take a full-time position.",
                  "retire": "File paperwork and plan a modest retirement.",
                  "risk": "Take a risky shortcut at work.",
                  "health": "Commit to disciplined training.",
                  "network": "Network at a meetup.",
-                 "rest": "Take a mental health break."},
+                 "rest": "Take a mental health break.",
+                 "chores": "help with family chores and simple responsibilities."},
     "tang":     {"study": "Copy classics and drill essays.",
                  "work": "Enter an apprenticeship in the yamen.",
                  "retire": "Withdraw from office to a quiet garden.",
                  "risk": "Seek court favor through a bold gambit.",
                  "health": "Practice qigong at dawn.",
                  "network": "Visit a patron's salon.",
-                 "rest": "Retreat to a quiet temple."},
+                 "rest": "Retreat to a quiet temple.",
+                 "chores": "assist elders with errands and basic scripts."},
     "habsburg": {"study": "Study languages and diplomacy at a small academy.",
                  "work": "Enter civil service or manage estates.",
                  "retire": "Retire to the countryside, tend affairs.",
                  "risk": "Speculate on new trade routes.",
                  "health": "Fence and ride daily.",
                  "network": "Host a small salon.",
-                 "rest": "Take the waters at a spa."},
+                 "rest": "Take the waters at a spa.",
+                 "chores": "shadow a steward for simple duties."},
     "prehistoric":{"study": "Train in tracking, toolmaking, and star paths.",
                    "work": "Join the foraging and hunt rotations.",
                    "retire": "Step back from hunts; teach rituals.",
                    "risk": "Hunt alone at dusk.",
                    "health": "Train with weighted stones.",
                    "network": "Trade stories by the fire.",
-                   "rest": "Meditate in the hot springs."},
+                   "rest": "Meditate in the hot springs.",
+                   "chores": "gather berries and carry water for the camp."},
+})
+
+# (risk_death, swing_prob) of the risky dynamic and milestone options, kept in
+# one table so parameter sweeps can tune them like the other module constants
+OPTION_RISKS: Dict[str, Tuple[float, float]] = {
+    "dyn_risk": (0.08, 0.35),
+    "dyn_risk_elder": (0.05, 0.35),
+    "mile_chores": (0.00, 0.10),      # age 7
+    "mile_work": (0.04, 0.25),        # ages 18 and 24
+    "mile_work_30": (0.05, 0.25),
+    "mile_work_50": (0.04, 0.15),
 }
 
-def make_dynamic_options(era: str, band: str, stats: Stats) -> List[Option]:
+def make_dynamic_options(era: str, band: str, stats: Optional[Stats] = None) -> List[Option]:
     f = ERA_FLAVOR[era]
     opts: List[Option] = [
         Option(f["study"], {"knowledge": 2 if band != "infant" else 1, "health": -1 if band=="teen" else 0},
-               {"study"}, set(), 0.0, 0.0, "dyn", template_id=f"dyn:{era}:study"),
+               {"study"}, set(), 0.0, 0.0, "dyn", template_id=stable_id(f"dyn:{era}:study")),
         Option(f["network"], {"charisma": 2, "wealth": 1 if era in ("habsburg","modern") else 0},
-               {"network"}, set(), 0.0, 0.0, "dyn", template_id=f"dyn:{era}:network"),
-        Option(f["risk"], {"wealth": -2, "health": -1}, {"risk"}, set(), 0.08, 0.35, "dyn",
-               template_id=f"dyn:{era}:risk"),
+               {"network"}, set(), 0.0, 0.0, "dyn", template_id=stable_id(f"dyn:{era}:network")),
+        Option(f["risk"], {"wealth": -2, "health": -1}, {"risk"}, set(), *OPTION_RISKS["dyn_risk"], "dyn",
+               template_id=stable_id(f"dyn:{era}:risk")),
         Option(f["health"], {"health": 2}, {"health"}, set(), 0.0, 0.0, "dyn",
-               template_id=f"dyn:{era}:health"),
+               template_id=stable_id(f"dyn:{era}:health")),
         Option(f["rest"], {"health": 1, "karma": 1, "knowledge": -1 if band in ("teen","young_adult") else 0},
-               {"rest"}, set(), 0.0, 0.0, "dyn", template_id=f"dyn:{era}:rest"),
+               {"rest"}, set(), 0.0, 0.0, "dyn", template_id=stable_id(f"dyn:{era}:rest")),
     ]
     if band == "elder":
         for o in opts:
             if o.tags_set == {"risk"}:
                 o.delta = {"wealth": -1, "health": -1}
-                o.risk_death = 0.05
+                o.risk_death, o.swing_prob = OPTION_RISKS["dyn_risk_elder"]
     return opts
 
-def to_option_from_base(era: str, band: str, text: str, delta: Dict[str, int]) -> Option:
+def to_option_from_base(era: str, band: str, text: str, delta: Dict[str, int], weight: float = 1.0) -> Option:
     t = text.lower()
     tags = set()
     if any(k in t for k in ["exam", "study", "copy", "science", "tutor", "project", "tool"]):
@@ -460,11 +916,13 @@ def to_option_from_base(era: str, band: str, text: str, delta: Dict[str, int]) -
     if any(k in t for k in ["bandit", "burns", "drought", "storm"]):
         tags.add("risk")
     swing = 0.2 if "risk" in tags else 0.0
-    tid = f"base:{era}:{band}:{abs(hash(text))%100000}"
-    return Option(text, dict(delta), tags, set(), 0.0, swing, "base", template_id=tid)
+    tid = stable_id(f"base:{era}:{band}:{text}")
+    return Option(text, dict(delta), tags, set(), 0.0, swing, "base", template_id=tid, weight=weight)
 
-def bias_score(opt: Option, flags: Set[str]) -> int:
-    return len(opt.tags_set & flags) + (1 if opt.requires and opt.requires.issubset(flags) else 0)
+def bias_score(opt: Option, flags: int) -> int:
+    """Tags shared with the life's flag mask, +1 if every required tag is set."""
+    req = opt.req_mask
+    return (opt.tag_mask & flags).bit_count() + (1 if req and flags & req == req else 0)
 
 def personalize_option_text(opt: Option, age: int, band: str) -> Tuple[str, Dict[str, int]]:
     delta = dict(opt.delta)
@@ -481,86 +939,233 @@ def personalize_option_text(opt: Option, age: int, band: str) -> Tuple[str, Dict
     text = pre + opt.text
     return text, delta
 
+def quiet_year_option(era: str) -> Option:
+    """Offered when every base/dynamic template of the band is used up."""
+    return Option("Quiet year of routines.", {"karma": 1}, {"rest"}, set(), 0.0, 0.0, "dyn",
+                  template_id=stable_id(f"dyn:{era}:filler"))
+
+def humble_filler_option(era: str, age: int, slot: int) -> Option:
+    """Pads a menu to 3 entries; never personalized."""
+    filler_id = stable_id(f"dyn:{era}:filler:{age}:{slot}")
+    rest = intern_tags({"rest"})
+    return Option(f"At age {age}, keep humble habits.", intern_delta({"karma": 1}), rest,
+                  intern_tags(()), 0.0, 0.0, "dyn", filler_id, tag_mask=tag_mask(rest))
+
+MENU_DRAW_VERSION = 2   # part of content_version(): seeded menus changed when draws went incremental
+
+class _PoolIndex:
+    """
+    Static lookups over one catalog pool, shared by every life's _MenuPool,
+    plus a bounded cache of the buckets for each (used, flags) projection
+    onto this pool, so the first menu a life sees in a band is a lookup.
+    """
+    __slots__ = ("opts", "weighted", "bits", "tags", "reqs", "by_bit", "by_tag", "bit_mask", "tag_mask",
+                 "layouts")
+    MAX_LAYOUTS = 4096
+
+    def __init__(self, opts: Tuple[Option, ...], weighted: bool):
+        self.opts, self.weighted = opts, weighted
+        self.bit_mask = self.tag_mask = 0
+        for o in opts:
+            self.bit_mask |= o.bit
+            self.tag_mask |= o.tag_mask | o.req_mask
+        self.layouts: Dict[Tuple[int, int], tuple] = {}
+        self.bits = [o.bit for o in opts]
+        self.tags = [o.tag_mask for o in opts]
+        self.reqs = [o.req_mask for o in opts]
+        self.by_bit = {o.bit: i for i, o in enumerate(opts)}
+        self.by_tag: Dict[int, List[int]] = {}
+        for i, o in enumerate(opts):
+            tags = o.tag_mask | o.req_mask
+            while tags:
+                low = tags & -tags
+                tags ^= low
+                self.by_tag.setdefault(low, []).append(i)
+
+class _MenuPool:
+    """
+    Remaining options of one (era, band) pool for one life, bucketed by
+    bias_score. Buckets hold pool indices in catalog order, so a pool kept
+    up to date incrementally and one rebuilt from the same masks (e.g. after
+    a checkpoint restore) draw identically.
+    """
+    __slots__ = ("index", "used", "flags", "score", "buckets")
+
+    def __init__(self, index: _PoolIndex, used: int, flags: int):
+        self.index = index
+        self._build(used, flags)
+
+    def _build(self, used: int, flags: int):
+        self.used, self.flags = used, flags
+        ix = self.index
+        key = (used & ix.bit_mask, flags & ix.tag_mask)
+        layout = ix.layouts.get(key)
+        if layout is not None:
+            score, buckets = layout
+            self.score = list(score)
+            self.buckets = {s: list(b) for s, b in buckets}
+            return
+        self.score: List[Optional[int]] = [None] * len(ix.opts)   # None once used
+        self.buckets: Dict[int, List[int]] = {}
+        for i, (bit, tags, req) in enumerate(zip(ix.bits, ix.tags, ix.reqs)):
+            if not bit & used:
+                s = self.score[i] = (tags & flags).bit_count() + (1 if req and flags & req == req else 0)
+                bucket = self.buckets.get(s)
+                if bucket is None:
+                    self.buckets[s] = [i]
+                else:
+                    bucket.append(i)
+        if len(ix.layouts) < ix.MAX_LAYOUTS:
+            ix.layouts[key] = (tuple(self.score), tuple((s, tuple(b)) for s, b in self.buckets.items()))
+
+    def _move(self, i: int, new: Optional[int]):
+        old = self.score[i]
+        bucket = self.buckets[old]
+        bucket.remove(i)
+        if not bucket:
+            del self.buckets[old]
+        self.score[i] = new
+        if new is not None:
+            insort(self.buckets.setdefault(new, []), i)
+
+    def sync(self, used: int, flags: int):
+        """Catch up with the life's masks; only options whose template or tags changed move."""
+        if used == self.used and flags == self.flags:
+            return
+        if self.used & ~used or self.flags & ~flags:   # masks only grow within a life; rebuild otherwise
+            self._build(used, flags)
+            return
+        gone, gained = used & ~self.used, flags & ~self.flags
+        self.used, self.flags = used, flags
+        ix = self.index
+        while gone:
+            low = gone & -gone
+            gone ^= low
+            i = ix.by_bit.get(low)
+            if i is not None and self.score[i] is not None:
+                self._move(i, None)
+        while gained:
+            low = gained & -gained
+            gained ^= low
+            for i in ix.by_tag.get(low, ()):
+                if self.score[i] is not None:
+                    s = bias_score(ix.opts[i], flags)
+                    if s != self.score[i]:
+                        self._move(i, s)
+
+    def draw(self, rng, k: int = 3) -> List[Option]:
+        """
+        In distribution, the first k options of a shuffle (an Efraimidis-Spirakis
+        weighted shuffle for weighted pools) stably sorted by descending
+        bias_score: buckets from the top, each adding a uniform (or
+        weight-proportional) ordered sample without replacement.
+        """
+        opts, weighted = self.index.opts, self.index.weighted
+        rand = rng.random
+        buckets = self.buckets
+        out: List[Option] = []
+        for s in (sorted(buckets, reverse=True) if len(buckets) > 1 else buckets):
+            group = buckets[s][:]
+            n = len(group)
+            for j in range(min(k - len(out), n)):
+                if n - j > 1:
+                    if weighted:
+                        r = rand() * sum(opts[i].weight for i in group[j:])
+                        m = j
+                        while m < n - 1:
+                            r -= opts[group[m]].weight
+                            if r < 0:
+                                break
+                            m += 1
+                    else:
+                        m = j + int(rand() * (n - j))
+                    group[j], group[m] = group[m], group[j]
+                out.append(opts[group[j]])
+            if len(out) == k:
+                break
+        return out
+
+class MenuState:
+    """A life's _MenuPools, made on first visit to each (era, band) and kept in sync from then on."""
+    __slots__ = ("pools",)
+
+    def __init__(self):
+        self.pools: Dict[Tuple[str, str], _MenuPool] = {}
+
+    def pool(self, era: str, band: str, used: int, flags: int) -> _MenuPool:
+        p = self.pools.get((era, band))
+        if p is None:
+            p = self.pools[(era, band)] = _MenuPool(option_catalog().pool_index(era, band), used, flags)
+        else:
+            p.sync(used, flags)
+        return p
+
 def build_option_menu(era: str,
                       band: str,
                       age: int,
                       stats: Stats,
-                      used_templates: Set[str],
-                      flags: Set[str]) -> List[Option]:
-    base_raw = ERA_AGE_EVENTS.get(era, {}).get(band, [])
-    base_opts = []
-    seen_texts = set()
-    for text, delta in base_raw:
-        if text in seen_texts:
-            continue
-        seen_texts.add(text)
-        o = to_option_from_base(era, band, text, delta)
-        if o.template_id in used_templates:
-            continue
-        base_opts.append(o)
-
-    dyn_opts = [o for o in make_dynamic_options(era, band, stats) if o.template_id not in used_templates]
-    all_opts = base_opts + dyn_opts
-    if not all_opts:
-        all_opts = [Option("Quiet year of routines.", {"karma": 1}, {"rest"}, set(), 0.0, 0.0, "dyn",
-                           template_id=f"dyn:{era}:filler")]
-
-    random.shuffle(all_opts)
-    all_opts.sort(key=lambda o: bias_score(o, flags), reverse=True)
+                      used_templates: int,
+                      flags: int,
+                      rng=None,
+                      state: Optional[MenuState] = None) -> List[Option]:
+    """
+    used_templates is the era's used-template mask, flags the life's tag mask.
+    Pass the life's MenuState to draw incrementally; without one the pool is
+    bucketed from scratch for this call (same distribution).
+    """
+    catalog = option_catalog()
+    picks = (state or MenuState()).pool(era, band, used_templates, flags).draw(rng or random)
+    if not picks:
+        picks = [catalog.quiet_option(era, band)]
 
-    menu: List[Option] = []
-    seen = set()
-    for o in all_opts:
-        if o.template_id in seen:
-            continue
-        seen.add(o.template_id)
-        txt, dd = personalize_option_text(o, age, band)
-        menu.append(Option(txt, dd, set(o.tags_set), set(o.requires), o.risk_death, o.swing_prob, o.origin, o.template_id))
-        if len(menu) == 3:
-            break
+    # Pool entries are unique per template and already personalized for the band
+    menu: List[Option] = [catalog.titled(o, age) for o in picks]
+    if PROFILER.enabled:
+        PROFILER.count("filler_options", 3 - len(menu))
     while len(menu) < 3:
-        filler_id = f"dyn:{era}:filler:{age}:{len(menu)}"
-        menu.append(Option(f"At age {age}, keep humble habits.", {"karma": 1}, {"rest"}, set(), 0.0, 0.0, "dyn", filler_id))
+        menu.append(humble_filler_option(era, age, len(menu)))
     return menu
 
 # ------------- Milestones -------------
 
 ERA_FLAVOR = ERA_FLAVOR  # (keep for clarity)
 
-def build_milestone_menu(era: str, age: int, band: str) -> List[Option]:
+def make_milestone_options(era: str, age: int) -> List[Option]:
     f = ERA_FLAVOR[era]
     if age in (7, 18, 24, 30):
         if age == 7:
             study = Option(f"At age {age}, " + f["study"], {"knowledge": 2, "health": 0},
-                           {"study"}, set(), 0.0, 0.0, "milestone", template_id=f"mile:{age}:study:{era}")
-            work_text = {
-                "modern":  f"At age {age}, help with family chores and simple responsibilities.",
-                "tang":    f"At age {age}, assist elders with errands and basic scripts.",
-                "habsburg":f"At age {age}, shadow a steward for simple duties.",
-                "prehistoric":f"At age {age}, gather berries and carry water for the camp.",
-            }[era]
-            work = Option(work_text, {"charisma": 1, "karma": 1, "health": -1},
-                           {"work"}, set(), 0.00, 0.10, "milestone", template_id=f"mile:{age}:work:{era}")
+                           {"study"}, set(), 0.0, 0.0, "milestone", template_id=stable_id(f"mile:{age}:study:{era}"))
+            work = Option(f"At age {age}, " + f["chores"], {"charisma": 1, "karma": 1, "health": -1},
+                           {"work"}, set(), *OPTION_RISKS["mile_chores"], "milestone",
+                           template_id=stable_id(f"mile:{age}:work:{era}"))
         elif age in (18, 24):
             study = Option(f"At age {age}, " + f["study"],
                            {"knowledge": 3, "wealth": -1, "health": -1 if age==24 else 0},
-                           {"study"}, set(), 0.0, 0.0, "milestone", template_id=f"mile:{age}:study:{era}")
+                           {"study"}, set(), 0.0, 0.0, "milestone", template_id=stable_id(f"mile:{age}:study:{era}"))
             work  = Option(f"At age {age}, " + f["work"],
                            {"wealth": 2, "knowledge": 0, "health": -1},
-                           {"work"}, set(), 0.04, 0.25, "milestone", template_id=f"mile:{age}:work:{era}")
+                           {"work"}, set(), *OPTION_RISKS["mile_work"], "milestone",
+                           template_id=stable_id(f"mile:{age}:work:{era}"))
         else:  # 30
             study = Option(f"At age {age}, " + f["study"], {"knowledge": 2, "wealth": -1},
-                           {"study"}, set(), 0.0, 0.0, "milestone", template_id=f"mile:{age}:study:{era}")
+                           {"study"}, set(), 0.0, 0.0, "milestone", template_id=stable_id(f"mile:{age}:study:{era}"))
             work  = Option(f"At age {age}, " + f["work"], {"wealth": 3, "health": -1},
-                           {"work"}, set(), 0.05, 0.25, "milestone", template_id=f"mile:{age}:work:{era}")
+                           {"work"}, set(), *OPTION_RISKS["mile_work_30"], "milestone",
+                           template_id=stable_id(f"mile:{age}:work:{era}"))
         return [study, work]
     # 50
     work = Option(f"At age {age}, " + f["work"], {"wealth": 2, "health": -1},
-                  {"work"}, set(), 0.04, 0.15, "milestone", template_id=f"mile:{age}:work:{era}")
+                  {"work"}, set(), *OPTION_RISKS["mile_work_50"], "milestone",
+                  template_id=stable_id(f"mile:{age}:work:{era}"))
     retire = Option(f"At age {age}, " + f["retire"], {"health": 2, "karma": 1, "wealth": -2},
-                    {"retire"}, set(), 0.0, 0.0, "milestone", template_id=f"mile:{age}:retire:{era}")
+                    {"retire"}, set(), 0.0, 0.0, "milestone", template_id=stable_id(f"mile:{age}:retire:{era}"))
     return [work, retire]
 
+def build_milestone_menu(era: str, age: int, band: str) -> List[Option]:
+    menu = option_catalog().milestone_menu(era, age)
+    return list(menu) if menu is not None else make_milestone_options(era, age)
+
 def next_unprocessed_milestone(age: int, processed: Set[int]) -> Optional[int]:
     future = [m for m in MILESTONES if m > age and m not in processed]
     return min(future) if future else None
@@ -573,54 +1178,391 @@ def cap_age_step_to_milestone(age: int, step: int, processed: Set[int]) -> int:
         return max(1, nxt - age)
     return step
 
+# ------------- Option Catalog -------------
+
+class OptionCatalog:
+    """
+    Every base, dynamic and milestone option, compiled once per era on first
+    use (so content-pack eras nobody visits are never built). Menu pools are
+    keyed by (era, band) and hold options already personalized for the band
+    (minus the "At age N" prefix), in a fixed content-determined order that
+    menu draws index into, so seeded menus are stable. Treat it as read-only:
+    pools are tuples, tag sets are frozensets and the maps are proxies.
+    """
+
+    def __init__(self):
+        self._pools: Dict[Tuple[str, str], Tuple[Option, ...]] = {}
+        self._quiet: Dict[Tuple[str, str], Option] = {}
+        self._milestones: Dict[Tuple[str, int], Tuple[Option, ...]] = {}
+        self._texts: Dict[int, str] = {}
+        self.eras: Set[str] = set()
+        self.weighted: Set[Tuple[str, str]] = set()   # (era, band) pools with unequal weights
+        self.pools = MappingProxyType(self._pools)
+        self.quiet = MappingProxyType(self._quiet)
+        self.milestones = MappingProxyType(self._milestones)
+        self.texts = MappingProxyType(self._texts)   # template id -> option text, for reports
+        self._titled: Dict[Tuple[int, int], Option] = {}
+        self._indexes: Dict[Tuple[str, str], "_PoolIndex"] = {}
+
+    def load_era(self, era: str):
+        if era in self.eras or era not in ERA_FLAVOR:
+            return
+        self.eras.add(era)
+        bits: Dict[int, int] = {}   # template id -> era-local bit, in compile order (content-determined)
+        for band, _range in AGE_BANDS:
+            raw, seen_texts, seen_ids = [], set(), set()
+            events = ERA_AGE_EVENTS.get(era, {}).get(band, [])
+            weights = ERA_EVENT_WEIGHTS.get(era, {}).get(band) or [1.0] * len(events)
+            for (text, delta), w in zip(events, weights):
+                if text not in seen_texts:
+                    seen_texts.add(text)
+                    raw.append(to_option_from_base(era, band, text, delta, w))
+            raw += make_dynamic_options(era, band)
+            pool = []
+            for o in raw:
+                if o.template_id in seen_ids:
+                    continue
+                seen_ids.add(o.template_id)
+                bit = bits.setdefault(o.template_id, 1 << len(bits))
+                pool.append(self._freeze(o, personalize_option_text(o, 0, band)[1], bit))
+            self._pools[(era, band)] = tuple(pool)
+            if len({o.weight for o in pool}) > 1:
+                self.weighted.add((era, band))
+            q = quiet_year_option(era)
+            self._quiet[(era, band)] = self._freeze(q, personalize_option_text(q, 0, band)[1])
+        for age in MILESTONES:
+            self._milestones[(era, age)] = tuple(self._freeze(o, o.delta) for o in make_milestone_options(era, age))
+        for band, _range in AGE_BANDS:
+            for o in self._pools[(era, band)] + (self._quiet[(era, band)],):
+                self._texts[o.template_id] = o.text
+        for age in MILESTONES:
+            for o in self._milestones[(era, age)]:
+                self._texts[o.template_id] = o.text
+
+    @staticmethod
+    def _freeze(o: Option, delta: Dict[str, int], bit: int = 0) -> Option:
+        return Option(o.text, intern_delta(delta), intern_tags(o.tags_set), intern_tags(o.requires),
+                      o.risk_death, o.swing_prob, o.origin, o.template_id, o.weight,
+                      tag_mask(o.tags_set), tag_mask(o.requires), bit)
+
+    def titled(self, o: Option, age: int) -> Option:
+        """o as offered at age ("At age N, ..."); shared across menus and lives, so never mutate it."""
+        key = (o.template_id, age)
+        t = self._titled.get(key)
+        if t is None:
+            t = self._titled[key] = o.retitled(f"At age {age}, " + o.text)
+        return t
+
+    def pool_index(self, era: str, band: str) -> "_PoolIndex":
+        ix = self._indexes.get((era, band))
+        if ix is None:
+            ix = self._indexes[(era, band)] = _PoolIndex(self.menu_pool(era, band), (era, band) in self.weighted)
+        return ix
+
+    def menu_pool(self, era: str, band: str) -> Tuple[Option, ...]:
+        pool = self._pools.get((era, band))
+        if pool is None:
+            self.load_era(era)
+            pool = self._pools.get((era, band), ())
+        return pool
+
+    def quiet_option(self, era: str, band: str) -> Option:
+        q = self._quiet.get((era, band))
+        if q is None:
+            self.load_era(era)
+            q = self._quiet.get((era, band))
+        return q if q is not None else quiet_year_option(era)
+
+    def milestone_menu(self, era: str, age: int) -> Optional[Tuple[Option, ...]]:
+        menu = self._milestones.get((era, age))
+        if menu is None:
+            self.load_era(era)
+            menu = self._milestones.get((era, age))
+        return menu
+
+_OPTION_CATALOG: Optional[OptionCatalog] = None
+
+def option_catalog() -> OptionCatalog:
+    global _OPTION_CATALOG
+    if _OPTION_CATALOG is None:
+        _OPTION_CATALOG = OptionCatalog()
+    return _OPTION_CATALOG
+
+# ------------- Content Packs -------------
+#
+# Writers add eras as JSON or TOML packs:
+#   {"name": "norse", "format": 1,
+#    "eras": {"viking": {"label": "Viking Age Scandinavia",
+#                        "flavor": {"study": ..., "work": ..., "retire": ..., "risk": ...,
+#                                   "health": ..., "network": ..., "rest": ..., "chores": ...},
+#                        "top_ending": "...",                       (optional)
+#                        "rift_weight": 0.5,                        (optional)
+#                        "events":   {"child": [["text", {"karma": 1}], ...], ...},
+#                        "triggers": {"adult": [["text", {"wealth": -1}, 3], ...], ...}}},
+#    "rifts": [["A raven opens a door in the sky.", "other"], ...]}   (optional)
+# Events, triggers and rifts take an optional third element, a weight
+# (relative odds, default 1); rift_weight sets how often rifts land there.
+# A pack is validated once and compiled to a cache file named after its
+# content hash: MAGIC | u32 header length | JSON header (era labels and body
+# offsets, rifts) | one marshal body per era. Registering a pack reads only
+# the header; an era's body is read when the game first touches that era.
+
+PACK_FORMAT = 1
+PACK_CACHE_VERSION = 2        # layout of compiled packs; part of the cache key
+PACK_MAGIC = b"LRPACK1\n"
+PACK_CACHE_DIR = os.environ.get("LIFE_RESTART_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "life_restart"))
+PACK_FLAVOR_KEYS = ("study", "work", "retire", "risk", "health", "network", "rest", "chores")
+PACK_RIFT_MODES = ("other", "maybe", "any")
+
+CONTENT_PACKS: List["ContentPack"] = []
+PACK_ERAS: Dict[str, "ContentPack"] = {}       # every era a pack added -> its pack
+PACK_RIFTS: List[Tuple[str, str]] = []         # rifts packs appended to TIME_RIFTS
+_PENDING_ERAS: Set[str] = set()                # pack eras whose body is not loaded yet
+
+def _check_weight(w, where: str) -> float:
+    if isinstance(w, bool) or not isinstance(w, (int, float)) or not 0 < w < float("inf"):
+        raise ValueError("{0}: weight must be a positive number.".format(where))
+    return float(w)
+
+def _check_deltas(entries, where: str) -> Tuple[Dict[str, List[Tuple[str, Dict[str, int]]]], Dict[str, List[float]]]:
+    """Rows per band, plus weights for the bands that have any other than 1."""
+    if not isinstance(entries, dict):
+        raise ValueError("{0}: expected a table of age bands.".format(where))
+    bands = [b for b, _range in AGE_BANDS]
+    out, weights = {}, {}
+    for band, items in entries.items():
+        if band not in bands:
+            raise ValueError("{0}: unknown age band {1!r} (expected one of {2}).".format(where, band, ", ".join(bands)))
+        if not isinstance(items, list):
+            raise ValueError("{0}.{1}: expected a list of [text, delta] pairs.".format(where, band))
+        rows, ws = [], []
+        for i, item in enumerate(items):
+            at = "{0}.{1}[{2}]".format(where, band, i)
+            if not (isinstance(item, (list, tuple)) and len(item) in (2, 3) and isinstance(item[0], str)
+                    and item[0].strip() and isinstance(item[1], dict)):
+                raise ValueError("{0}: expected [text, {{stat: change}}] or [text, {{stat: change}}, weight].".format(at))
+            for k, v in item[1].items():
+                if k not in STAT_FIELDS:
+                    raise ValueError("{0}: unknown stat {1!r}.".format(at, k))
+                if type(v) is not int or not -100 <= v <= 100:
+                    raise ValueError("{0}: change for {1} must be an integer in -100..100.".format(at, k))
+            rows.append((item[0], dict(item[1])))
+            ws.append(_check_weight(item[2], at) if len(item) == 3 else 1.0)
+        out[band] = rows
+        if any(w != 1.0 for w in ws):
+            weights[band] = ws
+    return out, weights
+
+def validate_pack(data, where: str) -> Tuple[Dict[str, dict], List[Tuple[str, str]]]:
+    """Check a parsed pack; returns ({era: section}, rifts) or raises ValueError naming the bad entry."""
+    if not isinstance(data, dict):
+        raise ValueError("{0}: a pack must be a table.".format(where))
+    if data.get("format", PACK_FORMAT) != PACK_FORMAT:
+        raise ValueError("{0}: unsupported pack format {1!r}.".format(where, data.get("format")))
+    eras = data.get("eras")
+    if not isinstance(eras, dict) or not eras:
+        raise ValueError("{0}: 'eras' must be a non-empty table.".format(where))
+    sections = {}
+    for era, body in eras.items():
+        at = "{0}: eras.{1}".format(where, era)
+        if not (era.isidentifier() and era.islower()):
+            raise ValueError("{0}: era keys must be lowercase identifiers.".format(at))
+        if any(era == k for k, _label in ERAS):
+            raise ValueError("{0}: era is already defined.".format(at))
+        if not isinstance(body, dict) or not isinstance(body.get("label"), str) or not body["label"].strip():
+            raise ValueError("{0}: needs a non-empty 'label'.".format(at))
+        flavor = body.get("flavor")
+        if not isinstance(flavor, dict):
+            raise ValueError("{0}.flavor: expected a table.".format(at))
+        for k in PACK_FLAVOR_KEYS:
+            if not isinstance(flavor.get(k), str) or not flavor[k].strip():
+                raise ValueError("{0}.flavor: missing text for {1!r}.".format(at, k))
+        top = body.get("top_ending")
+        if top is not None and (not isinstance(top, str) or not top.strip()):
+            raise ValueError("{0}.top_ending: expected text.".format(at))
+        events, event_weights = _check_deltas(body.get("events", {}), at + ".events")
+        triggers, trigger_weights = _check_deltas(body.get("triggers", {}), at + ".triggers")
+        sections[era] = {
+            "label": body["label"],
+            "rift_weight": _check_weight(body.get("rift_weight", 1.0), at + ".rift_weight"),
+            "flavor": {k: flavor[k] for k in PACK_FLAVOR_KEYS},
+            "top_ending": top,
+            "events": events,
+            "event_weights": event_weights,
+            "triggers": triggers,
+            "trigger_weights": trigger_weights,
+        }
+    rifts = []
+    for i, rift in enumerate(data.get("rifts", [])):
+        at = "{0}: rifts[{1}]".format(where, i)
+        if not (isinstance(rift, (list, tuple)) and len(rift) in (2, 3) and isinstance(rift[0], str)
+                and rift[1] in PACK_RIFT_MODES):
+            raise ValueError("{0}: expected [label, one of {1}] or [label, mode, weight].".format(
+                at, "/".join(PACK_RIFT_MODES)))
+        rifts.append((rift[0], rift[1], _check_weight(rift[2], at) if len(rift) == 3 else 1.0))
+    return sections, rifts
+
+def parse_pack(raw: bytes, path: str):
+    if path.endswith(".toml"):
+        if tomllib is None:
+            raise ValueError("{0}: TOML packs need Python 3.11+ (tomllib); use JSON.".format(path))
+        return tomllib.loads(raw.decode("utf-8"))
+    return json.loads(raw)
+
+def compile_pack(raw: bytes, path: str) -> bytes:
+    """Validate a pack and build its cache image (see the section comment)."""
+    sections, rifts = validate_pack(parse_pack(raw, path), path)
+    bodies, index, offset = [], {}, 0
+    for era, sec in sections.items():
+        body = marshal.dumps(sec)
+        index[era] = [sec["label"], offset, len(body), sec["rift_weight"]]
+        bodies.append(body)
+        offset += len(body)
+    header = json.dumps({"eras": index, "rifts": rifts}).encode("utf-8")
+    return PACK_MAGIC + struct.pack("<I", len(header)) + header + b"".join(bodies)
+
+class ContentPack:
+    """
+    One registered pack. The cache is keyed by a hash of the pack's bytes
+    (plus the pack and marshal formats), so an edited pack recompiles and an
+    unchanged one never gets parsed again. If the cache cannot be written
+    the compiled bodies stay in memory, still unmarshalled only on use.
+    """
+
+    def __init__(self, path: str, cache_dir: Optional[str] = None):
+        with open(path, "rb") as fh:
+            raw = fh.read()
+        self.path = path
+        key = raw + struct.pack("<III", PACK_FORMAT, PACK_CACHE_VERSION, marshal.version)
+        self.digest = hashlib.blake2b(key, digest_size=16).hexdigest()
+        self.cache = os.path.join(cache_dir or PACK_CACHE_DIR, self.digest + ".lrpack")
+        self._image: Optional[bytes] = None
+        try:
+            with open(self.cache, "rb") as fh:
+                self._read_header(fh.read(len(PACK_MAGIC) + 4), fh)
+        except (OSError, ValueError):
+            self._image = compile_pack(raw, path)
+            self._read_header(self._image[:len(PACK_MAGIC) + 4], None)
+            try:
+                os.makedirs(os.path.dirname(self.cache), exist_ok=True)
+                tmp = "{0}.{1}.tmp".format(self.cache, os.getpid())
+                with open(tmp, "wb") as fh:
+                    fh.write(self._image)
+                os.replace(tmp, self.cache)
+                self._image = None
+            except OSError:
+                pass
+
+    def _read_header(self, head: bytes, fh):
+        if len(head) != len(PACK_MAGIC) + 4 or not head.startswith(PACK_MAGIC):
+            raise ValueError("Not a compiled content pack.")
+        (n,) = struct.unpack_from("<I", head, len(PACK_MAGIC))
+        raw = fh.read(n) if fh is not None else self._image[len(head):len(head) + n]
+        header = json.loads(raw)
+        self.body_start = len(head) + n
+        self.eras: Dict[str, Tuple[str, int, int, float]] = {era: tuple(v) for era, v in header["eras"].items()}
+        self.rifts: List[Tuple[str, str, float]] = [tuple(r) for r in header["rifts"]]
+
+    def read_era(self, era: str) -> dict:
+        _label, offset, size, _weight = self.eras[era]
+        start = self.body_start + offset
+        if self._image is not None:
+            return marshal.loads(self._image[start:start + size])
+        with open(self.cache, "rb") as fh:
+            fh.seek(start)
+            return marshal.loads(fh.read(size))
+
+def load_content_pack(path: str, cache_dir: Optional[str] = None) -> ContentPack:
+    """Register a pack's eras and rifts; era content loads lazily on first use."""
+    global _CONTENT_VERSION, _KERNEL_TABLES
+    pack = ContentPack(path, cache_dir)
+    clash = [era for era in pack.eras if any(era == k for k, _label in ERAS)]
+    if clash:
+        raise ValueError("{0}: era {1!r} is already defined.".format(path, clash[0]))
+    for era, (label, _offset, _size, weight) in pack.eras.items():
+        ERAS.append((era, label))
+        _ERA_KEYS.append(era)
+        ERA_RIFT_WEIGHTS[era] = weight
+        PACK_ERAS[era] = pack
+        _PENDING_ERAS.add(era)
+    for label, mode, weight in pack.rifts:
+        TIME_RIFTS.append((label, mode))
+        PACK_RIFTS.append((label, mode))
+        RIFT_WEIGHTS[label] = weight
+    CONTENT_PACKS.append(pack)
+    _SAMPLERS.clear()
+    _CONTENT_VERSION = _KERNEL_TABLES = None      # both cover every era
+    return pack
+
+def load_pack_era(era: str) -> bool:
+    """Fill the era tables for a pack era on first use; False if there is nothing (more) to load."""
+    if era not in _PENDING_ERAS:
+        return False
+    _PENDING_ERAS.discard(era)
+    sec = PACK_ERAS[era].read_era(era)
+    dict.__setitem__(ERA_AGE_EVENTS, era, sec["events"])
+    dict.__setitem__(ENV_TRIGGERS, era, sec["triggers"])
+    dict.__setitem__(ERA_EVENT_WEIGHTS, era, sec["event_weights"])
+    dict.__setitem__(ENV_TRIGGER_WEIGHTS, era, sec["trigger_weights"])
+    dict.__setitem__(ERA_FLAVOR, era, sec["flavor"])
+    if sec["top_ending"]:
+        dict.__setitem__(ERA_TOP_ENDINGS, era, sec["top_ending"])
+    return True
+
 # ------------- Random Variation & Endings -------------
 
-def random_variation() -> Dict[str, int]:
+def random_variation(rng=None) -> Dict[str, int]:
     """Random ± adjustments applied after EACH player choice (not env)."""
+    rng = rng or random
+    v = VARIATION_SPREAD
     return {
-        "health": random.randint(-3, 3),
-        "wealth": random.randint(-3, 3),
-        "knowledge": random.randint(-3, 3),
-        "karma": random.randint(-3, 3),
-        "charisma": random.randint(-3, 3),
+        "health": rng.randint(-v, v),
+        "wealth": rng.randint(-v, v),
+        "knowledge": rng.randint(-v, v),
+        "karma": rng.randint(-v, v),
+        "charisma": rng.randint(-v, v),
     }
 
+# Negative endings at zero, checked in this order
+ZERO_ENDINGS: List[Tuple[str, str]] = [
+    ("health", "Your life has come to an end. Ending: Death."),
+    ("wealth", "You lost everything. Ending: Bankruptcy."),
+    ("knowledge", "Your cognition collapses; you are sent to a psychiatric hospital for care. Ending: Dementia."),
+    # Safe wording; avoid explicit self-harm details
+    ("charisma", "You are isolated and overwhelmed; the story ends in tragedy."),
+    ("karma", "Enemies come seeking revenge; you are killed."),
+]
+
+# Positive achievements: trigger immediately at >= ACHIEVEMENT_TARGET
+ACHIEVEMENT_ENDINGS: List[Tuple[str, str]] = [
+    ("knowledge", "Unmatched brilliance; you receive a Nobel Genius Prize."),
+    ("wealth", "You reach the top of wealth and become the richest person in the world."),
+    ("health", "Vitality overflows; you become the chieftain of the undying."),
+    ("karma", "Virtue perfected; you ascend and become immortal."),
+    ("charisma", "Your charm radiates; you are adored by all."),
+]
+
 def check_special_endings(stats: Stats) -> Optional[str]:
     """Return ending text if any threshold is hit, else None."""
-    # Negative endings at zero
-    if stats.health == 0:
-        return "Your life has come to an end. Ending: Death."
-    if stats.wealth == 0:
-        return "You lost everything. Ending: Bankruptcy."
-    if stats.knowledge == 0:
-        return "Your cognition collapses; you are sent to a psychiatric hospital for care. Ending: Dementia."
-    if stats.charisma == 0:
-        # Safe wording; avoid explicit self-harm details
-        return "You are isolated and overwhelmed; the story ends in tragedy."
-    if stats.karma == 0:
-        return "Enemies come seeking revenge; you are killed."
-
-    # Positive achievements: trigger immediately at >= ACHIEVEMENT_TARGET
-    if stats.knowledge >= ACHIEVEMENT_TARGET:
-        return "Unmatched brilliance; you receive a Nobel Genius Prize."
-    if stats.wealth >= ACHIEVEMENT_TARGET:
-        return "You reach the top of wealth and become the richest person in the world."
-    if stats.health >= ACHIEVEMENT_TARGET:
-        return "Vitality overflows; you become the chieftain of the undying."
-    if stats.karma >= ACHIEVEMENT_TARGET:
-        return "Virtue perfected; you ascend and become immortal."
-    if stats.charisma >= ACHIEVEMENT_TARGET:
-        return "Your charm radiates; you are adored by all."
-
+    for key, text in ZERO_ENDINGS:
+        if getattr(stats, key) == 0:
+            return text
+    for key, text in ACHIEVEMENT_ENDINGS:
+        if getattr(stats, key) >= ACHIEVEMENT_TARGET:
+            return text
     return None
 
 # ------------- Risk Resolution & Env -------------
 
-def resolve_outcome(opt: Option, stats: Stats) -> Tuple[Stats, bool, str, Dict[str,int]]:
+SWING_UP = {"knowledge": 1, "karma": 1}
+SWING_DOWN = {"health": -1, "karma": -1}
+
+def resolve_outcome(opt: Option, stats: Stats, rng=None) -> Tuple[Stats, bool, str, Dict[str,int]]:
     """
     Apply option delta with possible swing or death.
     Returns (new_stats, died, note, net_delta_applied_from_option)
     """
+    rng = rng or random
     note = ""
     net = dict(opt.delta)  # start with base option delta
     s = stats.apply(opt.delta)
@@ -628,27 +1570,30 @@ def resolve_outcome(opt: Option, stats: Stats) -> Tuple[Stats, bool, str, Dict[s
 
     # Swing only possible when the overall option delta is negative
     if opt.swing_prob > 0 and total_delta < 0:
-        if random.random() < opt.swing_prob:
-            if random.random() < 0.5:
-                swing = {"knowledge": 1, "karma": 1}
-                s = s.apply(swing)
-                net = add_delta(net, swing)
+        if rng.random() < opt.swing_prob:
+            if PROFILER.enabled:
+                PROFILER.count("swings")
+            if rng.random() < 0.5:
+                s.apply_inplace(SWING_UP)
+                net = add_delta(net, SWING_UP)
                 note = "(Against the odds, you grow from the setback.)"
             else:
-                swing = {"health": -1, "karma": -1}
-                s = s.apply(swing)
-                net = add_delta(net, swing)
+                s.apply_inplace(SWING_DOWN)
+                net = add_delta(net, SWING_DOWN)
                 note = "(The setback deepens into a rough patch.)"
 
     # Death risk
     death_prob = opt.risk_death
     if "risk" in opt.tags_set and s.health <= 10:
         death_prob = min(1.0, death_prob + 0.10)
-    died = (random.random() < death_prob)
+    died = (rng.random() < death_prob)
+    if PROFILER.enabled and death_prob > 0:
+        PROFILER.count("death_rolls")
+        PROFILER.count("deaths", died)
     if died:
         # Set health to 0 as an additional consequence (to trigger ending check)
         death_delta = {"health": -s.health}
-        s = s.apply(death_delta)
+        s.apply_inplace(death_delta)
         net = add_delta(net, death_delta)
         note = (note + " " if note else "") + "[You collapse.]"
 
@@ -656,198 +1601,4595 @@ def resolve_outcome(opt: Option, stats: Stats) -> Tuple[Stats, bool, str, Dict[s
 
 def maybe_env_trigger(era_key: str,
                       age: int,
-                      used_triggers: Set[Tuple[str, str, str]]) -> Optional[Tuple[str, Dict[str, int]]]:
-    if random.random() >= ENV_TRIGGER_PROB:
+                      used_triggers: int,
+                      rng=None) -> Optional[Tuple[str, Dict[str, int]]]:
+    """used_triggers is the era's used-trigger mask (trigger_sampler keys)."""
+    rng = rng or random
+    if rng.random() >= ENV_TRIGGER_PROB:
         return None
-    band = current_band(age)
-    pool = ENV_TRIGGERS.get(era_key, {}).get(band, [])
-    if not pool:
-        return None
-    candidates = [(t, d) for (t, d) in pool if (era_key, band, t) not in used_triggers]
-    if not candidates:
-        return None
-    return pick(candidates)
+    return trigger_sampler(era_key, current_band(age)).draw(rng, used_triggers)
 
-def random_age_step(age: int) -> int:
+def random_age_step(age: int, rng=None) -> int:
     lo, hi = AGE_STEP_MIN_MAX
     if age <= 2:
         hi = max(2, hi - 2)
-    return random.randint(lo, hi)
+    return (rng or random).randint(lo, hi)
 
-# ------------- UI Helpers (with clear effect preview) -------------
+# ------------- Life Event Sinks -------------
+#
+# The engine reports structured events (life start, each TurnResult, life
+# end) to one sink. Nothing is formatted unless a sink asks for text.
 
-def choose(title: str, options: List[Tuple[str, str]]) -> str:
-    print("\n" + title)
-    for idx, (k, label) in enumerate(options, start=1):
-        print("  {0}) {1}".format(idx, label))
-    while True:
-        ans = input("Pick 1..{0}: ".format(len(options))).strip()
-        if ans.isdigit():
-            i = int(ans)
-            if 1 <= i <= len(options):
-                return options[i - 1][0]
-        print("Invalid choice, try again.")
+class EventSink:
+    """Base sink; ignores every event, so it doubles as the null sink for batch runs."""
 
-def choose_from_options(menu: List[Option], allow_rift: bool = True) -> Option:
-    # Show preview of deltas & risk/swing BEFORE choosing
-    for idx, o in enumerate(menu, start=1):
-        total = sum(o.delta.values())
-        hint = " + " if total > 0 else (" - " if total < 0 else " ~ ")
-        preview = make_preview_text(o)
-        print(f"  {idx}){hint}{o.text}")
-        print(f"      Δ preview → {preview}")
-    prompt = "Choose 1..{0}{1}: ".format(len(menu), " (or 'r' for time rift)" if allow_rift else "")
-    while True:
-        ans = input(prompt).strip().lower()
-        if allow_rift and ans == "r":
-            return Option("__RIFT__", {}, set(), set(), 0.0, 0.0, "dyn", template_id="__RIFT__")
-        if ans.isdigit():
-            i = int(ans)
-            if 1 <= i <= len(menu):
-                return menu[i - 1]
-        print("Invalid choice, try again.")
+    def life_start(self, sim: "LifeSimulation"):
+        pass
 
-def print_stats(stats: Stats, age: int):
-    print("Age: {0}   Stats: {1}".format(age, stats.pretty()))
+    def turn(self, sim: "LifeSimulation", res: "TurnResult"):
+        pass
 
-# ------------- Game Loop -------------
+    def life_end(self, sim: "LifeSimulation"):
+        pass
 
-def play(seed: int = None):
-    if seed is not None:
-        random.seed(seed)
+    def close(self):
+        pass
 
-    # Login/Register
-    auth_flow()
+NULL_SINK = EventSink()
 
-    print("=== Life Restart Simulator (CLI) ===\n")
+class TextLog(EventSink):
+    """Keeps the raw events and renders the human-readable life log on demand."""
 
-    birth = choose("1) Choose your birth status", BIRTHS)
-    nation = choose("2) Choose your nationality", NATIONALITIES)
-    era = choose("3) Choose your starting era", ERAS)
+    def __init__(self, history: Optional[List[str]] = None):
+        self.history: List[str] = history or []     # lines already rendered (a restored checkpoint)
+        self.start: Optional[Tuple[str, str, str]] = None
+        self.turns: List["TurnResult"] = []
 
-    stats = starting_stats(birth)
-    age = 0
-    flags: Set[str] = set()
-    used_templates: Set[str] = set()
-    used_trigs: Set[Tuple[str, str, str]] = set()
-    processed_milestones: Set[int] = set()
-    log: List[str] = []
+    def life_start(self, sim):
+        self.history = []
+        self.start = (sim.birth, sim.nation, sim.era)
+        self.turns = []
 
-    log.append("You are reborn ({0}) in {1} during {2} at age {3}.".format(
-        birth.upper(), label_of(NATIONALITIES, nation), label_of(ERAS, era), age
-    ))
-    print_stats(stats, age)
+    def turn(self, sim, res):
+        self.turns.append(res)
 
-    chapter = 0
-    while chapter < CHAPTER_LIMIT and age < MAX_AGE:
-        chapter += 1
-        band = current_band(age)
-        print("\n--- Chapter {0}: {1} years old ({2}) ---".format(chapter, age, band))
+    def lines(self) -> List[str]:
+        out = list(self.history)
+        if self.start:
+            birth, nation, era = self.start
+            out.append("You are reborn ({0}) in {1} during {2} at age 0.".format(
+                birth.upper(), label_of(NATIONALITIES, nation), label_of(ERAS, era)))
+        for r in self.turns:
+            out.append("[age {0}] {1} | result {2} | rnd {3} | total {4} -> {5}".format(
+                r.age, r.option.text, fmt_delta(r.net_option), fmt_delta(r.rnd),
+                fmt_delta(r.net_total), r.stats.pretty()))
+            if r.env:
+                out.append("[age {0}] ENV {1} | impact {2} -> {3}".format(
+                    r.age, r.env[0], fmt_delta(r.env[1]), r.env_stats.pretty()))
+        return out
 
-        # Milestone?
-        if age in MILESTONES and age not in processed_milestones:
-            menu = build_milestone_menu(era, age, band)
-            opt = choose_from_options(menu, allow_rift=False)
+class TeeSink(EventSink):
+    """Fan every event out to several sinks."""
+
+    def __init__(self, *sinks: EventSink):
+        self.sinks = sinks
+
+    def life_start(self, sim):
+        for s in self.sinks:
+            s.life_start(sim)
+
+    def turn(self, sim, res):
+        for s in self.sinks:
+            s.turn(sim, res)
+
+    def life_end(self, sim):
+        for s in self.sinks:
+            s.life_end(sim)
+
+    def close(self):
+        for s in self.sinks:
+            s.close()
+
+class _FileSink(EventSink):
+    """Numbers lives and buffers encoded records up to buffer_bytes before writing."""
+
+    def __init__(self, path: str, buffer_bytes: int = 1 << 16):
+        self.fh = open(path, "wb")
+        self.buffer_bytes = buffer_bytes
+        self.buf: List = []
+        self.size = 0
+        self.life = -1
+
+    def _write(self, rec):
+        self.buf.append(rec)
+        self.size += len(rec)
+        if self.size >= self.buffer_bytes:
+            self.flush()
+
+    def life_start(self, sim):
+        self.life += 1
+        self._write(self._encode_start(sim))
+
+    def turn(self, sim, res):
+        self._write(self._encode_turn(res))
+
+    def life_end(self, sim):
+        self._write(self._encode_end(sim))
+
+    def flush(self):
+        if self.buf:
+            self.fh.write(b"".join(self.buf))
+            self.buf, self.size = [], 0
+
+    def close(self):
+        self.flush()
+        self.fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _stats_row(stats: Stats) -> List[int]:
+    return [getattr(stats, k) for k in STATS_KEYS]
+
+class JsonlSink(_FileSink):
+    """One JSON object per line: {"ev": "start"|"turn"|"end", "life": n, ...}."""
+
+    @staticmethod
+    def _line(obj: dict) -> bytes:
+        return (json.dumps(obj) + "\n").encode("utf-8")
+
+    def _encode_start(self, sim):
+        return self._line({"ev": "start", "life": self.life, "birth": sim.birth,
+                           "nation": sim.nation, "era": sim.era})
+
+    def _encode_turn(self, r):
+        return self._line({
+            "ev": "turn", "life": self.life, "chapter": r.chapter, "age": r.age,
+            "template_id": r.option.template_id, "option": r.net_option, "rnd": r.rnd,
+            "rift": r.rift[1] if r.rift else None, "env": r.env[0] if r.env else None,
+            "stats": _stats_row(r.env_stats or r.stats),
+        })
+
+    def _encode_end(self, sim):
+        return self._line({"ev": "end", "life": self.life, "ending": sim.ending,
+                           "kind": sim.ending_kind, "stats": _stats_row(sim.stats)})
+
+# Fixed-width little-endian records; texts are stored as stable_id()s and
+# era/birth/nation as indices into their content tables.
+EV_START, EV_TURN, EV_END = 1, 2, 3
+_REC_START = struct.Struct("<BIBBB")
+_REC_TURN = struct.Struct("<BIBBq5b5bbq5B")
+_REC_END = struct.Struct("<BIqB5B")
+_BIRTH_KEYS = [k for k, _label in BIRTHS]
+_ERA_KEYS = [k for k, _label in ERAS]
+_NATION_KEYS = [k for k, _label in NATIONALITIES]
+ENDING_KINDS = ("special", "final", "page")
+
+class BinarySink(_FileSink):
+    """Compact binary event file (see read_binary_events)."""
+
+    def _encode_start(self, sim):
+        return _REC_START.pack(EV_START, self.life, _BIRTH_KEYS.index(sim.birth),
+                               _ERA_KEYS.index(sim.era), _NATION_KEYS.index(sim.nation))
+
+    def _encode_turn(self, r):
+        rift = _ERA_KEYS.index(r.rift[1]) if r.rift else -1
+        env = stable_id(r.env[0]) if r.env else 0
+        return _REC_TURN.pack(EV_TURN, self.life, r.chapter, r.age, r.option.template_id,
+                              *_delta_row(r.net_option), *_delta_row(r.rnd), rift, env,
+                              *_stats_row(r.env_stats or r.stats))
+
+    def _encode_end(self, sim):
+        return _REC_END.pack(EV_END, self.life, stable_id(sim.ending),
+                             ENDING_KINDS.index(sim.ending_kind), *_stats_row(sim.stats))
+
+def read_binary_events(path: str):
+    """Yield BinarySink records as dicts (texts stay as stable ids)."""
+    births, eras, nations = _BIRTH_KEYS, _ERA_KEYS, _NATION_KEYS
+    n = len(STATS_KEYS)
+    with open(path, "rb") as fh:
+        data = fh.read()
+    pos = 0
+    while pos < len(data):
+        kind = data[pos]
+        if kind == EV_START:
+            _k, life, b, e, nat = _REC_START.unpack_from(data, pos)
+            pos += _REC_START.size
+            yield {"ev": "start", "life": life, "birth": births[b], "era": eras[e], "nation": nations[nat]}
+        elif kind == EV_TURN:
+            f = _REC_TURN.unpack_from(data, pos)
+            pos += _REC_TURN.size
+            yield {"ev": "turn", "life": f[1], "chapter": f[2], "age": f[3], "template_id": f[4],
+                   "option": list(f[5:5 + n]), "rnd": list(f[5 + n:5 + 2 * n]),
+                   "rift": eras[f[5 + 2 * n]] if f[5 + 2 * n] >= 0 else None,
+                   "env_id": f[6 + 2 * n] or None, "stats": list(f[7 + 2 * n:])}
+        elif kind == EV_END:
+            f = _REC_END.unpack_from(data, pos)
+            pos += _REC_END.size
+            yield {"ev": "end", "life": f[1], "ending_id": f[2], "kind": ENDING_KINDS[f[3]], "stats": list(f[4:])}
         else:
-            menu = build_option_menu(era, band, age, stats, used_templates, flags)
-            opt = choose_from_options(menu, allow_rift=True)
-            if opt.template_id == "__RIFT__":
-                era = open_time_rift(era)
-                band = current_band(age)
-                menu = build_option_menu(era, band, age, stats, used_templates, flags)
-                opt = pick(menu)
-                print("(Auto-picked after rift) {0}".format(opt.text))
-
-        # Resolve base outcome (risk/swing) and report net effect
-        new_stats, _died_flag, note, net_option = resolve_outcome(opt, stats)
-
-        # Apply random variation (ALWAYS after player's choice) & show
-        rnd = random_variation()
-        new_stats = new_stats.apply(rnd)
-        net_total = add_delta(net_option, rnd)
+            raise ValueError("Corrupt event file {0} at byte {1}.".format(path, pos))
 
-        # Full breakdown for the player
-        print(opt.text)
-        if note:
-            print("  Event note:", note)
-        print("  Result →", fmt_delta(net_option))
-        print("  Random variation →", fmt_delta(rnd))
-        print("  Total this turn →", fmt_delta(net_total))
+def open_event_sink(path: str) -> EventSink:
+    """JSONL for *.jsonl paths, the binary format otherwise."""
+    return JsonlSink(path) if path.endswith(".jsonl") else BinarySink(path)
 
-        stats = new_stats
-        print_stats(stats, age)
+# ------------- Life History Store -------------
+#
+# A directory holding per-chapter records column by column:
+#   meta.json   format, column types, birth/era keys, id -> text for templates, env triggers and endings
+#   data.bin    append-only chunks; a chunk is every column's array in turn, each padded to 8 bytes
+#   index.bin   one record per chunk: u64 offset, u64 rows, then each column's min and max as i64
+# A chunk counts once its index record is written, so a run cut short loses
+# at most the chunk it was writing (the next writer truncates it away).
+# Readers map data.bin and view each column in place, and skip any chunk
+# whose min/max cannot satisfy a query's predicates.
 
-        # Mark usage/flags & milestone record
-        if opt.origin == "milestone":
-            processed_milestones.add(age)
-        if opt.template_id != "__RIFT__":
-            used_templates.add(opt.template_id)
-        flags |= set(opt.tags_set)
-        log.append("[age {0}] {1} | result {2} | rnd {3} | total {4} -> {5}".format(
-            age, opt.text, fmt_delta(net_option), fmt_delta(rnd), fmt_delta(net_total), stats.pretty()
-        ))
+HISTORY_FORMAT = 1
+HISTORY_CHUNK_ROWS = 1 << 16
+# (column, array typecode); stats columns hold the stats after the turn, env included
+HISTORY_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    (("life", "I"), ("chapter", "B"), ("age", "B"), ("birth", "B"), ("era", "B"), ("rift", "B"),
+     ("template", "q"))
+    + tuple(("opt_" + k, "b") for k in STATS_KEYS) + tuple(("rnd_" + k, "b") for k in STATS_KEYS)
+    + (("env", "q"),) + tuple((k, "B") for k in STATS_KEYS) + (("ending", "q"),)
+)
+_HISTORY_NP = {"I": "<u4", "B": "u1", "b": "i1", "q": "<i8"}
+_HISTORY_TEXT_COLUMNS = ("template", "env", "ending")    # stable ids; 0 = none
+_HISTORY_INDEX = struct.Struct("<QQ{0}q".format(2 * len(HISTORY_COLUMNS)))
 
-        # Special endings check (immediate)
-        ending = check_special_endings(stats)
-        if ending:
-            print("\n=== Special Ending ===")
-            print(ending)
-            print("\n--- Life Log ---")
-            for line in log:
-                print("* " + line)
-            return 0
+def _history_chunk_layout(rows: int) -> Tuple[List[int], int]:
+    """Byte offset of each column within a chunk of `rows` rows, and the chunk's size."""
+    offsets, pos = [], 0
+    for _name, code in HISTORY_COLUMNS:
+        offsets.append(pos)
+        pos += -(-rows * struct.calcsize(code) // 8) * 8
+    return offsets, pos
 
-        # Environment trigger (report impact separately)
-        trig = maybe_env_trigger(era, age, used_trigs)
-        if trig:
-            t_text, t_delta = trig
-            stats = stats.apply(t_delta)
-            used_trigs.add((era, band, t_text))
-            print("\nEnvironment:", t_text)
-            print("  Environment impact →", fmt_delta(t_delta))
-            print_stats(stats, age)
-            log.append("[age {0}] ENV {1} | impact {2} -> {3}".format(
-                age, t_text, fmt_delta(t_delta), stats.pretty()
-            ))
-            ending2 = check_special_endings(stats)
-            if ending2:
-                print("\n=== Special Ending ===")
-                print(ending2)
-                print("\n--- Life Log ---")
-                for line in log:
-                    print("* " + line)
-                return 0
+def _read_history_meta(path: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as fh:
+            meta = json.load(fh)
+    except FileNotFoundError:
+        return None
+    if meta.get("format") != HISTORY_FORMAT or [tuple(c) for c in meta.get("columns", [])] != list(HISTORY_COLUMNS):
+        raise ValueError("{0} holds a different history format.".format(path))
+    return meta
 
-        # Age advance with milestone capping
-        step = random_age_step(age)
-        step = cap_age_step_to_milestone(age, step, processed_milestones)
-        age = min(MAX_AGE, age + step)
-        print("Time passes: +{0} years. Age is now {1}.".format(step, age))
-
-        if age >= MAX_AGE:
-            print("\n=== Final Ending ===")
-            print("You lived a brilliant life.")
-            print("\n--- Life Log ---")
-            for line in log:
-                print("* " + line)
+def _read_history_index(path: str) -> List[tuple]:
+    """Index records of the complete chunks (a torn tail record is ignored)."""
+    try:
+        with open(os.path.join(path, "index.bin"), "rb") as fh:
+            raw = fh.read()
+    except FileNotFoundError:
+        return []
+    size = _HISTORY_INDEX.size
+    return [_HISTORY_INDEX.unpack_from(raw, pos) for pos in range(0, len(raw) - size + 1, size)]
+
+class HistoryWriter(EventSink):
+    """
+    EventSink that appends every turn of every life to the history store at
+    path. Lives are numbered on from the store's highest life id, so a
+    single-worker batch into a fresh store numbers lives as batch_life() does.
+    """
+
+    def __init__(self, path: str, chunk_rows: int = HISTORY_CHUNK_ROWS):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.chunk_rows = chunk_rows
+        meta = _read_history_meta(path) or {}
+        for key, current in (("births", _BIRTH_KEYS), ("eras", _ERA_KEYS)):
+            stored = meta.get(key, [])
+            if stored != current[:len(stored)]:
+                raise ValueError("{0} was written with other {1} (load the same content packs).".format(path, key))
+        self.texts: Dict[int, str] = {int(k): v for k, v in meta.get("texts", {}).items()}
+        self._ids = {text: tid for tid, text in self.texts.items()}
+        self._meta_dirty = not meta
+        index = _read_history_index(path)
+        life = HISTORY_COLUMNS.index(("life", "I"))
+        self.life = max((rec[2 + len(HISTORY_COLUMNS) + life] for rec in index), default=-1)
+        end = index[-1][0] + _history_chunk_layout(index[-1][1])[1] if index else 0
+        self.data = open(os.path.join(path, "data.bin"), "ab")
+        self.data.truncate(end)      # drop a chunk whose index record never made it
+        self.index = open(os.path.join(path, "index.bin"), "ab")
+        self.index.truncate(len(index) * _HISTORY_INDEX.size)
+        self.offset = end
+        self.cols = [array(code) for _name, code in HISTORY_COLUMNS]
+        self.birth = 0
+
+    def life_start(self, sim):
+        self.life += 1
+        self.birth = _BIRTH_KEYS.index(sim.birth)
+
+    def _text_id(self, text: Optional[str]) -> int:
+        if not text:
             return 0
+        tid = self._ids.get(text)
+        if tid is None:
+            tid = self._ids[text] = stable_id(text)
+            self.texts.setdefault(tid, text)
+            self._meta_dirty = True
+        return tid
+
+    def turn(self, sim, r):
+        tid = r.option.template_id
+        if tid not in self.texts:
+            self.texts[tid] = r.option.text
+            self._meta_dirty = True
+        row = [self.life, r.chapter, r.age, self.birth, _ERA_KEYS.index(sim.era), 1 if r.rift else 0, tid]
+        row += _delta_row(r.net_option)
+        row += _delta_row(r.rnd)
+        row.append(self._text_id(r.env[0] if r.env else None))
+        row += _stats_row(r.env_stats or r.stats)
+        row.append(self._text_id(r.ending))
+        for col, v in zip(self.cols, row):
+            col.append(v)
+        if len(self.cols[0]) >= self.chunk_rows:
+            self.flush()
+
+    def _write_meta(self):
+        meta = {"format": HISTORY_FORMAT, "columns": HISTORY_COLUMNS, "births": _BIRTH_KEYS, "eras": _ERA_KEYS,
+                "texts": {str(k): v for k, v in self.texts.items()}}
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(meta, fh)
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+        self._meta_dirty = False
+
+    def flush(self):
+        rows = len(self.cols[0])
+        if not rows:
+            return
+        offsets, size = _history_chunk_layout(rows)
+        chunk = bytearray(size)
+        for col, at in zip(self.cols, offsets):
+            if sys.byteorder != "little":
+                col.byteswap()
+            raw = col.tobytes()
+            chunk[at:at + len(raw)] = raw
+        self.data.write(chunk)
+        self.data.flush()
+        if self._meta_dirty:
+            self._write_meta()     # texts are in place before any chunk that uses them counts
+        mins = [min(col) for col in self.cols]
+        maxs = [max(col) for col in self.cols]
+        self.index.write(_HISTORY_INDEX.pack(self.offset, rows, *mins, *maxs))
+        self.index.flush()
+        self.offset += size
+        self.cols = [array(code) for _name, code in HISTORY_COLUMNS]
+
+    def close(self):
+        self.flush()
+        if self._meta_dirty:
+            self._write_meta()
+        self.data.close()
+        self.index.close()
 
-    # Fallback (shouldn't reach)
-    print("\n=== Final Page ===")
-    print("Era at rest: {0}   Nation: {1}".format(label_of(ERAS, era), label_of(NATIONALITIES, nation)))
-    print_stats(stats, age)
-    print("\n" + ending_for(stats, era))
-    print("\n--- Life Log ---")
-    for line in log:
-        print("* " + line)
+# A predicate is (column, op, value) with op one of ==, !=, <, <=, >, >=, in,
+# not in, and ~ (text contains: birth/era keys, or template/env/ending texts).
+# == and != on template/env/ending take the whole text.
+HISTORY_OPS = ("==", "!=", "<=", ">=", "<", ">", "~")
+
+def parse_history_predicate(expr: str) -> Tuple[str, str, object]:
+    """
+    'age<30' -> ('age', '<', 30); 'ending~bankruptcy' -> ('ending', '~', 'bankruptcy').
+    The operator is the first one in the text, so values may contain <, > or =.
+    """
+    found = None
+    for op in HISTORY_OPS:      # two-character operators first, so '<=' wins over '<' at the same spot
+        at = expr.find(op)
+        if at >= 0 and (found is None or at < found[0]):
+            found = (at, op)
+    if found is None:
+        raise ValueError("Not a predicate: {0!r} (expected COLUMN OP VALUE).".format(expr))
+    at, op = found
+    column, value = expr[:at].strip(), expr[at + len(op):].strip()
+    return column, op, int(value) if value.lstrip("-").isdigit() else value
+
+class HistoryStore:
+    """Read side of a history store: memory-mapped columns with filter, aggregate and life queries."""
+
+    def __init__(self, path: str):
+        if np is None:
+            raise RuntimeError("Querying a history store requires NumPy (pip install numpy).")
+        meta = _read_history_meta(path)
+        if meta is None:
+            raise ValueError("{0} is not a history store.".format(path))
+        self.births: List[str] = meta["births"]
+        self.eras: List[str] = meta["eras"]
+        self.texts: Dict[int, str] = {int(k): v for k, v in meta["texts"].items()}
+        self.names = [name for name, _code in HISTORY_COLUMNS]
+        self.dtypes = [np.dtype(_HISTORY_NP[code]) for _name, code in HISTORY_COLUMNS]
+        n = len(HISTORY_COLUMNS)
+        index = _read_history_index(path)
+        self.offsets = np.array([rec[0] for rec in index], dtype=np.int64)
+        self.rows = np.array([rec[1] for rec in index], dtype=np.int64)
+        self.mins = np.array([rec[2:2 + n] for rec in index], dtype=np.int64).reshape(len(index), n)
+        self.maxs = np.array([rec[2 + n:] for rec in index], dtype=np.int64).reshape(len(index), n)
+        self.scanned = (0, len(index))      # (chunks read, chunks in store) of the last query
+        self._fh = open(os.path.join(path, "data.bin"), "rb")
+        size = int(self.offsets[-1] + _history_chunk_layout(int(self.rows[-1]))[1]) if index else 0
+        self._mm = mmap.mmap(self._fh.fileno(), size, access=mmap.ACCESS_READ) if size else None
+
+    @property
+    def n_rows(self) -> int:
+        return int(self.rows.sum())
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def column(self, chunk: int, name: str):
+        """One chunk's column as a read-only view of the mapped file (no copy)."""
+        c = self.names.index(name)
+        rows = int(self.rows[chunk])
+        at = int(self.offsets[chunk]) + _history_chunk_layout(rows)[0][c]
+        return np.frombuffer(self._mm, dtype=self.dtypes[c], count=rows, offset=at)
+
+    def decode(self, name: str, value: int) -> str:
+        if name == "birth":
+            return self.births[value]
+        if name == "era":
+            return self.eras[value]
+        if name in _HISTORY_TEXT_COLUMNS:
+            return self.texts.get(value, "-") if value else "-"
+        return str(value)
+
+    def _encode(self, pred) -> Tuple[int, str, object]:
+        """Column number, op and value with keys and texts turned into stored codes."""
+        name, op, value = pred
+        if name not in self.names:
+            raise ValueError("Unknown history column {0!r}; columns: {1}".format(name, ", ".join(self.names)))
+        keys = {"birth": self.births, "era": self.eras}.get(name)
+        if op == "~":
+            if keys is not None:
+                codes = [i for i, k in enumerate(keys) if str(value).lower() in k.lower()]
+            elif name in _HISTORY_TEXT_COLUMNS:
+                codes = [tid for tid, text in self.texts.items() if str(value).lower() in text.lower()]
+            else:
+                raise ValueError("'~' matches keys and texts, not {0}.".format(name))
+            return self.names.index(name), "in", codes
+        if isinstance(value, str):
+            if keys is not None and value in keys:
+                value = keys.index(value)
+            elif name in _HISTORY_TEXT_COLUMNS and op in ("==", "!="):
+                # one text can have several ids (a template per era and band), so match the texts
+                codes = [tid for tid, text in self.texts.items() if text == value]
+                return self.names.index(name), "in" if op == "==" else "not in", codes
+            else:
+                raise ValueError("{0} {1} {2!r}: expected a number.".format(name, op, value))
+        if op not in HISTORY_OPS and op not in ("in", "not in"):
+            raise ValueError("Unknown operator {0!r}.".format(op))
+        return self.names.index(name), op, value
+
+    def _chunks(self, where) -> List[int]:
+        """Chunks whose min/max do not rule out every predicate."""
+        keep = np.ones(len(self.rows), dtype=bool)
+        for c, op, v in where:
+            lo, hi = self.mins[:, c], self.maxs[:, c]
+            if op == "in":
+                vals = np.array(sorted(v), dtype=np.int64)
+                keep &= ((lo[:, None] <= vals) & (vals <= hi[:, None])).any(axis=1)
+            elif op == "not in":
+                continue
+            elif op == "==":
+                keep &= (lo <= v) & (v <= hi)
+            elif op == "!=":
+                keep &= (lo != v) | (hi != v)
+            elif op == "<":
+                keep &= lo < v
+            elif op == "<=":
+                keep &= lo <= v
+            elif op == ">":
+                keep &= hi > v
+            else:
+                keep &= hi >= v
+        chunks = np.flatnonzero(keep).tolist()
+        self.scanned = (len(chunks), len(self.rows))
+        return chunks
+
+    def _mask(self, chunk: int, where):
+        mask = None
+        for c, op, v in where:
+            col = self.column(chunk, self.names[c])
+            if op == "in":
+                m = np.isin(col, np.array(sorted(v), dtype=np.int64))
+            elif op == "not in":
+                m = ~np.isin(col, np.array(sorted(v), dtype=np.int64))
+            elif op == "==":
+                m = col == v
+            elif op == "!=":
+                m = col != v
+            elif op == "<":
+                m = col < v
+            elif op == "<=":
+                m = col <= v
+            elif op == ">":
+                m = col > v
+            else:
+                m = col >= v
+            mask = m if mask is None else mask & m
+        return mask
+
+    def scan(self, where=(), columns: Optional[List[str]] = None):
+        """Yield {column: array} per chunk for the rows matching every predicate."""
+        enc = [self._encode(p) for p in where]
+        columns = columns or self.names
+        for chunk in self._chunks(enc):
+            mask = self._mask(chunk, enc)
+            if mask is None:
+                yield {name: self.column(chunk, name) for name in columns}
+            elif mask.any():
+                yield {name: self.column(chunk, name)[mask] for name in columns}
+
+    def count(self, where=()) -> int:
+        enc = [self._encode(p) for p in where]
+        total = 0
+        for chunk in self._chunks(enc):
+            mask = self._mask(chunk, enc)
+            total += int(self.rows[chunk]) if mask is None else int(np.count_nonzero(mask))
+        return total
+
+    def aggregate(self, column: str, where=(), by: Optional[str] = None) -> Dict[object, Dict[str, float]]:
+        """n, mean, min and max of column over the matching rows, per value of `by` (decoded) if given."""
+        acc: Dict[int, List[int]] = {}
+        for part in self.scan(where, [column] + ([by] if by else [])):
+            vals = part[column].astype(np.int64)
+            if by is None:
+                groups = [(0, vals)]
+            else:
+                keys = part[by]
+                order = np.argsort(keys, kind="stable")
+                keys, vals = keys[order], vals[order]
+                cuts = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+                groups = zip(keys[np.concatenate(([0], cuts))].tolist(), np.split(vals, cuts))
+            for key, v in groups:
+                a = acc.setdefault(key, [0, 0, int(v[0]), int(v[0])])
+                a[0] += len(v)
+                a[1] += int(v.sum())
+                a[2] = min(a[2], int(v.min()))
+                a[3] = max(a[3], int(v.max()))
+        out: Dict[object, Dict[str, float]] = {}
+        for key, (n, total, lo, hi) in sorted(acc.items()):
+            label = "all" if by is None else self.decode(by, key)
+            out[label] = {"n": n, "mean": total / n, "min": lo, "max": hi}
+        return out
+
+    def lives(self, where=(), after=None):
+        """
+        Sorted ids of the lives with a chapter matching `where`; with `after`,
+        only when that chapter comes later than one matching `after`.
+        """
+        if after is None:
+            parts = [p["life"] for p in self.scan(where, ["life"])]
+            return np.unique(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.uint32)
+        first = [(p["life"], p["chapter"]) for p in self.scan(after, ["life", "chapter"])]
+        hits = [(p["life"], p["chapter"]) for p in self.scan(where, ["life", "chapter"])]
+        if not first or not hits:
+            return np.zeros(0, dtype=np.uint32)
+        a_life = np.concatenate([f[0] for f in first])
+        a_chap = np.concatenate([f[1] for f in first])
+        order = np.lexsort((a_chap, a_life))
+        a_life, ix = np.unique(a_life[order], return_index=True)
+        a_first = a_chap[order][ix]      # earliest `after` chapter per life
+        h_life = np.concatenate([h[0] for h in hits])
+        h_chap = np.concatenate([h[1] for h in hits])
+        pos = np.minimum(np.searchsorted(a_life, h_life), len(a_life) - 1)
+        ok = (a_life[pos] == h_life) & (h_chap > a_first[pos])
+        return np.unique(h_life[ok])
+
+def history_main(args: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog="life_restart.py --query", description="Query a life history store.")
+    ap.add_argument("--query", metavar="DIR", required=True, help="history store written by a --history batch")
+    ap.add_argument("--where", action="append", default=[], metavar="EXPR",
+                    help="chapter predicate, e.g. era==habsburg, age<30, ending~bankruptcy (repeatable)")
+    ap.add_argument("--after", action="append", metavar="EXPR",
+                    help="count lives whose --where chapter follows a chapter matching these (repeatable)")
+    ap.add_argument("--agg", metavar="COLUMN", help="n/mean/min/max of COLUMN over the matching chapters")
+    ap.add_argument("--by", metavar="COLUMN", help="group --agg by COLUMN")
+    opts = ap.parse_args(args)
+    try:
+        where = [parse_history_predicate(e) for e in opts.where]
+        after = [parse_history_predicate(e) for e in opts.after] if opts.after else None
+        store = HistoryStore(opts.query)
+    except ValueError as exc:
+        ap.error(str(exc))
+    with store:
+        try:
+            for pred in where + (after or []):
+                store._encode(pred)      # unknown columns and bad values fail here, before any scan
+            for name in (opts.agg, opts.by):
+                if name is not None and name not in store.names:
+                    raise ValueError("Unknown history column {0!r}; columns: {1}".format(
+                        name, ", ".join(store.names)))
+        except ValueError as exc:
+            ap.error(str(exc))
+        t0 = time.perf_counter()
+        if opts.agg:
+            table = store.aggregate(opts.agg, where, opts.by)
+            print("{0:>12} {1:>10} {2:>6} {3:>6}  {4}".format("n", "mean", "min", "max", opts.by or ""))
+            for key, a in table.items():
+                print("{0:12d} {1:10.3f} {2:6d} {3:6d}  {4}".format(a["n"], a["mean"], a["min"], a["max"], key))
+        else:
+            lives = store.lives(where, after)
+            chapters = store.count(where) if after is None else None
+            print("{0} lives{1} match.".format(len(lives), "" if chapters is None else
+                                               " ({0} chapters)".format(chapters)))
+            if len(lives):
+                print("First lives: " + " ".join(str(x) for x in lives[:10].tolist()))
+        print("Scanned {0} of {1} chunks ({2} chapters in store) in {3:.3f}s.".format(
+            store.scanned[0], store.scanned[1], store.n_rows, time.perf_counter() - t0))
     return 0
 
-def main(argv: List[str]) -> int:
+# ------------- Streaming Aggregates -------------
+#
+# Balance statistics over any number of lives in fixed memory. LifeAggregate
+# is an EventSink that folds each finished life into a (birth, era, ending)
+# cell and forgets it. Cells hold only integer counts and power sums plus
+# DDSketch-style log-bucket histograms, so two shards merge exactly (and in
+# any order) by adding integers.
+
+class Moments:
+    """Count, sum and sum of squares of integer samples; mean/variance derive from them exactly."""
+    __slots__ = ("n", "s1", "s2")
+
+    def __init__(self, n: int = 0, s1: int = 0, s2: int = 0):
+        self.n, self.s1, self.s2 = n, s1, s2
+
+    def add(self, x: int):
+        self.n += 1
+        self.s1 += x
+        self.s2 += x * x
+
+    def merge(self, other: "Moments") -> "Moments":
+        self.n += other.n
+        self.s1 += other.s1
+        self.s2 += other.s2
+        return self
+
+    @property
+    def mean(self) -> float:
+        return self.s1 / self.n if self.n else 0.0
+
+    @property
+    def variance(self) -> float:
+        """Sample variance; the numerator is an exact integer, so no cancellation."""
+        n = self.n
+        return (n * self.s2 - self.s1 * self.s1) / (n * (n - 1)) if n > 1 else 0.0
+
+class QuantileSketch:
+    """
+    Log-bucket quantile sketch (DDSketch): every quantile of non-negative
+    samples is returned within relative error alpha. Buckets are integer
+    counts, so merging is exact. Past max_buckets the lowest buckets fold
+    into the lowest one kept, which costs accuracy in the low tail only. The
+    folded result depends only on the union of the buckets, so merge order
+    never changes it. 512 buckets at 1% cover a 28,000x value range.
+    """
+    __slots__ = ("alpha", "max_buckets", "_log_gamma", "zeros", "buckets", "n", "lo", "hi")
+
+    def __init__(self, alpha: float = 0.01, max_buckets: int = 512):
+        if not 0 < alpha < 1:
+            raise ValueError("Sketch accuracy must be in (0, 1), got {0}.".format(alpha))
+        self.alpha, self.max_buckets = alpha, max_buckets
+        self._log_gamma = log((1 + alpha) / (1 - alpha))
+        self.zeros = 0
+        self.buckets: Dict[int, int] = {}
+        self.n = 0
+        self.lo = self.hi = None
+
+    def add(self, x: float):
+        if x < 0:
+            raise ValueError("QuantileSketch takes non-negative samples, got {0}.".format(x))
+        self.n += 1
+        self.lo = x if self.lo is None or x < self.lo else self.lo
+        self.hi = x if self.hi is None or x > self.hi else self.hi
+        if x == 0:
+            self.zeros += 1
+            return
+        i = ceil(log(x) / self._log_gamma)
+        self.buckets[i] = self.buckets.get(i, 0) + 1
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self):
+        keep = sorted(self.buckets)[-self.max_buckets:]
+        floor = keep[0]
+        folded = sum(c for i, c in self.buckets.items() if i < floor)
+        self.buckets = {i: self.buckets[i] for i in keep}
+        self.buckets[floor] += folded
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        if (other.alpha, other.max_buckets) != (self.alpha, self.max_buckets):
+            raise ValueError("Cannot merge sketches with different accuracy settings.")
+        self.n += other.n
+        self.zeros += other.zeros
+        for i, c in other.buckets.items():
+            self.buckets[i] = self.buckets.get(i, 0) + c
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+        for x in (other.lo, other.hi):
+            if x is not None:
+                self.lo = x if self.lo is None or x < self.lo else self.lo
+                self.hi = x if self.hi is None or x > self.hi else self.hi
+        return self
+
+    def quantile(self, q: float) -> float:
+        """Sample at rank q * (n - 1), clamped to the exact min and max."""
+        if not self.n:
+            return 0.0
+        rank = q * (self.n - 1)
+        seen = self.zeros
+        if seen > rank:
+            return 0.0
+        for i in sorted(self.buckets):
+            seen += self.buckets[i]
+            if seen > rank:
+                gamma = exp(self._log_gamma)
+                return min(self.hi, max(self.lo, 2 * gamma ** i / (gamma + 1)))
+        return self.hi
+
+    def to_json(self) -> dict:
+        return {"alpha": self.alpha, "max_buckets": self.max_buckets, "n": self.n, "zeros": self.zeros,
+                "min": self.lo, "max": self.hi, "buckets": sorted(self.buckets.items())}
+
+AGG_QUANTILES = (0.1, 0.5, 0.9, 0.99)
+SCORE_SCALE = 10   # SCORE_WEIGHTS are in tenths, so score * 10 is an integer
+
+class _AggCell:
+    """Everything kept for one (birth, era, ending) cell."""
+    __slots__ = ("score", "score_q", "chapters", "chapters_q", "end_age", "end_age_q",
+                 "milestones", "picks", "offers")
+
+    def __init__(self):
+        self.score, self.score_q = Moments(), QuantileSketch()
+        self.chapters, self.chapters_q = Moments(), QuantileSketch()
+        self.end_age, self.end_age_q = Moments(), QuantileSketch()
+        self.milestones: Dict[int, List[Moments]] = {}   # age -> per-stat Moments
+        self.picks: Dict[int, int] = {}                   # template id -> times chosen
+        self.offers: Dict[int, int] = {}                  # template id -> times on the menu
+
+    def merge(self, other: "_AggCell"):
+        for name in ("score", "score_q", "chapters", "chapters_q", "end_age", "end_age_q"):
+            getattr(self, name).merge(getattr(other, name))
+        for age, row in other.milestones.items():
+            mine = self.milestones.setdefault(age, [Moments() for _ in STATS_KEYS])
+            for m, o in zip(mine, row):
+                m.merge(o)
+        for table, theirs in ((self.picks, other.picks), (self.offers, other.offers)):
+            for tid, c in theirs.items():
+                table[tid] = table.get(tid, 0) + c
+
+    def to_json(self) -> dict:
+        def summary(m: Moments, q: QuantileSketch, scale: int = 1) -> dict:
+            return {"mean": m.mean / scale, "var": m.variance / scale ** 2,
+                    "quantiles": {str(p): q.quantile(p) / scale for p in AGG_QUANTILES},
+                    "moments": [m.n, m.s1, m.s2], "sketch": q.to_json()}
+        return {
+            "n_lives": self.score.n,
+            "score": summary(self.score, self.score_q, SCORE_SCALE),
+            "chapters": summary(self.chapters, self.chapters_q),
+            "end_age": summary(self.end_age, self.end_age_q),
+            "milestones": {str(age): {k: {"n": m.n, "mean": m.mean, "var": m.variance, "moments": [m.n, m.s1, m.s2]}
+                                      for k, m in zip(STATS_KEYS, row)}
+                           for age, row in sorted(self.milestones.items())},
+            "templates": {str(tid): {"picks": self.picks.get(tid, 0), "offers": c,
+                                     "pick_rate": self.picks.get(tid, 0) / c}
+                          for tid, c in sorted(self.offers.items())},
+        }
+
+class LifeAggregate(EventSink):
+    """
+    Streaming per-cell statistics. Memory is bounded by the number of cells
+    and catalog templates, never by the number of lives; the only per-life
+    state is the running life's picks, offers and milestone rows.
+    """
+
+    def __init__(self):
+        self.cells: Dict[Tuple[str, str, str], _AggCell] = {}
+        self._start = ("", "")
+        self._picks: List[int] = []
+        self._offers: List[int] = []
+        self._milestones: List[Tuple[int, Stats]] = []
+
+    @property
+    def n_lives(self) -> int:
+        return sum(c.score.n for c in self.cells.values())
+
+    def _offer(self, sim):
+        self._offers.extend(o.template_id for o in sim.menu)
+
+    def life_start(self, sim):
+        self._start = (sim.birth, sim.era)
+        self._picks, self._offers, self._milestones = [], [], []
+        self._offer(sim)
+
+    def turn(self, sim, res):
+        self._picks.append(res.option.template_id)
+        if res.option.origin == "milestone":
+            self._milestones.append((res.age, res.env_stats or res.stats))
+        if not sim.done:
+            self._offer(sim)
+
+    def life_end(self, sim):
+        key = self._start + (sim.ending,)
+        cell = self.cells.get(key)
+        if cell is None:
+            cell = self.cells[key] = _AggCell()
+        s = round(score(sim.stats) * SCORE_SCALE)
+        cell.score.add(s)
+        cell.score_q.add(s)
+        cell.chapters.add(sim.chapter)
+        cell.chapters_q.add(sim.chapter)
+        cell.end_age.add(sim.age)
+        cell.end_age_q.add(sim.age)
+        for age, stats in self._milestones:
+            row = cell.milestones.get(age)
+            if row is None:
+                row = cell.milestones[age] = [Moments() for _ in STATS_KEYS]
+            for m, k in zip(row, STATS_KEYS):
+                m.add(getattr(stats, k))
+        for table, ids in ((cell.picks, self._picks), (cell.offers, self._offers)):
+            for tid in ids:
+                table[tid] = table.get(tid, 0) + 1
+
+    def merge(self, other: "LifeAggregate") -> "LifeAggregate":
+        for key, theirs in other.cells.items():
+            mine = self.cells.get(key)
+            if mine is None:
+                mine = self.cells[key] = _AggCell()
+            mine.merge(theirs)
+        return self
+
+    def to_json(self) -> dict:
+        return {"n_lives": self.n_lives,
+                "cells": [dict(birth=b, era=e, ending=end, **cell.to_json())
+                          for (b, e, end), cell in sorted(self.cells.items())]}
+
+# ------------- Headless Engine -------------
+
+RIFT = -1  # choice index meaning "open a time rift" instead of picking an option
+
+@dataclass
+class TurnResult:
+    chapter: int
+    choice: int              # menu index passed to step(), or RIFT
+    age: int                 # age at which the choice was made
+    option: Option           # the option actually resolved (auto-picked after a rift)
+    rift: Optional[Tuple[str, str]]   # (rift label, destination era) if a rift was taken
+    note: str
+    net_option: Dict[str, int]
+    rnd: Dict[str, int]
+    net_total: Dict[str, int]
+    stats: Stats             # after option + random variation
+    env: Optional[Tuple[str, Dict[str, int]]]
+    env_stats: Optional[Stats]
+    step: int                # years advanced (0 if the life ended first)
+    ending: Optional[str]    # set on the turn the life ends
+
+# Checkpoint layout (see LifeSimulation.snapshot), little-endian:
+#   head: u8 format | u64 content version | u8 birth, era, nation | 5 x u8 stats
+#         | u8 age, chapter, processed-milestone bits
+#   varint seed+1 (0 = none) | flags: varint n, n x (varint len, utf-8)
+#   | used masks: varint n, n x (u8 era, varint template mask, varint trigger mask), current era first
+#   | menu: varint n, n x u64 template id | Mersenne Twister state: 625 x u32, f64 gauss (NaN = none)
+SNAPSHOT_FORMAT = 2
+_SNAP_HEAD = struct.Struct("<BQ3B5B3B")
+_SNAP_RNG = struct.Struct("<625Id")
+
+class LifeSimulation:
+    """
+    One life, no terminal I/O. Holds the state play() used to keep in locals
+    and advances one chapter per step(choice_index).
+    All randomness comes from self.rng (never the module-global random
+    unless passed in explicitly, which play() does to keep seeded runs stable).
+    """
+
+    def __init__(self, birth: str, era: str, nation: str = "custom",
+                 seed: Optional[int] = None, rng=None, sink: Optional["EventSink"] = None):
+        self.rng = rng if rng is not None else random.Random(seed)
+        self.seed = seed if rng is None else None   # replays need a life on its own seed
+        self.sink = sink if sink is not None else NULL_SINK
+        self.birth = birth
+        self.nation = nation
+        self.era = era
+        self.stats = starting_stats(birth)
+        self.age = 0
+        self.chapter = 0
+        self.flags = 0             # tag mask (TAG_BITS)
+        self.used_templates = 0    # this era's used-template mask (Option.bit)
+        self.used_trigs = 0        # this era's used-trigger mask (trigger_sampler keys)
+        self.other_eras: Dict[str, Tuple[int, int]] = {}   # masks of eras left through a rift
+        self.menus = MenuState()   # derived from the masks above, so checkpoints leave it out
+        self.processed_milestones: Set[int] = set()
+        self.ending: Optional[str] = None
+        self.ending_kind: Optional[str] = None   # "special" / "final" / "page"
+        self.menu: List[Option] = []
+        self.is_milestone = False
+
+        self.sink.life_start(self)
+        self._prepare_menu()
+
+    @property
+    def done(self) -> bool:
+        return self.ending is not None
+
+    @property
+    def band(self) -> str:
+        return current_band(self.age)
+
+    def _prepare_menu(self):
+        t = PROFILER.now() if PROFILER.enabled else 0
+        age, band = self.age, current_band(self.age)
+        self.is_milestone = age in MILESTONES and age not in self.processed_milestones
+        if self.is_milestone:
+            self.menu = build_milestone_menu(self.era, age, band)
+        else:
+            self.menu = build_option_menu(self.era, band, age, self.stats,
+                                          self.used_templates, self.flags, self.rng, self.menus)
+        if t:
+            PROFILER.lap("engine;menu", t)
+            PROFILER.count("milestone_menus" if self.is_milestone else "menus_built")
+
+    def _enter_era(self, era: str):
+        """Switch era, parking the old era's used masks (bits are era-local)."""
+        if era == self.era:
+            return
+        if self.used_templates or self.used_trigs:
+            self.other_eras[self.era] = (self.used_templates, self.used_trigs)
+        self.used_templates, self.used_trigs = self.other_eras.pop(era, (0, 0))
+        self.era = era
+
+    def _finish(self, ending: str, kind: str):
+        self.ending = ending
+        self.ending_kind = kind
+        self.menu = []
+
+    def step(self, choice_index: int) -> TurnResult:
+        """Resolve one chapter. choice_index is 0-based into self.menu, or RIFT."""
+        if self.done:
+            raise RuntimeError("This life has already ended.")
+        result = self._resolve(choice_index)
+        self.sink.turn(self, result)
+        if self.done:
+            self.sink.life_end(self)
+        return result
+
+    def snapshot(self) -> bytes:
+        """Serialize a running life (about 2.6 KB, mostly RNG state); restore() picks it up mid-chapter."""
+        if self.done:
+            raise ValueError("Only a running life can be checkpointed.")
+        s = self.stats
+        mask = sum(1 << i for i, m in enumerate(MILESTONES) if m in self.processed_milestones)
+        out = bytearray(_SNAP_HEAD.pack(SNAPSHOT_FORMAT, content_version(), _BIRTH_KEYS.index(self.birth),
+                                        _ERA_KEYS.index(self.era), _NATION_KEYS.index(self.nation),
+                                        s.health, s.wealth, s.knowledge, s.karma, s.charisma,
+                                        self.age, self.chapter, mask))
+        _put_varint(out, 0 if self.seed is None else abs(self.seed) + 1)
+        flags = sorted(tag_names(self.flags))      # tag bits differ between processes; names do not
+        _put_varint(out, len(flags))
+        for tag in flags:
+            raw = tag.encode("utf-8")
+            _put_varint(out, len(raw))
+            out += raw
+        masks = [(self.era, (self.used_templates, self.used_trigs))] + list(self.other_eras.items())
+        _put_varint(out, len(masks))
+        for era, (templates, trigs) in masks:
+            out.append(_ERA_KEYS.index(era))
+            _put_varint(out, templates)
+            _put_varint(out, trigs)
+        _put_varint(out, len(self.menu))
+        out += struct.pack("<{0}Q".format(len(self.menu)), *(o.template_id for o in self.menu))
+        _version, mt, gauss = self.rng.getstate()
+        out += _SNAP_RNG.pack(*mt, float("nan") if gauss is None else gauss)
+        return bytes(out)
+
+    @classmethod
+    def restore(cls, blob: bytes, sink: Optional["EventSink"] = None) -> "LifeSimulation":
+        """
+        Rebuild a life from snapshot(). The sink gets no life_start: it only
+        sees the turns played from here on (the log cursor is `chapter`).
+        """
+        fmt, version, b, e, nat, h, w, k, ka, c, age, chapter, mask = _SNAP_HEAD.unpack_from(blob, 0)
+        if fmt != SNAPSHOT_FORMAT or version != content_version():
+            raise ValueError("Checkpoint was taken against different content or format.")
+        sim = cls.__new__(cls)
+        sim.menus = MenuState()
+        sim.birth, sim.era, sim.nation = _BIRTH_KEYS[b], _ERA_KEYS[e], _NATION_KEYS[nat]
+        sim.stats = Stats(h, w, k, ka, c)
+        sim.age, sim.chapter = age, chapter
+        sim.processed_milestones = {m for i, m in enumerate(MILESTONES) if mask >> i & 1}
+        sim.ending = sim.ending_kind = None
+        sim.sink = sink if sink is not None else NULL_SINK
+        pos = _SNAP_HEAD.size
+        seed, pos = _get_varint(blob, pos)
+        sim.seed = seed - 1 if seed else None
+        n, pos = _get_varint(blob, pos)
+        flags = set()
+        for _ in range(n):
+            size, pos = _get_varint(blob, pos)
+            flags.add(str(blob[pos:pos + size], "utf-8"))
+            pos += size
+        sim.flags = tag_mask(flags)
+        n, pos = _get_varint(blob, pos)
+        sim.other_eras = {}
+        for i in range(n):
+            era = _ERA_KEYS[blob[pos]]
+            templates, pos = _get_varint(blob, pos + 1)
+            trigs, pos = _get_varint(blob, pos)
+            if i == 0:
+                sim.used_templates, sim.used_trigs = templates, trigs
+            else:
+                sim.other_eras[era] = (templates, trigs)
+        n, pos = _get_varint(blob, pos)
+        ids = struct.unpack_from("<{0}Q".format(n), blob, pos)
+        pos += 8 * n
+        *mt, gauss = _SNAP_RNG.unpack_from(blob, pos)
+        sim.rng = random.Random()
+        sim.rng.setstate((3, tuple(mt), None if gauss != gauss else gauss))
+        sim.is_milestone = age in MILESTONES and age not in sim.processed_milestones
+        sim.menu = sim._rebuild_menu(ids)
+        return sim
+
+    def _rebuild_menu(self, ids: Tuple[int, ...]) -> List[Option]:
+        """The menu _prepare_menu() produced, from its template ids and without touching the RNG."""
+        era, age, band = self.era, self.age, current_band(self.age)
+        if self.is_milestone:
+            menu = build_milestone_menu(era, age, band)
+        else:
+            catalog = option_catalog()
+            known = {o.template_id: o for o in catalog.menu_pool(era, band)}
+            quiet = catalog.quiet_option(era, band)
+            known[quiet.template_id] = quiet
+            menu = []
+            for slot, tid in enumerate(ids):
+                o = known.get(tid)
+                if o is None:
+                    menu.append(humble_filler_option(era, age, slot))
+                else:
+                    menu.append(catalog.titled(o, age))
+        if tuple(o.template_id for o in menu) != tuple(ids):
+            raise ValueError("Checkpoint menu does not match this content.")
+        return menu
+
+    def _resolve(self, choice_index: int) -> TurnResult:
+        prof = PROFILER if PROFILER.enabled else None
+        t = prof.now() if prof else 0
+        self.chapter += 1
+        age = self.age
+        band = current_band(age)
+        rift = None
+        if choice_index == RIFT:
+            if self.is_milestone:
+                raise ValueError("Time rifts cannot be opened at a milestone.")
+            label, era = roll_time_rift(self.era, self.rng)
+            self._enter_era(era)
+            rift = (label, self.era)
+            band = current_band(age)
+            menu = build_option_menu(self.era, band, age, self.stats,
+                                     self.used_templates, self.flags, self.rng, self.menus)
+            opt = pick(menu, self.rng)
+            if prof:
+                prof.count("rifts")
+        else:
+            if not 0 <= choice_index < len(self.menu):
+                raise ValueError("Choice {0} is out of range 0..{1}.".format(choice_index, len(self.menu) - 1))
+            opt = self.menu[choice_index]
+
+        # Resolve base outcome (risk/swing), then random variation (ALWAYS after the choice)
+        new_stats, _died_flag, note, net_option = resolve_outcome(opt, self.stats, self.rng)
+        rnd = random_variation(self.rng)
+        new_stats.apply_inplace(rnd)
+        net_total = add_delta(net_option, rnd)
+        self.stats = new_stats
+        if prof:
+            t = prof.lap("engine;resolve", t)
+
+        # Mark usage/flags & milestone record
+        if opt.origin == "milestone":
+            self.processed_milestones.add(age)
+        self.used_templates |= opt.bit
+        self.flags |= opt.tag_mask
+        result = TurnResult(self.chapter, choice_index, age, opt, rift, note, net_option, rnd, net_total,
+                            self.stats, None, None, 0, None)
+
+        # Special endings check (immediate)
+        ending = check_special_endings(self.stats)
+        if prof:
+            t = prof.lap("engine;endings", t)
+        if ending:
+            self._finish(ending, "special")
+            result.ending = ending
+            return result
+
+        # Environment trigger
+        trig = maybe_env_trigger(self.era, age, self.used_trigs, self.rng)
+        if trig:
+            t_text, t_delta = trig
+            self.stats = self.stats.apply(t_delta)
+            self.used_trigs |= trigger_bit(self.era, band, t_text)
+            result.env, result.env_stats = trig, self.stats
+            if prof:
+                prof.count("env_triggers")
+            ending = check_special_endings(self.stats)
+            if ending:
+                if prof:
+                    prof.lap("engine;env", t)
+                self._finish(ending, "special")
+                result.ending = ending
+                return result
+
+        if prof:
+            t = prof.lap("engine;env", t)
+
+        # Age advance with milestone capping
+        step = random_age_step(age, self.rng)
+        step = cap_age_step_to_milestone(age, step, self.processed_milestones)
+        self.age = min(MAX_AGE, age + step)
+        result.step = step
+
+        if self.age >= MAX_AGE:
+            self._finish(LONG_LIFE_ENDING, "final")
+        elif self.chapter >= CHAPTER_LIMIT:
+            self._finish(ending_for(self.stats, self.era), "page")
+        if prof:
+            prof.lap("engine;age", t)
+        if not self.done:
+            self._prepare_menu()
+        result.ending = self.ending
+        return result
+
+Policy = Callable[[LifeSimulation], int]
+
+def random_policy(sim: LifeSimulation) -> int:
+    """Pick uniformly among the offered options (never opens a rift)."""
+    return sim.rng.randrange(len(sim.menu))
+
+# Built-in agents for tournaments. Each is a Policy: it sees only what the
+# player sees (the menu and its previews, stats, flags) and draws any
+# randomness from sim.rng. Ties go to the earliest menu entry.
+
+def _preview_gain(o: Option) -> float:
+    """score() change of the previewed delta (what make_preview_text shows, risk ignored)."""
+    return sum(SCORE_WEIGHTS[k] * v for k, v in o.delta.items())
+
+def _argmax(menu: List[Option], key: Callable[[Option], float]) -> int:
+    best, best_v = 0, None
+    for i, o in enumerate(menu):
+        v = key(o)
+        if best_v is None or v > best_v:
+            best, best_v = i, v
+    return best
+
+def study_policy(sim: LifeSimulation) -> int:
+    """Always study: a study-tagged option if offered, else the largest knowledge gain."""
+    study = tag_mask(("study",))
+    return _argmax(sim.menu, lambda o: (bool(o.tag_mask & study), o.delta.get("knowledge", 0)))
+
+def greedy_policy(sim: LifeSimulation) -> int:
+    """Largest previewed score gain."""
+    return _argmax(sim.menu, _preview_gain)
+
+def cautious_policy(sim: LifeSimulation) -> int:
+    """Greedy among options without death risk; risky ones only when nothing else is offered."""
+    return _argmax(sim.menu, lambda o: (o.risk_death <= 0, _preview_gain(o)))
+
+def rift_policy(sim: LifeSimulation) -> int:
+    """Open a time rift whenever allowed, else pick at random."""
+    return random_policy(sim) if sim.is_milestone else RIFT
+
+def bias_policy(sim: LifeSimulation) -> int:
+    """Follow the life's own history: the option sharing most tags with its flags (bias_score)."""
+    return _argmax(sim.menu, lambda o: bias_score(o, sim.flags))
+
+def run_life(policy: Policy, birth: str, era: str, rng) -> LifeSimulation:
+    sim = LifeSimulation(birth, era, rng=rng)
+    while not sim.done:
+        sim.step(policy(sim))
+    return sim
+
+@dataclass
+class BatchResult:
+    """
+    Mergeable totals for a batch of lives. Everything is an integer count or
+    sum, so merging shards in any order gives bit-identical results.
+    """
+    n_lives: int = 0
+    ending_counts: Dict[str, int] = field(default_factory=dict)
+    stat_sums: List[int] = field(default_factory=lambda: [0] * len(STATS_KEYS))   # final stats
+    age_counts: List[int] = field(default_factory=lambda: [0] * (MAX_AGE + 1))    # chapters played at each age
+    age_stat_sums: List[List[int]] = field(
+        default_factory=lambda: [[0] * len(STATS_KEYS) for _ in range(MAX_AGE + 1)])
+    aggregate: Optional[LifeAggregate] = None    # per-cell streaming stats, when requested
+
+    def add_turn(self, age: int, stats: Stats):
+        self.age_counts[age] += 1
+        row = self.age_stat_sums[age]
+        for i, k in enumerate(STATS_KEYS):
+            row[i] += getattr(stats, k)
+
+    def add_life(self, ending: str, stats: Stats):
+        self.n_lives += 1
+        self.ending_counts[ending] = self.ending_counts.get(ending, 0) + 1
+        for i, k in enumerate(STATS_KEYS):
+            self.stat_sums[i] += getattr(stats, k)
+
+    def merge(self, other: "BatchResult") -> "BatchResult":
+        self.n_lives += other.n_lives
+        for ending, c in other.ending_counts.items():
+            self.ending_counts[ending] = self.ending_counts.get(ending, 0) + c
+        self.stat_sums = [a + b for a, b in zip(self.stat_sums, other.stat_sums)]
+        self.age_counts = [a + b for a, b in zip(self.age_counts, other.age_counts)]
+        self.age_stat_sums = [[a + b for a, b in zip(r1, r2)]
+                              for r1, r2 in zip(self.age_stat_sums, other.age_stat_sums)]
+        if other.aggregate is not None:
+            self.aggregate = (self.aggregate or LifeAggregate()).merge(other.aggregate)
+        return self
+
+    @property
+    def score_sum(self) -> float:
+        # score() is linear, so summing stats first keeps the total exact
+        return sum(self.stat_sums[i] * SCORE_WEIGHTS[k] for i, k in enumerate(STATS_KEYS))
+
+    @property
+    def mean_score(self) -> float:
+        return self.score_sum / self.n_lives if self.n_lives else 0.0
+
+    def to_json(self) -> dict:
+        return {
+            "n_lives": self.n_lives,
+            "ending_counts": dict(sorted(self.ending_counts.items())),
+            "stat_sums": dict(zip(STATS_KEYS, self.stat_sums)),
+            "score_sum": self.score_sum,
+            "per_age": {age: {"chapters": c, "stat_sums": dict(zip(STATS_KEYS, sums))}
+                        for age, (c, sums) in enumerate(zip(self.age_counts, self.age_stat_sums)) if c},
+        }
+
+def play_batch_life(policy: Policy, rng, birth: Optional[str] = None, era: Optional[str] = None,
+                    sink: Optional[EventSink] = None, result: Optional["BatchResult"] = None) -> LifeSimulation:
+    """One headless life; birth/era default to a pick from rng. Turns are tallied into result if given."""
+    b = birth or pick(BIRTHS, rng)[0]
+    e = era or pick(ERAS, rng)[0]
+    sim = LifeSimulation(b, e, rng=rng, sink=sink)
+    while not sim.done:
+        if PROFILER.enabled:
+            t = PROFILER.now()
+            choice = policy(sim)
+            PROFILER.lap("policy", t)
+        else:
+            choice = policy(sim)
+        res = sim.step(choice)
+        if result is not None:
+            result.add_turn(res.age, sim.stats)
+    return sim
+
+def run_batch(policy: Policy, n_lives: int, rng,
+              birth: Optional[str] = None, era: Optional[str] = None,
+              sink: Optional[EventSink] = None, aggregate: bool = False,
+              root_seed: Optional[int] = None, first_life: int = 0) -> BatchResult:
+    """
+    Play n_lives headlessly on one rng; birth/era default to a random pick per life.
+    Given root_seed, rng is unused: life first_life + i plays on its own stream
+    (life_seed), so batch_life() can regenerate it alone.
+    With aggregate set, result.aggregate also collects a LifeAggregate.
+    """
+    result = BatchResult()
+    if aggregate:
+        result.aggregate = LifeAggregate()
+        sink = TeeSink(sink, result.aggregate) if sink is not None else result.aggregate
+    if root_seed is not None:
+        rng = random.Random()
+    for i in range(first_life, first_life + n_lives):
+        if root_seed is not None:
+            rng.seed(life_seed(root_seed, i))
+        sim = play_batch_life(policy, rng, birth, era, sink, result)
+        result.add_life(sim.ending, sim.stats)
+    return result
+
+def simulate(policy: Policy, n_lives: int, seed: Optional[int] = None,
+             birth: Optional[str] = None, era: Optional[str] = None) -> Dict[str, int]:
+    """
+    Run n_lives full lives headlessly and return ending text -> count.
+    birth/era default to a random pick per life; one seeded Random drives the whole batch.
+    """
+    return run_batch(policy, n_lives, random.Random(seed), birth, era).ending_counts
+
+# ------------- Vectorized Batch Kernel (NumPy) -------------
+
+class KernelTables:
+    """
+    Content flattened into fixed-width arrays for simulate_vectorized().
+    Every option the kernel can resolve lives in one flat table (opt_*);
+    menus, fillers and milestones are index arrays into it. Template and
+    trigger ids are era-local, since lives never leave their era without rifts.
+    """
+
+    NO_ENDING = 1 << 30
+
+    def __init__(self):
+        self.eras = [k for k, _label in ERAS]
+        self.bands = [b for b, _range in AGE_BANDS]
+        self.births = [k for k, _label in BIRTHS]
+        n_bands = len(self.bands)
+        self.tag_bits: Dict[str, int] = {}
+        deltas, risks, swings, tags, tids, weights = [], [], [], [], [], []
+
+        def add(o: Option, delta: Dict[str, int], tid: int) -> int:
+            mask = 0
+            for t in sorted(o.tags_set):
+                mask |= 1 << self.tag_bits.setdefault(t, len(self.tag_bits))
+            deltas.append(_delta_row(delta))
+            risks.append(o.risk_death)
+            swings.append(o.swing_prob if sum(delta.values()) < 0 else 0.0)
+            tags.append(mask)
+            tids.append(tid)
+            weights.append(o.weight)
+            return len(deltas) - 1
+
+        groups: List[List[int]] = []
+        quiet, humble = [], []
+        env_groups: List[List[int]] = []
+        env_deltas, env_tids, env_weights = [], [], []
+        self.n_templates = self.n_triggers = 0
+        catalog = option_catalog()
+        for era in self.eras:
+            tid_of: Dict[int, int] = {}
+            trig_of: Dict[Tuple[str, str], int] = {}
+            for band in self.bands:
+                groups.append([add(o, o.delta, tid_of.setdefault(o.template_id, len(tid_of)))
+                               for o in catalog.menu_pool(era, band)])
+                quiet.append(add(catalog.quiet_option(era, band), catalog.quiet_option(era, band).delta, -1))
+                h = humble_filler_option(era, 0, 0)
+                humble.append(add(h, h.delta, -1))
+                pool = []
+                sampler = trigger_sampler(era, band)
+                for (text, delta), w in zip(sampler.items, sampler.weights):
+                    env_deltas.append(_delta_row(delta))
+                    env_tids.append(trig_of.setdefault((band, text), len(trig_of)))
+                    env_weights.append(w)
+                    pool.append(len(env_deltas) - 1)
+                env_groups.append(pool)
+            self.n_templates = max(self.n_templates, len(tid_of))
+            self.n_triggers = max(self.n_triggers, len(trig_of))
+
+        ms = []
+        for era in self.eras:
+            ms.append([[add(o, o.delta, -1) for o in build_milestone_menu(era, m, current_band(m))]
+                       for m in MILESTONES])
+
+        width = max(3, max(len(r) for r in groups))   # a menu shows 3 entries
+        self.group_cands = np.full((len(groups), width), -1, dtype=np.int32)
+        for g, row in enumerate(groups):
+            self.group_cands[g, :len(row)] = row
+        self.group_quiet = np.array(quiet, dtype=np.int32)
+        self.group_humble = np.array(humble, dtype=np.int32)
+        self.ms_opts = np.array(ms, dtype=np.int32)          # (era, milestone, 2)
+        self.opt_delta = np.array(deltas, dtype=np.int32)
+        self.opt_risk = np.array(risks)
+        self.opt_swing = np.array(swings)
+        self.opt_tags = np.array(tags, dtype=np.int64)
+        self.opt_tid = np.array(tids, dtype=np.int32)
+        # weighted pools order candidates by u ** (1 / weight) (Efraimidis-Spirakis, the menu draw's
+        # distribution); None when all weigh 1
+        self.opt_invw = None if all(w == 1.0 for w in weights) else (1.0 / np.array(weights)).astype(np.float32)
+        # used templates are bit-packed into uint64 words: (word, bit) per option
+        self.n_words = max(1, (self.n_templates + 63) // 64)
+        self.opt_word = np.maximum(self.opt_tid, 0) >> 6
+        self.opt_bit = (np.uint64(1) << (np.maximum(self.opt_tid, 0) & 63).astype(np.uint64))
+        self.opt_risktag = (self.opt_tags & (1 << self.tag_bits["risk"])) != 0 \
+            if "risk" in self.tag_bits else np.zeros(len(tags), dtype=bool)
+        popcount = np.array([bin(i).count("1") for i in range(1 << len(self.tag_bits))], dtype=np.int32)
+        # bias_score() per (group, flags) for every candidate slot: one gather per menu
+        tags_by_slot = self.opt_tags[np.maximum(self.group_cands, 0)]
+        flag_values = np.arange(1 << len(self.tag_bits))
+        self.group_bias = popcount[tags_by_slot[:, None, :] & flag_values[None, :, None]].astype(np.float32)
+
+        k = max([1] + [len(p) for p in env_groups])
+        self.env_pool = np.full((len(env_groups), k), -1, dtype=np.int32)
+        for g, pool in enumerate(env_groups):
+            self.env_pool[g, :len(pool)] = pool
+        self.env_delta = np.array(env_deltas or [[0] * 5], dtype=np.int32)
+        self.env_tid = np.array(env_tids or [0], dtype=np.int32)
+        self.env_invw = None if all(w == 1.0 for w in env_weights) else 1.0 / np.array(env_weights)
+
+        self.n_bands = n_bands
+        self.band_of_age = np.array([self.bands.index(current_band(a)) for a in range(MAX_AGE + 1)], dtype=np.int32)
+        self.milestones = np.array(MILESTONES + [-1], dtype=np.int32)   # -1: no milestone left
+        self.start_stats = np.array([_delta_row(asdict(starting_stats(b))) for b in self.births], dtype=np.int32)
+        self.swing_up = np.array(_delta_row(SWING_UP), dtype=np.int32)
+        self.swing_down = np.array(_delta_row(SWING_DOWN), dtype=np.int32)
+        # special_rank[col][value]: the ending code that value triggers (lower code wins)
+        self.special_rank = np.full((len(STATS_KEYS), 101), self.NO_ENDING, dtype=np.int32)
+        for code, (k, _text) in enumerate(ZERO_ENDINGS):
+            self.special_rank[STATS_KEYS.index(k), 0] = code
+        for code, (k, _text) in enumerate(ACHIEVEMENT_ENDINGS, start=len(ZERO_ENDINGS)):
+            col = self.special_rank[STATS_KEYS.index(k)]
+            col[ACHIEVEMENT_TARGET:] = np.minimum(col[ACHIEVEMENT_TARGET:], code)
+
+        # Ending codes index into this list
+        self.endings = [t for _k, t in ZERO_ENDINGS] + [t for _k, t in ACHIEVEMENT_ENDINGS]
+        self.long_life_code = len(self.endings)
+        self.endings.append(LONG_LIFE_ENDING)
+        self.burnout_code = len(self.endings)
+        self.endings.append(BURNOUT_ENDING)
+        self.era_top_code = np.array([len(self.endings) + i for i in range(len(self.eras))], dtype=np.int32)
+        self.endings += [ERA_TOP_ENDINGS.get(e, "") for e in self.eras]
+        self.era_has_top = np.array([e in ERA_TOP_ENDINGS for e in self.eras])
+        self.score_codes = list(range(len(self.endings), len(self.endings) + len(SCORE_ENDINGS)))
+        self.endings += [t for _th, t in SCORE_ENDINGS]
+
+    def special_codes(self, s):
+        """Vector check_special_endings(): ending code per row, -1 where none."""
+        codes = self.special_rank[0][s[:, 0]]
+        for col in range(1, len(STATS_KEYS)):
+            np.minimum(codes, self.special_rank[col][s[:, col]], out=codes)
+        codes[codes == self.NO_ENDING] = -1
+        return codes
+
+    def page_codes(self, s, era_idx):
+        """Vector ending_for(); the score is summed in score()'s order so thresholds match exactly."""
+        sc = np.zeros(len(s))
+        for i, k in enumerate(STATS_KEYS):
+            sc = sc + s[:, i] * SCORE_WEIGHTS[k]
+        codes = np.full(len(s), self.score_codes[-1], dtype=np.int32)
+        for (threshold, _text), code in reversed(list(zip(SCORE_ENDINGS, self.score_codes))):
+            codes[sc >= threshold] = code
+        top = (sc >= TOP_SCORE) & self.era_has_top[era_idx]
+        codes[top] = self.era_top_code[era_idx[top]]
+        codes[s[:, 0] <= 0] = self.burnout_code
+        return codes
+
+_KERNEL_TABLES: Optional[KernelTables] = None
+
+def kernel_tables() -> KernelTables:
+    global _KERNEL_TABLES
+    if _KERNEL_TABLES is None:
+        _KERNEL_TABLES = KernelTables()
+    return _KERNEL_TABLES
+
+def _run_kernel_chunk(tb: KernelTables, gen, n: int, birth_idx, era_idx):
+    """
+    Step n lives in lockstep until all end.
+    Returns (ending codes, final stats (n, 5), per-age [chapters, stat sums...] (MAX_AGE+1, 6)).
+    State arrays only hold the still-active lives and are compacted every
+    chapter; `ids` maps each active row back to its slot in `ending`.
+    """
+    ending = np.full(n, -1, dtype=np.int32)
+    final_stats = np.zeros((n, len(STATS_KEYS)), dtype=np.int16)
+    per_age = np.zeros((MAX_AGE + 1, 1 + len(STATS_KEYS)), dtype=np.int64)
+    ids = np.arange(n)
+    era = np.asarray(era_idx, dtype=np.int32)
+    stats = tb.start_stats[birth_idx].astype(np.int16)
+    age = np.zeros(n, dtype=np.int32)
+    ms_next = np.zeros(n, dtype=np.int32)
+    flags = np.zeros(n, dtype=np.int64)
+    used = np.zeros((n, tb.n_words), dtype=np.uint64)
+    used_env = np.zeros((n, max(1, tb.n_triggers)), dtype=bool)
+    lo, hi = AGE_STEP_MIN_MAX
+
+    for chapter in range(1, CHAPTER_LIMIT + 1):
+        m = ids.size
+        if m == 0:
+            break
+        rows = np.arange(m)
+        chosen = np.empty(m, dtype=np.int32)
+
+        # Milestone chapters: two fixed options
+        is_ms = age == tb.milestones[ms_next]
+        mi = np.flatnonzero(is_ms)
+        if mi.size:
+            chosen[mi] = tb.ms_opts[era[mi], ms_next[mi], gen.integers(0, 2, size=mi.size)]
+            ms_next[mi] += 1
+
+        # Regular chapters: shuffle-then-stable-sort by bias == sort on (bias + uniform tiebreak)
+        ni = np.flatnonzero(~is_ms)
+        if ni.size:
+            g = era[ni] * tb.n_bands + tb.band_of_age[age[ni]]
+            cands = tb.group_cands[g]
+            safe = np.maximum(cands, 0)
+            if tb.n_words == 1:
+                words = used[ni, :1]
+            else:
+                words = np.take_along_axis(used[ni], tb.opt_word[safe], axis=1)
+            avail = (cands >= 0) & ((words & tb.opt_bit[safe]) == 0)
+            u = gen.random(cands.shape, dtype=np.float32)
+            if tb.opt_invw is not None:
+                u **= tb.opt_invw[safe]
+            key = tb.group_bias[g, flags[ni]] + u
+            key[~avail] = -1
+            n_avail = avail.sum(axis=1)
+            slot = gen.integers(0, 3, size=ni.size)       # random_policy on a 3-entry menu
+            # The slot-th best key: knock out the best one `slot` times (cheaper than argsort)
+            for k in (1, 2):
+                deeper = np.flatnonzero(slot >= k)
+                key[deeper, key[deeper].argmax(axis=1)] = -2
+            picked = cands[rows[:ni.size], key.argmax(axis=1)]
+            filler = np.where((n_avail == 0) & (slot == 0), tb.group_quiet[g], tb.group_humble[g])
+            chosen[ni] = np.where(slot < n_avail, picked, filler)
+
+        tid = tb.opt_tid[chosen]
+        mark = np.flatnonzero(tid >= 0)
+        used[mark, tb.opt_word[chosen[mark]]] |= tb.opt_bit[chosen[mark]]
+        flags |= tb.opt_tags[chosen]
+
+        # resolve_outcome(): delta, swing, death
+        s = stats + tb.opt_delta[chosen]
+        np.clip(s, 0, 100, out=s)
+        swung = gen.random(m) < tb.opt_swing[chosen]
+        if swung.any():
+            up = gen.random(m) < 0.5
+            s[swung & up] += tb.swing_up
+            s[swung & ~up] += tb.swing_down
+            np.clip(s, 0, 100, out=s)
+        death_prob = tb.opt_risk[chosen] + 0.10 * (tb.opt_risktag[chosen] & (s[:, 0] <= 10))
+        s[gen.random(m) < death_prob, 0] = 0
+
+        # random_variation()
+        s += gen.integers(-VARIATION_SPREAD, VARIATION_SPREAD + 1, size=(m, 5), dtype=np.int16)
+        np.clip(s, 0, 100, out=s)
+        code = tb.special_codes(s)
+
+        # maybe_env_trigger() for lives still going
+        ei = np.flatnonzero((code < 0) & (gen.random(m) < ENV_TRIGGER_PROB))
+        if ei.size:
+            pool = tb.env_pool[era[ei] * tb.n_bands + tb.band_of_age[age[ei]]]
+            valid = pool >= 0
+            etid = np.where(valid, tb.env_tid[pool], 0)
+            free = valid & ~np.take_along_axis(used_env[ei], etid, axis=1)
+            u = gen.random(pool.shape)
+            if tb.env_invw is not None:
+                u **= tb.env_invw[np.maximum(pool, 0)]
+            best = np.where(free, u, -1.0).argmax(axis=1)
+            hit = free[rows[:ei.size], best]
+            ei, trig = ei[hit], pool[hit, best[hit]]
+            used_env[ei, tb.env_tid[trig]] = True
+            s[ei] = np.clip(s[ei] + tb.env_delta[trig], 0, 100)
+            code[ei] = tb.special_codes(s[ei])
+        stats = s
+        per_age[:, 0] += np.bincount(age, minlength=MAX_AGE + 1)
+        for col in range(len(STATS_KEYS)):
+            per_age[:, 1 + col] += np.bincount(age, weights=s[:, col], minlength=MAX_AGE + 1).astype(np.int64)
+
+        # random_age_step() + cap_age_step_to_milestone()
+        step = gen.integers(lo, np.where(age <= 2, max(2, hi - 2), hi) + 1)
+        nxt = tb.milestones[ms_next]
+        step = np.where((nxt >= 0) & (age + step > nxt), np.maximum(1, nxt - age), step)
+        age = np.minimum(MAX_AGE, age + step)
+        code[(code < 0) & (age >= MAX_AGE)] = tb.long_life_code
+        if chapter == CHAPTER_LIMIT:
+            rest = code < 0
+            code[rest] = tb.page_codes(stats[rest], era[rest])
+
+        # Drop finished lives from the active set
+        ended = code >= 0
+        ending[ids[ended]] = code[ended]
+        final_stats[ids[ended]] = stats[ended]
+        if ended.any():
+            keep = ~ended
+            ids, era, stats, age, ms_next, flags = ids[keep], era[keep], stats[keep], age[keep], ms_next[keep], flags[keep]
+            used, used_env = used[keep], used_env[keep]
+    return ending, final_stats, per_age
+
+def run_batch_vectorized(n_lives: int, gen, birth: Optional[str] = None, era: Optional[str] = None,
+                         chunk_size: int = 1 << 18) -> BatchResult:
+    """Kernel counterpart of run_batch(random_policy, ...), drawing from a NumPy Generator."""
+    if np is None:
+        raise RuntimeError("The vectorized kernel requires NumPy (pip install numpy).")
+    tb = kernel_tables()
+    totals = np.zeros(len(tb.endings), dtype=np.int64)
+    stat_sums = np.zeros(len(STATS_KEYS), dtype=np.int64)
+    per_age = np.zeros((MAX_AGE + 1, 1 + len(STATS_KEYS)), dtype=np.int64)
+    done = 0
+    while done < n_lives:
+        n = min(chunk_size, n_lives - done)
+        birth_idx = np.full(n, tb.births.index(birth)) if birth else gen.integers(0, len(tb.births), size=n)
+        era_idx = np.full(n, tb.eras.index(era)) if era else gen.integers(0, len(tb.eras), size=n)
+        codes, final_stats, chunk_ages = _run_kernel_chunk(tb, gen, n, birth_idx, era_idx)
+        totals += np.bincount(codes, minlength=len(tb.endings))
+        stat_sums += final_stats.sum(axis=0, dtype=np.int64)
+        per_age += chunk_ages
+        done += n
+    result = BatchResult(n_lives=n_lives, stat_sums=stat_sums.tolist(),
+                         age_counts=per_age[:, 0].tolist(), age_stat_sums=per_age[:, 1:].tolist())
+    for code, c in enumerate(totals.tolist()):
+        if c:
+            result.ending_counts[tb.endings[code]] = result.ending_counts.get(tb.endings[code], 0) + c
+    return result
+
+def simulate_vectorized(n_lives: int, seed: Optional[int] = None,
+                        birth: Optional[str] = None, era: Optional[str] = None,
+                        chunk_size: int = 1 << 18) -> Dict[str, int]:
+    """
+    Struct-of-arrays counterpart of simulate(random_policy, ...): every active
+    life advances one chapter per batch of array operations. Results match the
+    scalar rules in distribution, not draw-for-draw.
+    """
+    if np is None:
+        raise RuntimeError("simulate_vectorized() requires NumPy (pip install numpy).")
+    return run_batch_vectorized(n_lives, np.random.default_rng(seed), birth, era, chunk_size).ending_counts
+
+# ------------- Parallel Batch Runner -------------
+
+POLICIES: Dict[str, Policy] = {
+    "random": random_policy,
+    "study": study_policy,
+    "greedy": greedy_policy,
+    "cautious": cautious_policy,
+    "rift": rift_policy,
+    "bias": bias_policy,
+}
+
+def derive_seed(root_seed: int, *path: int) -> int:
+    """
+    128-bit child seed for the stream at `path` under root_seed (SeedSequence-style
+    spawn key). Streams at different paths are statistically independent, and the
+    derivation does not depend on the process or PYTHONHASHSEED.
+    """
+    key = ",".join(str(x) for x in (root_seed,) + path)
+    return int.from_bytes(hashlib.blake2b(key.encode("ascii"), digest_size=16).digest(), "little")
+
+LIFE_STREAM = 1   # derive_seed path prefix for per-life streams (vectorized shards use the bare shard index)
+
+def life_seed(root_seed: int, index: int) -> int:
+    """Seed of life #index in a scalar batch run: one hash away, whatever the sharding."""
+    return derive_seed(root_seed, LIFE_STREAM, index)
+
+_POLICY_TABLES: Dict[str, "PolicyTable"] = {}
+
+def load_policy_table(path: str) -> "PolicyTable":
+    """Per-process cache so each worker reads a policy file once."""
+    if path not in _POLICY_TABLES:
+        _POLICY_TABLES[path] = PolicyTable.load(path)
+    return _POLICY_TABLES[path]
+
+def _shard_policy(policy_name: str, policy_file: Optional[str]) -> Policy:
+    return table_policy(load_policy_table(policy_file)) if policy_file else POLICIES[policy_name]
+
+def _run_shard(shard: int, start: int, n_lives: int, root_seed: int, policy_name: str,
+               birth: Optional[str], era: Optional[str], vectorized: bool,
+               policy_file: Optional[str] = None, sink: Optional[EventSink] = None,
+               profile: bool = False, aggregate: bool = False):
+    """Lives start .. start + n_lives as a BatchResult, paired with a profiler snapshot when profile is set."""
+    if vectorized:
+        return run_batch_vectorized(n_lives, np.random.default_rng(derive_seed(root_seed, shard)), birth, era)
+    policy = _shard_policy(policy_name, policy_file)
+    if not profile:
+        return run_batch(policy, n_lives, None, birth, era, sink, aggregate, root_seed, start)
+    PROFILER.reset()
+    PROFILER.enabled = True
+    try:
+        result = run_batch(policy, n_lives, None, birth, era, sink, aggregate, root_seed, start)
+    finally:
+        PROFILER.enabled = False
+    return result, PROFILER.snapshot()
+
+def run_parallel_batch(n_lives: int, root_seed: int, workers: int = 1, shard_size: int = 2000,
+                       policy_name: str = "random", birth: Optional[str] = None,
+                       era: Optional[str] = None, vectorized: bool = False,
+                       policy_file: Optional[str] = None, sink: Optional[EventSink] = None,
+                       profiler: Optional[PhaseProfiler] = None, aggregate: bool = False) -> BatchResult:
+    """
+    Split a run into fixed-size shards and merge results as they arrive.
+    Scalar lives each play on their own stream life_seed(root_seed, index),
+    so the merged result is identical for any worker count or shard size, and
+    batch_life() regenerates any one life directly. The vectorized kernel
+    draws one NumPy stream per shard instead, so its results depend on
+    shard_size (never on the worker count) and its lives cannot be regenerated.
+    An event sink sees lives in shard order, so it needs workers=1. A
+    profiler, if given, receives the merged phase timings of every shard.
+    With aggregate set, every shard streams into its own LifeAggregate and
+    result.aggregate is their exact merge.
+    """
+    if vectorized and (policy_name != "random" or policy_file):
+        raise ValueError("The vectorized kernel only plays the 'random' policy.")
+    if sink is not None and (workers > 1 or vectorized):
+        raise ValueError("Event sinks need workers=1 and the scalar engine.")
+    if profiler is not None and vectorized:
+        raise ValueError("Phase profiling covers the scalar engine only.")
+    if aggregate and vectorized:
+        raise ValueError("Streaming aggregates need the scalar engine (the kernel has no turn events).")
+    shards = [(i, start, min(shard_size, n_lives - start))
+              for i, start in enumerate(range(0, n_lives, shard_size))]
+    total = BatchResult()
+    profile = profiler is not None
+
+    def collect(out):
+        if profile:
+            out, snap = out
+            profiler.merge(snap)
+        total.merge(out)
+
+    if workers <= 1:
+        for i, start, n in shards:
+            collect(_run_shard(i, start, n, root_seed, policy_name, birth, era, vectorized, policy_file, sink,
+                               profile, aggregate))
+        return total
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_shard, i, start, n, root_seed, policy_name, birth, era, vectorized,
+                               policy_file, None, profile, aggregate)
+                   for i, start, n in shards]
+        for fut in as_completed(futures):
+            collect(fut.result())
+    return total
+
+def batch_life(root_seed: int, index: int, policy_name: str = "random",
+               birth: Optional[str] = None, era: Optional[str] = None,
+               policy_file: Optional[str] = None, sink: Optional[EventSink] = None) -> LifeSimulation:
+    """
+    Regenerate life #index (0-based) of a scalar batch run on root_seed without
+    playing any life before it. policy/birth/era must match the original run.
+    """
+    rng = random.Random(life_seed(root_seed, index))
+    return play_batch_life(_shard_policy(policy_name, policy_file), rng, birth, era, sink)
+
+def print_batch_report(result: BatchResult):
+    print("Lives: {0}   Mean score: {1:.2f}".format(result.n_lives, result.mean_score))
+    for ending, c in sorted(result.ending_counts.items(), key=lambda kv: (-kv[1], kv[0])):
+        print("  {0:7.3f}%  {1:>9}  {2}".format(100.0 * c / result.n_lives, c, ending))
+
+def batch_main(args: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog="life_restart.py", description="Headless batch simulation.")
+    ap.add_argument("--lives", type=int, default=10000, help="number of lives to simulate")
+    ap.add_argument("--workers", type=int, default=1, help="process-pool size")
+    ap.add_argument("--seed", type=int, default=None, help="root seed (random if omitted)")
+    ap.add_argument("--shard-size", type=int, default=2000, help="lives per shard (fixes the seed streams)")
+    ap.add_argument("--policy", choices=sorted(POLICIES), default="random")
+    ap.add_argument("--birth", choices=[k for k, _label in BIRTHS])
+    ap.add_argument("--era", choices=[k for k, _label in ERAS])
+    ap.add_argument("--vectorized", action="store_true", help="use the NumPy kernel inside each shard")
+    ap.add_argument("--json", metavar="PATH", help="also write the merged result as JSON")
+    ap.add_argument("--policy-file", metavar="PATH", help="play a solved policy table (overrides --policy)")
+    ap.add_argument("--solve", metavar="PATH",
+                    help="solve --era for --objective and write the policy table (an approximate model, see README)")
+    ap.add_argument("--objective", choices=POLICY_OBJECTIVES, default="achieve")
+    ap.add_argument("--events", metavar="PATH", help="stream life events to PATH (.jsonl, else binary)")
+    ap.add_argument("--history", metavar="DIR", help="append every chapter to the columnar history store DIR")
+    ap.add_argument("--profile", action="store_true", help="print per-phase timings and counters")
+    ap.add_argument("--profile-out", metavar="PATH", help="write a collapsed-stack profile (implies --profile)")
+    ap.add_argument("--stats", metavar="PATH",
+                    help="write per-(birth, era, ending) streaming statistics as JSON")
+    ap.add_argument("--life", type=int, metavar="K",
+                    help="narrate life #K (0-based) of the --seed run instead of running the batch")
+    ap.add_argument("--sweep", metavar="SPEC", help="evaluate a JSON grid/random sweep of SWEEP_PARAMS")
+    ap.add_argument("--sweep-cache", metavar="PATH", help="SQLite cache of evaluated sweep points")
+    ap.add_argument("--tournament", nargs="*", metavar="AGENT",
+                    help="rank agents (POLICIES names or policy files; all built-ins if none) "
+                         "over every birth x era start, --lives each")
+    ap.add_argument("--rare", metavar="ENDING",
+                    help="estimate P(ENDING) (any unambiguous part of its text) by multilevel splitting, "
+                         "--lives particles per stage")
+    ap.add_argument("--runs", type=int, default=30,
+                    help="independent splitting runs behind the --rare interval (prefer more runs to more particles)")
+    opts = ap.parse_args(args)
+    if opts.life is not None:
+        if opts.seed is None:
+            ap.error("--life needs the run's --seed")
+        if opts.vectorized:
+            ap.error("--life regenerates scalar-engine lives only")
+        log = TextLog()
+        sim = batch_life(opts.seed, opts.life, opts.policy, opts.birth, opts.era, opts.policy_file, log)
+        out = TextOut()
+        out.print("##### Life {0} of root seed {1} ({2} chapters) #####".format(opts.life, opts.seed, sim.chapter))
+        print_ending(out, sim, log)
+        sys.stdout.write(out.drain())
+        return 0
+    if opts.solve:
+        if not opts.era:
+            ap.error("--solve needs --era")
+        table = PolicySolver(opts.era, opts.objective).solve()
+        table.save(opts.solve)
+        starts = ", ".join("{0} {1}".format(b, "-" if v is None else "{0:.4f}".format(v))
+                           for b, v in table.header["start_values"].items())
+        print("Wrote {0} ({1} stages; approximate model value of the starting bucket by birth: {2})".format(
+            opts.solve, len(table.stages), starts))
+        return 0
+    root = opts.seed if opts.seed is not None else random.SystemRandom().randrange(1 << 63)
+    if opts.sweep:
+        if opts.vectorized:
+            ap.error("--sweep runs the scalar engine (it relies on per-life streams)")
+        return sweep_main(ap, opts, root)
+    if opts.rare:
+        if opts.vectorized:
+            ap.error("--rare clones scalar-engine lives")
+        if opts.runs < 2:
+            ap.error("--rare needs --runs 2 or more for its interval")
+        try:
+            rare_target(opts.rare)
+        except ValueError as exc:
+            ap.error("--rare: {0}".format(exc))
+        est = run_rare(opts.rare, opts.lives, opts.runs, root, opts.workers, opts.policy, opts.policy_file,
+                       opts.birth, opts.era)
+        print("Root seed: {0}".format(root))
+        print_rare_report(est)
+        if opts.json:
+            with open(opts.json, "w", encoding="utf-8") as fh:
+                json.dump(dict(est.to_json(), root_seed=root), fh, indent=2)
+        return 0
+    if opts.tournament is not None:
+        entrants = opts.tournament or sorted(POLICIES)
+        entries = run_tournament(entrants, opts.lives, root, opts.workers, opts.shard_size)
+        print("Root seed: {0}   Lives per start: {1}".format(root, opts.lives))
+        print_tournament_report(entries, opts.objective)
+        if opts.json:
+            with open(opts.json, "w", encoding="utf-8") as fh:
+                json.dump({"root_seed": root, "objective": opts.objective,
+                           "entries": [t.to_json() for t in entries]}, fh, indent=2)
+        return 0
+    sinks = ([open_event_sink(opts.events)] if opts.events else []) + \
+            ([HistoryWriter(opts.history)] if opts.history else [])
+    sink = sinks[0] if len(sinks) == 1 else (TeeSink(*sinks) if sinks else None)
+    profiler = PhaseProfiler() if opts.profile or opts.profile_out else None
+    try:
+        result = run_parallel_batch(opts.lives, root, opts.workers, opts.shard_size, opts.policy,
+                                    opts.birth, opts.era, opts.vectorized, opts.policy_file, sink, profiler,
+                                    aggregate=bool(opts.stats))
+    finally:
+        if sink is not None:
+            sink.close()
+    print("Root seed: {0}".format(root))
+    print_batch_report(result)
+    if profiler is not None:
+        print(profiler.summary())
+        if opts.profile_out:
+            with open(opts.profile_out, "w", encoding="utf-8") as fh:
+                fh.write(profiler.collapsed("batch"))
+    if opts.json:
+        with open(opts.json, "w", encoding="utf-8") as fh:
+            json.dump(dict(result.to_json(), root_seed=root), fh, indent=2)
+    if opts.stats:
+        with open(opts.stats, "w", encoding="utf-8") as fh:
+            json.dump(dict(result.aggregate.to_json(), root_seed=root), fh, indent=2)
+    return 0
+
+# ------------- Parameter Sweeps -------------
+#
+# A sweep point is a dict of overrides for the balance constants named in
+# SWEEP_PARAMS. Every point plays the same scalar batch lives, because life #k
+# always uses life_seed(root, k). Points therefore share common random numbers,
+# and the gap between two points is estimated from per-life differences. The
+# per-life records (score, ending) are cached in SQLite by point, so growing a
+# grid or raising n_lives only plays what is missing.
+
+SWEEP_PARAMS: Dict[str, Tuple[str, tuple]] = {      # name -> (module global, key path inside it)
+    "env_trigger_prob": ("ENV_TRIGGER_PROB", ()),
+    "achievement_target": ("ACHIEVEMENT_TARGET", ()),
+    "age_step_min": ("AGE_STEP_MIN_MAX", (0,)),
+    "age_step_max": ("AGE_STEP_MIN_MAX", (1,)),
+    **{"birth.{0}.{1}".format(b, k): ("BIRTH_MODS", (b, k)) for b, _label in BIRTHS for k in STATS_KEYS},
+    **{"risk.{0}.{1}".format(name, part): ("OPTION_RISKS", (name, i))
+       for name in OPTION_RISKS for i, part in enumerate(("death", "swing"))},
+}
+SWEEP_CACHE_VERSION = 1   # bump when engine changes alter results for unchanged content
+
+def _get_path(obj, path: tuple):
+    for key in path:
+        obj = obj.get(key, 0) if isinstance(obj, dict) else obj[key]
+    return obj
+
+def _with_path(obj, path: tuple, value):
+    """Copy of obj with the value at path replaced (dicts and tuples copied along the path)."""
+    if not path:
+        return value
+    key, rest = path[0], path[1:]
+    if isinstance(obj, dict):
+        out = dict(obj)
+        out[key] = _with_path(obj.get(key, {} if rest else 0), rest, value)
+        return out
+    out = list(obj)
+    out[key] = _with_path(obj[key], rest, value)
+    return tuple(out)
+
+def sweep_defaults() -> Dict[str, object]:
+    return {name: _get_path(globals()[g], path) for name, (g, path) in SWEEP_PARAMS.items()}
+
+def sweep_bounds(name: str) -> Tuple[float, float]:
+    """Inclusive range of a sweep parameter."""
+    g, path = SWEEP_PARAMS[name]
+    if g in ("ENV_TRIGGER_PROB", "OPTION_RISKS"):
+        return 0.0, 1.0
+    if g == "ACHIEVEMENT_TARGET":
+        return 2, 100            # every living stat is at least 1, so a lower target is met at once
+    if g == "AGE_STEP_MIN_MAX":
+        return 1, MAX_AGE
+    base = getattr(starting_stats(path[0]), path[1]) - _get_path(BIRTH_MODS, path)
+    return 1 - base, 100 - base  # a starting stat of 0 would end the life on its first chapter
+
+def normalize_point(params: Dict[str, object]) -> Dict[str, object]:
+    """Validated overrides with default-valued entries dropped, so equal points share a cache key."""
+    defaults = sweep_defaults()
+    out = {}
+    for name, value in params.items():
+        if name not in SWEEP_PARAMS:
+            raise ValueError("Unknown sweep parameter {0!r}.".format(name))
+        if not isinstance(value, (int, float)) or isinstance(value, bool) or value != value:
+            raise ValueError("Sweep parameter {0} takes a number, got {1!r}.".format(name, value))
+        if isinstance(defaults[name], int):
+            if isinstance(value, float) and not value.is_integer():
+                raise ValueError("Sweep parameter {0} takes integers, got {1}.".format(name, value))
+            value = int(value)
+        else:
+            value = float(value)
+        lo, hi = sweep_bounds(name)
+        if not lo <= value <= hi:
+            raise ValueError("Sweep parameter {0} must lie in [{1:g}, {2:g}], got {3}.".format(name, lo, hi, value))
+        if value != defaults[name]:
+            out[name] = value
+    lo = out.get("age_step_min", defaults["age_step_min"])
+    hi = out.get("age_step_max", defaults["age_step_max"])
+    if not 1 <= lo <= hi:
+        raise ValueError("Need 1 <= age_step_min <= age_step_max, got {0}..{1}.".format(lo, hi))
+    return dict(sorted(out.items()))
+
+def apply_sweep_params(params: Dict[str, object]) -> Dict[str, object]:
+    """Set the overrides as module globals; returns the globals to hand to restore_sweep_params()."""
+    saved = {}
+    for name, value in params.items():
+        g, path = SWEEP_PARAMS[name]
+        saved.setdefault(g, globals()[g])
+        globals()[g] = _with_path(globals()[g], path, value)
+    _reset_tuned_caches()
+    return saved
+
+def restore_sweep_params(saved: Dict[str, object]):
+    globals().update(saved)
+    _reset_tuned_caches()
+
+def _reset_tuned_caches():
+    global _OPTION_CATALOG, _KERNEL_TABLES, _CONTENT_VERSION
+    _OPTION_CATALOG = _KERNEL_TABLES = _CONTENT_VERSION = None   # all bake in option risks / thresholds
+
+def grid_points(grid: Dict[str, List]) -> List[Dict[str, object]]:
+    """Cartesian product of the listed values, in the order given."""
+    if not isinstance(grid, dict):
+        raise ValueError("'grid' maps parameter names to lists of values.")
+    points: List[Dict[str, object]] = [{}]
+    for name, values in grid.items():
+        if not isinstance(values, list):
+            raise ValueError("Grid values for {0} must be a list, got {1!r}.".format(name, values))
+        points = [dict(p, **{name: v}) for p in points for v in values]
+    return points
+
+def random_points(space: Dict[str, Tuple[float, float]], n: int, seed: int = 0) -> List[Dict[str, object]]:
+    """n points drawn uniformly from [lo, hi] per parameter (integers for integer parameters)."""
+    rng = random.Random(seed)
+    defaults = sweep_defaults()
+    points = []
+    for _ in range(n):
+        p = {}
+        for name, (lo, hi) in space.items():
+            if name not in defaults:
+                raise ValueError("Unknown sweep parameter {0!r}.".format(name))
+            if not all(isinstance(x, (int, float)) and not isinstance(x, bool) for x in (lo, hi)):
+                raise ValueError("Random range for {0} must be two numbers, got {1!r}.".format(name, [lo, hi]))
+            p[name] = rng.randint(int(lo), int(hi)) if isinstance(defaults[name], int) else rng.uniform(lo, hi)
+        points.append(p)
+    return points
+
+class _LifeTape(EventSink):
+    """Per-life (score in tenths, ending index) records of one batch chunk."""
+
+    def __init__(self):
+        self.endings: List[str] = []
+        self._index: Dict[str, int] = {}
+        self.scores: List[int] = []
+        self.ending_ix: List[int] = []
+
+    def life_end(self, sim):
+        self.scores.append(round(score(sim.stats) * SCORE_SCALE))
+        ix = self._index.get(sim.ending)
+        if ix is None:
+            ix = self._index[sim.ending] = len(self.endings)
+            self.endings.append(sim.ending)
+        self.ending_ix.append(ix)
+
+@dataclass
+class SweepPoint:
+    """One evaluated point: the overrides and a per-life record of lives 0 .. n_lives - 1."""
+    params: Dict[str, object]
+    endings: List[str] = field(default_factory=list)
+    scores: List[int] = field(default_factory=list)      # score() x SCORE_SCALE, per life
+    ending_ix: List[int] = field(default_factory=list)   # index into endings, per life
+
+    @property
+    def n_lives(self) -> int:
+        return len(self.scores)
+
+    @property
+    def mean_score(self) -> float:
+        return sum(self.scores) / SCORE_SCALE / len(self.scores) if self.scores else 0.0
+
+    @property
+    def ending_counts(self) -> Dict[str, int]:
+        counts = [0] * len(self.endings)
+        for ix in self.ending_ix:
+            counts[ix] += 1
+        return {e: c for e, c in zip(self.endings, counts) if c}
+
+    def extend(self, tape: _LifeTape):
+        remap = []
+        for e in tape.endings:
+            if e not in self.endings:
+                self.endings.append(e)
+            remap.append(self.endings.index(e))
+        self.scores.extend(tape.scores)
+        self.ending_ix.extend(remap[ix] for ix in tape.ending_ix)
+
+    def head(self, n: int) -> "SweepPoint":
+        return SweepPoint(self.params, list(self.endings), self.scores[:n], self.ending_ix[:n])
+
+    def diff(self, base: "SweepPoint") -> Tuple[float, float]:
+        """Mean score gap to base and its standard error, paired life by life (common random numbers)."""
+        m = Moments()
+        for a, b in zip(self.scores, base.scores):
+            m.add(a - b)
+        return m.mean / SCORE_SCALE, (m.variance / m.n) ** 0.5 / SCORE_SCALE if m.n else 0.0
+
+    def to_json(self) -> dict:
+        return {"params": self.params, "n_lives": self.n_lives, "mean_score": self.mean_score,
+                "ending_counts": dict(sorted(self.ending_counts.items()))}
+
+class SweepCache:
+    """SQLite store of per-life sweep records, keyed by point, run setup and content version."""
+
+    SCHEMA = ("CREATE TABLE IF NOT EXISTS points (key TEXT PRIMARY KEY, params TEXT NOT NULL, "
+              "endings TEXT NOT NULL, lives BLOB NOT NULL)")
+    LOOKUP = "SELECT endings, lives FROM points WHERE key = ?"
+    STORE = "INSERT OR REPLACE INTO points (key, params, endings, lives) VALUES (?, ?, ?, ?)"
+    _LIFE = struct.Struct("<HH")   # score x SCORE_SCALE, ending index
+
+    def __init__(self, path: Optional[str] = None):
+        self._db = sqlite3.connect(path or ":memory:", isolation_level=None)
+        self._db.execute(self.SCHEMA)
+
+    @staticmethod
+    def key(params: Dict[str, object], setup: dict) -> str:
+        raw = json.dumps({"params": params, "setup": setup, "v": SWEEP_CACHE_VERSION}, sort_keys=True)
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+    def get(self, key: str, params: Dict[str, object]) -> SweepPoint:
+        row = self._db.execute(self.LOOKUP, (key,)).fetchone()
+        point = SweepPoint(params)
+        if row is not None:
+            point.endings = json.loads(row[0])
+            for s, ix in self._LIFE.iter_unpack(row[1]):
+                point.scores.append(s)
+                point.ending_ix.append(ix)
+        return point
+
+    def put(self, key: str, point: SweepPoint):
+        lives = b"".join(self._LIFE.pack(s, ix) for s, ix in zip(point.scores, point.ending_ix))
+        self._db.execute(self.STORE, (key, json.dumps(point.params), json.dumps(point.endings), lives))
+
+    def close(self):
+        self._db.close()
+
+def _sweep_chunk(params: Dict[str, object], start: int, n_lives: int, root_seed: int, policy_name: str,
+                 policy_file: Optional[str], birth: Optional[str], era: Optional[str]) -> _LifeTape:
+    """Play lives start .. start + n_lives under the overrides (in whichever process runs it)."""
+    tape = _LifeTape()
+    saved = apply_sweep_params(params)
+    try:
+        run_batch(_shard_policy(policy_name, policy_file), n_lives, None, birth, era, tape,
+                  root_seed=root_seed, first_life=start)
+    finally:
+        restore_sweep_params(saved)
+    return tape
+
+def run_sweep(points: List[Dict[str, object]], n_lives: int, root_seed: int, workers: int = 1,
+              cache: Optional[SweepCache] = None, policy_name: str = "random",
+              policy_file: Optional[str] = None, birth: Optional[str] = None,
+              era: Optional[str] = None) -> List[SweepPoint]:
+    """
+    Evaluate every point on lives 0 .. n_lives - 1 of root_seed, reusing and
+    extending cached records. Results come back in the order of points.
+    """
+    cache = cache or SweepCache()
+    setup = {"root": root_seed, "policy": policy_file or policy_name, "birth": birth, "era": era,
+             "content": content_version()}
+    if policy_file:
+        with open(policy_file, "rb") as fh:
+            setup["policy_digest"] = hashlib.blake2b(fh.read(), digest_size=16).hexdigest()
+    normalized = [normalize_point(p) for p in points]
+    keys = [SweepCache.key(p, setup) for p in normalized]
+    results: Dict[str, SweepPoint] = {}
+    todo = []
+    for key, params in zip(keys, normalized):
+        if key not in results:
+            results[key] = point = cache.get(key, params)
+            if point.n_lives < n_lives:
+                todo.append(key)
+
+    def finish(key: str, tape: _LifeTape):
+        results[key].extend(tape)
+        cache.put(key, results[key])
+
+    def chunk_args(key: str):
+        p = results[key]
+        return (p.params, p.n_lives, n_lives - p.n_lives, root_seed, policy_name, policy_file, birth, era)
+
+    if workers <= 1:
+        for key in todo:
+            finish(key, _sweep_chunk(*chunk_args(key)))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_sweep_chunk, *chunk_args(key)): key for key in todo}
+            for fut in as_completed(futures):
+                finish(futures[fut], fut.result())
+    return [results[key].head(n_lives) for key in keys]
+
+def print_sweep_report(points: List[SweepPoint]):
+    """Mean score per point and its CRN-paired gap to the first point (the baseline)."""
+    base = points[0]
+    print("{0:>9} {1:>17}  {2}".format("mean", "vs baseline", "overrides"))
+    for p in points:
+        gap, se = p.diff(base)
+        label = ", ".join("{0}={1:.4g}".format(k, v) for k, v in p.params.items()) or "(defaults)"
+        print("{0:9.2f} {1:+9.2f} +-{2:5.2f}  {3}".format(p.mean_score, gap, se, label))
+
+def sweep_main(ap: argparse.ArgumentParser, opts, root: int) -> int:
+    """--sweep SPEC: {"grid": {name: [values]}} or {"random": {name: [lo, hi]}, "points": n, "seed": s}."""
+    try:
+        with open(opts.sweep, "r", encoding="utf-8") as fh:
+            spec = json.load(fh)
+        if not isinstance(spec, dict):
+            raise ValueError("a sweep spec is a JSON object.")
+        if "grid" in spec:
+            points = grid_points(spec["grid"])
+        elif "random" in spec:
+            space = spec["random"]
+            if not isinstance(space, dict) or not all(isinstance(v, list) and len(v) == 2 for v in space.values()):
+                raise ValueError("'random' maps parameter names to [lo, hi] ranges.")
+            if not all(type(spec.get(k, 0)) is int for k in ("points", "seed")):
+                raise ValueError("'points' and 'seed' take integers.")
+            points = random_points({k: tuple(v) for k, v in space.items()}, spec.get("points", 10),
+                                   spec.get("seed", 0))
+        else:
+            raise ValueError("a sweep spec needs a 'grid' or a 'random' section.")
+        for p in points:
+            normalize_point(p)     # reject bad names and values before any lives run
+    except (OSError, ValueError) as exc:
+        ap.error("{0}: {1}".format(opts.sweep, exc))
+    points = [{}] + points     # the defaults, as the baseline every gap is measured against
+    cache = SweepCache(opts.sweep_cache)
+    try:
+        results = run_sweep(points, opts.lives, root, opts.workers, cache, opts.policy,
+                            opts.policy_file, opts.birth, opts.era)
+    finally:
+        cache.close()
+    print("Root seed: {0}   Lives per point: {1}".format(root, opts.lives))
+    print_sweep_report(results)
+    if opts.json:
+        with open(opts.json, "w", encoding="utf-8") as fh:
+            json.dump({"root_seed": root, "points": [p.to_json() for p in results]}, fh, indent=2)
+    return 0
+
+# ------------- Policy Tournament -------------
+#
+# Every entrant plays lives_per_start lives from each BIRTHS x ERAS start.
+# Within a start all entrants draw life #k from the same seed, so rankings
+# compare agents on shared luck. Starts get independent roots, so pooled
+# confidence intervals stay honest. All (entrant, start, shard) jobs go to
+# one process pool.
+
+TOURNAMENT_STREAM = 2   # derive_seed path prefix for tournament start roots
+
+ENDING_CATEGORIES = ("achievement", "collapse", "long_life", "page")
+
+def ending_category(ending: str) -> str:
+    if any(ending == text for _k, text in ACHIEVEMENT_ENDINGS):
+        return "achievement"
+    if any(ending == text for _k, text in ZERO_ENDINGS):
+        return "collapse"
+    return "long_life" if ending == LONG_LIFE_ENDING else "page"
+
+def wilson_interval(hits: int, n: int, z: float = 1.96) -> Tuple[float, float]:
+    """Wilson score interval for a proportion (well-behaved near 0 and 1)."""
+    if not n:
+        return 0.0, 0.0
+    p = hits / n
+    mid = (p + z * z / (2 * n)) / (1 + z * z / n)
+    half = z * ((p * (1 - p) + z * z / (4 * n)) / n) ** 0.5 / (1 + z * z / n)
+    return max(0.0, mid - half), min(1.0, mid + half)
+
+@dataclass
+class TournamentEntry:
+    """One entrant's merged results, overall and per (birth, era) start."""
+    name: str
+    starts: Dict[Tuple[str, str], BatchResult] = field(default_factory=dict)
+
+    @property
+    def total(self) -> BatchResult:
+        out = BatchResult()
+        for res in self.starts.values():
+            out.merge(res)
+        return out
+
+    def category_counts(self, res: Optional[BatchResult] = None) -> Dict[str, int]:
+        counts = dict.fromkeys(ENDING_CATEGORIES, 0)
+        for ending, c in (res or self.total).ending_counts.items():
+            counts[ending_category(ending)] += c
+        return counts
+
+    def score_interval(self, res: Optional[BatchResult] = None, z: float = 1.96) -> Tuple[float, float]:
+        """Mean score and the half-width of its confidence interval."""
+        m = Moments()
+        for cell in (res or self.total).aggregate.cells.values():
+            m.merge(cell.score)
+        return m.mean / SCORE_SCALE, z * (m.variance / m.n) ** 0.5 / SCORE_SCALE if m.n else 0.0
+
+    def rank_key(self, objective: str, res: Optional[BatchResult] = None) -> float:
+        res = res or self.total
+        if objective == "achieve":
+            return self.category_counts(res)["achievement"] / res.n_lives if res.n_lives else 0.0
+        return res.mean_score
+
+    def to_json(self) -> dict:
+        total = self.total
+        mean, half = self.score_interval(total)
+        return {"name": self.name, "n_lives": total.n_lives, "mean_score": mean, "score_ci": half,
+                "categories": {k: {"count": c, "ci": wilson_interval(c, total.n_lives)}
+                               for k, c in self.category_counts(total).items()},
+                "starts": {"{0}/{1}".format(b, e): {"n_lives": r.n_lives, "mean_score": r.mean_score,
+                                                    "categories": self.category_counts(r)}
+                           for (b, e), r in sorted(self.starts.items())}}
+
+def _entrant_policy(entrant: str) -> Tuple[str, Optional[str]]:
+    """(policy name, policy file): names in POLICIES are built-in agents, anything else a solved table."""
+    return (entrant, None) if entrant in POLICIES else ("random", entrant)
+
+def run_tournament(entrants: List[str], lives_per_start: int, root_seed: int, workers: int = 1,
+                   shard_size: int = 2000) -> List[TournamentEntry]:
+    """Play every entrant from every start; entries come back in entrant order."""
+    entries = {name: TournamentEntry(name) for name in entrants}
+    jobs = []
+    for name in entrants:
+        policy_name, policy_file = _entrant_policy(name)
+        for bi, (b, _bl) in enumerate(BIRTHS):
+            for ei, (e, _el) in enumerate(ERAS):
+                root = derive_seed(root_seed, TOURNAMENT_STREAM, bi, ei)
+                for shard, start in enumerate(range(0, lives_per_start, shard_size)):
+                    n = min(shard_size, lives_per_start - start)
+                    jobs.append(((name, b, e), (shard, start, n, root, policy_name, b, e, False,
+                                                policy_file, None, False, True)))
+
+    def collect(tag, res: BatchResult):
+        name, b, e = tag
+        starts = entries[name].starts
+        starts[(b, e)] = starts[(b, e)].merge(res) if (b, e) in starts else res
+
+    if workers <= 1:
+        for tag, args in jobs:
+            collect(tag, _run_shard(*args))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_run_shard, *args): tag for tag, args in jobs}
+            for fut in as_completed(futures):
+                collect(futures[fut], fut.result())
+    return [entries[name] for name in entrants]
+
+def print_tournament_report(entries: List[TournamentEntry], objective: str = "achieve"):
+    """Entrants ranked by objective, with 95% intervals, then the winner of each start."""
+    ranked = sorted(entries, key=lambda t: -t.rank_key(objective))
+    print("{0:>2} {1:<10} {2:>8} {3:>21} {4:>21} {5:>7} {6:>7} {7:>15}".format(
+        "#", "agent", "lives", "achievement %", "collapse %", "long %", "page %", "mean score"))
+    for rank, t in enumerate(ranked, 1):
+        total = t.total
+        n = total.n_lives
+        cats = t.category_counts(total)
+        ach, col = wilson_interval(cats["achievement"], n), wilson_interval(cats["collapse"], n)
+        mean, half = t.score_interval(total)
+        print("{0:>2} {1:<10} {2:>8} {3:6.2f} [{4:5.2f},{5:5.2f}] {6:6.2f} [{7:5.2f},{8:5.2f}] "
+              "{9:7.2f} {10:7.2f} {11:7.2f} +-{12:5.2f}".format(
+                  rank, t.name[:10], n, 100.0 * cats["achievement"] / n, 100 * ach[0], 100 * ach[1],
+                  100.0 * cats["collapse"] / n, 100 * col[0], 100 * col[1],
+                  100.0 * cats["long_life"] / n, 100.0 * cats["page"] / n, mean, half))
+    print("\nBest per start ({0}):".format(objective))
+    for b, _bl in BIRTHS:
+        cells = []
+        for e, _el in ERAS:
+            best = max(entries, key=lambda t: t.rank_key(objective, t.starts[(b, e)]))
+            cells.append("{0}={1}".format(e, best.name))
+        print("  {0:<7} {1}".format(b, "  ".join(cells)))
+
+# ------------- Rare-Event Estimation -------------
+#
+# Fixed-effort multilevel splitting. A progress measure in [0, 1) says how
+# close a running life is to the target ending (1 = it ended on it), and
+# levels l_1 < ... < l_m = 1 cut the climb into stages. Stage k plays
+# `particles` lives, each resumed from an entrance state of stage k - 1
+# drawn with replacement (the snapshot() of a life as it first crossed
+# l_(k-1), reseeded), until it crosses l_k or ends. The product of the stage
+# hit fractions is an unbiased estimate of P(target); independent runs give
+# its confidence interval. The levels come from a separate pilot on its own
+# stream (each is the 1 - RARE_STAGE_P quantile of the progress the previous
+# stage's lives reached), so choosing them does not bias the runs. Any
+# Policy works: clones differ only in the draws after the split. A target no
+# life can reach (a score tier above max_alive_score(), another era's top
+# tier) is reported as P = 0 exactly instead of a run of empty stages.
+
+RARE_STREAM = 3          # derive_seed path prefix: pilot (RARE_STREAM, 0), run r (RARE_STREAM, 1, r)
+RARE_STAGE_P = 0.2       # share of the pilot's lives meant to reach each next level
+RARE_MAX_LEVELS = 40
+RARE_ALIVE_CAP = 0.999   # a running life's progress stays below the final level
+_HIT = b""               # entrance state of a life that already ended on the target
+
+def rare_target(text: str) -> Tuple[str, Callable[[LifeSimulation], float]]:
+    """The ending matching text (any unambiguous part of it) and its progress measure."""
+    endings = {t for _k, t in ACHIEVEMENT_ENDINGS + ZERO_ENDINGS + list(ERA_TOP_ENDINGS.items())}
+    endings.update(t for _s, t in SCORE_ENDINGS)
+    endings.add(LONG_LIFE_ENDING)
+    matches = sorted(t for t in endings if text.lower() in t.lower())
+    if not matches:
+        raise ValueError("no ending matches {0!r}".format(text))
+    if len(matches) > 1:
+        raise ValueError("{0} endings match {1!r}: {2}".format(len(matches), text, " | ".join(matches)))
+    ending = matches[0]
+    achieve = dict((t, k) for k, t in ACHIEVEMENT_ENDINGS)
+    zero = dict((t, k) for k, t in ZERO_ENDINGS)
+    thresholds = dict((t, s) for s, t in SCORE_ENDINGS if s > float("-inf"))
+    thresholds.update((t, TOP_SCORE) for t in ERA_TOP_ENDINGS.values())
+    if ending in achieve:
+        key = achieve[ending]
+        measure = lambda sim: getattr(sim.stats, key) / ACHIEVEMENT_TARGET
+    elif ending in zero:
+        key = zero[ending]
+        measure = lambda sim: 1.0 - getattr(sim.stats, key) / 100.0
+    elif ending in thresholds:
+        threshold = thresholds[ending]
+        measure = lambda sim: score(sim.stats) / threshold
+    elif ending == LONG_LIFE_ENDING:
+        measure = lambda sim: sim.age / MAX_AGE
+    else:
+        raise ValueError("No progress measure for {0!r}.".format(ending))
+
+    def progress(sim: LifeSimulation) -> float:
+        if sim.done:
+            return 1.0 if sim.ending == ending else -1.0
+        return min(measure(sim), RARE_ALIVE_CAP)
+
+    return ending, progress
+
+def max_alive_score() -> float:
+    """The best score a life can end on by page or age: every stat one short of its achievement."""
+    return score(Stats(*[min(100, ACHIEVEMENT_TARGET - 1)] * len(STATS_KEYS)))
+
+def rare_unreachable(ending: str, era: Optional[str] = None) -> Optional[str]:
+    """Why no life can end on `ending` (None if some life can), so P(ending) is exactly 0."""
+    top_eras = [e for e, t in ERA_TOP_ENDINGS.items() if t == ending]
+    if top_eras and era is not None and era not in top_eras:
+        return "only {0} lives can end on it".format(" or ".join(top_eras))
+    thresholds = [s for s, t in SCORE_ENDINGS if t == ending] + ([TOP_SCORE] if top_eras else [])
+    if thresholds and min(thresholds) > max_alive_score():
+        return "it needs score {0:g} and a life that ends on its score reaches at most {1:g}".format(
+            min(thresholds), max_alive_score())
+    if ending in dict((t, k) for k, t in ACHIEVEMENT_ENDINGS) and ACHIEVEMENT_TARGET > 100:
+        return "stats stop at 100, below the achievement target {0}".format(ACHIEVEMENT_TARGET)
+    return None
+
+def _spawn(entrant: Optional[bytes], rng, birth: Optional[str], era: Optional[str]) -> LifeSimulation:
+    """A fresh life (entrant None) or a clone of a snapshot on its own new stream."""
+    if entrant is None:
+        b = birth or pick(BIRTHS, rng)[0]
+        e = era or pick(ERAS, rng)[0]
+        return LifeSimulation(b, e, rng=random.Random(rng.getrandbits(64)))
+    sim = LifeSimulation.restore(entrant)
+    sim.rng.seed(rng.getrandbits(64))
+    return sim
+
+def rare_levels(target: str, particles: int, seed: int, policy_name: str = "random",
+                policy_file: Optional[str] = None, birth: Optional[str] = None,
+                era: Optional[str] = None) -> Tuple[List[float], float, int]:
+    """Splitting levels from a pilot, its mean chapters per fresh life, and the chapters it played."""
+    _ending, progress = rare_target(target)
+    policy = _shard_policy(policy_name, policy_file)
+    rng = random.Random(seed)
+    entrants: List[Optional[bytes]] = [None]
+    levels: List[float] = []
+    chapters = fresh_chapters = fresh_lives = 0
+    while len(levels) < RARE_MAX_LEVELS - 1:
+        paths = []     # per life: (progress, state) each time it got further than before
+        for _ in range(particles):
+            src = entrants[rng.randrange(len(entrants))]
+            if src == _HIT:
+                paths.append([(1.0, _HIT)])
+                continue
+            sim = _spawn(src, rng, birth, era)
+            best = progress(sim)
+            path = [(best, sim.snapshot())]
+            n = 0
+            while not sim.done:
+                sim.step(policy(sim))
+                n += 1
+                p = progress(sim)
+                if p > best:
+                    best = p
+                    path.append((p, _HIT if sim.done else sim.snapshot()))
+            chapters += n
+            if src is None:
+                fresh_chapters += n
+                fresh_lives += 1
+            paths.append(path)
+        bests = sorted(path[-1][0] for path in paths)
+        floor = levels[-1] if levels else float("-inf")
+        level = bests[min(len(bests) - 1, int((1.0 - RARE_STAGE_P) * len(bests)))]
+        if level <= floor:
+            higher = [b for b in bests if b > floor]
+            if not higher:
+                break
+            level = higher[0]
+        if level >= 1.0:
+            break
+        levels.append(level)
+        entrants = [next(state for p, state in path if p >= level) for path in paths if path[-1][0] >= level]
+    return levels + [1.0], fresh_chapters / max(1, fresh_lives), chapters
+
+def _split_run(target: str, levels: List[float], particles: int, seed: int, policy_name: str,
+               policy_file: Optional[str], birth: Optional[str], era: Optional[str]) -> Tuple[float, int]:
+    """One fixed-effort splitting estimate of P(target), and the chapters it played."""
+    _ending, progress = rare_target(target)
+    policy = _shard_policy(policy_name, policy_file)
+    rng = random.Random(seed)
+    entrants: List[Optional[bytes]] = [None]
+    estimate, chapters = 1.0, 0
+    for level in levels:
+        hits = []
+        for _ in range(particles):
+            src = entrants[rng.randrange(len(entrants))]
+            if src == _HIT:
+                hits.append(_HIT)
+                continue
+            sim = _spawn(src, rng, birth, era)
+            p = progress(sim)
+            while p < level and not sim.done:
+                sim.step(policy(sim))
+                chapters += 1
+                p = progress(sim)
+            if p >= level:
+                hits.append(_HIT if sim.done else sim.snapshot())
+        estimate *= len(hits) / particles
+        if not hits:
+            return 0.0, chapters
+        entrants = hits
+    return estimate, chapters
+
+@dataclass
+class RareEstimate:
+    ending: str
+    levels: List[float]
+    particles: int
+    runs: List[float]               # one splitting estimate per independent run
+    chapters: int                   # played by the pilot and the runs
+    chapters_per_life: float        # a plain Monte Carlo life's cost, from the pilot
+    unreachable: Optional[str] = None   # why P is exactly 0 (nothing was played)
+
+    @property
+    def mean(self) -> float:
+        return sum(self.runs) / len(self.runs)
+
+    @property
+    def stderr(self) -> float:
+        n, m = len(self.runs), self.mean
+        return (sum((x - m) ** 2 for x in self.runs) / (n - 1) / n) ** 0.5 if n > 1 else 0.0
+
+    def interval(self, z: float = 1.96) -> Tuple[float, float]:
+        return max(0.0, self.mean - z * self.stderr), self.mean + z * self.stderr
+
+    @property
+    def plain_lives(self) -> float:
+        """Lives plain Monte Carlo would need for the same standard error."""
+        p, se = self.mean, self.stderr
+        return p * (1.0 - p) / (se * se) if se > 0 else 0.0
+
+    @property
+    def work_lives(self) -> float:
+        """This estimate's cost in plain lives (chapters played / chapters per life)."""
+        return self.chapters / self.chapters_per_life if self.chapters_per_life else 0.0
+
+    def to_json(self) -> dict:
+        lo, hi = self.interval()
+        return {"ending": self.ending, "p": self.mean, "stderr": self.stderr, "ci95": [lo, hi],
+                "levels": self.levels, "particles": self.particles, "runs": self.runs,
+                "chapters": self.chapters, "plain_lives": self.plain_lives, "work_lives": self.work_lives,
+                "unreachable": self.unreachable}
+
+def run_rare(target: str, particles: int, runs: int, root_seed: int, workers: int = 1,
+             policy_name: str = "random", policy_file: Optional[str] = None,
+             birth: Optional[str] = None, era: Optional[str] = None) -> RareEstimate:
+    """Pilot the levels, then average `runs` independent splitting estimates (in a process pool)."""
+    if runs < 2:
+        raise ValueError("A confidence interval needs at least two splitting runs.")
+    ending, _progress = rare_target(target)
+    reason = rare_unreachable(ending, era)
+    if reason is not None:
+        return RareEstimate(ending, [], particles, [0.0] * runs, 0, 0.0, reason)
+    levels, per_life, chapters = rare_levels(target, particles, derive_seed(root_seed, RARE_STREAM, 0),
+                                             policy_name, policy_file, birth, era)
+    jobs = [(target, levels, particles, derive_seed(root_seed, RARE_STREAM, 1, r), policy_name, policy_file,
+             birth, era) for r in range(runs)]
+    if workers <= 1:
+        results = [_split_run(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_split_run, *zip(*jobs)))
+    return RareEstimate(ending, levels, particles, [p for p, _n in results],
+                        chapters + sum(n for _p, n in results), per_life)
+
+def print_rare_report(est: RareEstimate):
+    lo, hi = est.interval()
+    print("Target: {0}".format(est.ending))
+    if est.unreachable:
+        print("P = 0 exactly: {0}.".format(est.unreachable))
+        return
+    print("Levels: {0}".format(" ".join("{0:.3f}".format(x) for x in est.levels)))
+    if not any(est.runs):
+        print("No run reached the target ({0} runs x {1} stages x {2} particles).".format(
+            len(est.runs), len(est.levels), est.particles))
+        return
+    print("P = {0:.4g}   95% CI [{1:.4g}, {2:.4g}]   ({3} runs x {4} stages x {5} particles)".format(
+        est.mean, lo, hi, len(est.runs), len(est.levels), est.particles))
+    print("Played {0} chapters (~{1:.0f} lives); plain Monte Carlo needs ~{2:.3g} lives for this precision "
+          "({3:.0f}x).".format(est.chapters, est.work_lives, est.plain_lives,
+                               est.plain_lives / est.work_lives if est.work_lives else 0.0))
+
+# ------------- Ending Distributions -------------
+#
+# EndingDP gives the exact probability of every ending under a policy, by
+# recursion over the full state (era, age, chapter, stats, processed
+# milestones, flags, used templates and triggers) with each state's answer
+# memoized in a transposition table that later queries share. Every chance
+# node is enumerated with its exact probability: the menu draw, swing, death
+# roll, +-VARIATION_SPREAD variation, env trigger and age step. Exact is not
+# cheap: a chapter spreads one stats point over up to (2 * VARIATION_SPREAD
+# + 1) ** 5 others, so whole lives under the default rules run far past
+# max_states. It suits short horizons and small rule sets.
+#
+# Policies that never read stats (random_policy, the preview and tag agents)
+# have a fast path. Their discrete story of a life -- which option is taken,
+# swings, env triggers, age steps -- does not depend on stats. Given that
+# story, the five stats evolve independently (death only reads and writes
+# health), so each one is a 101-state Markov chain and the ending
+# distribution for the story is computed exactly from five small vectors.
+# Enumerating every story is not feasible (millions of distinct (age, used
+# templates, flags) contexts by chapter 7), so estimate_ending_distribution
+# is a Monte Carlo estimate: it averages the exact per-story answer over
+# stories sampled under the policy. The variation and death rolls, the main
+# noise source, are integrated out instead of sampled, so far fewer stories
+# than lives are needed, but the result still carries a standard error.
+
+class _PolicyView:
+    """
+    The parts of a life a Policy reads, for engines that track lives without
+    a LifeSimulation. Reading stats marks the view (EndingDP then caches the
+    choice per stats-free context only when they were not read); stats=None
+    makes reading them an error, and so does rng=None for drawing from it.
+    """
+    __slots__ = ("era", "age", "chapter", "flags", "used_templates", "processed_milestones", "menu",
+                 "is_milestone", "read_stats", "_stats", "_rng")
+
+    def __init__(self, era: str, age: int, chapter: int, flags: int, used_templates: int,
+                 processed: Set[int], menu: List[Option], is_milestone: bool,
+                 stats: Optional[Stats] = None, rng=None):
+        self.era, self.age, self.chapter, self.flags = era, age, chapter, flags
+        self.used_templates, self.processed_milestones = used_templates, processed
+        self.menu, self.is_milestone = menu, is_milestone
+        self.read_stats = False
+        self._stats, self._rng = stats, rng
+
+    @property
+    def band(self) -> str:
+        return current_band(self.age)
+
+    @property
+    def done(self) -> bool:
+        return False
+
+    @property
+    def stats(self) -> Stats:
+        if self._stats is None:
+            raise ValueError("This policy reads stats; story sampling needs one that does not (use EndingDP).")
+        self.read_stats = True
+        return self._stats
+
+    @property
+    def rng(self):
+        if self._rng is None:
+            raise ValueError("EndingDP needs a policy whose choice is a function of the state "
+                             "(random_policy is the one random policy it knows).")
+        return self._rng
+
+def _choose(policy: Policy, view: _PolicyView) -> int:
+    idx = policy(view)
+    if idx == RIFT:
+        raise ValueError("Ending distributions do not model time rifts.")
+    if not 0 <= idx < len(view.menu):
+        raise ValueError("Policy chose {0} from a menu of {1}.".format(idx, len(view.menu)))
+    return idx
+
+def menu_distribution(era: str, band: str, age: int, used: int, flags: int) -> List[Tuple[List[Option], float]]:
+    """Every menu build_option_menu() can draw here, with its exact probability."""
+    catalog = option_catalog()
+    pool = _MenuPool(catalog.pool_index(era, band), used, flags)
+    opts, weighted = pool.index.opts, pool.index.weighted
+    draws: List[Tuple[Tuple[int, ...], float]] = [((), 1.0)]
+    taken = 0
+    for s in sorted(pool.buckets, reverse=True):
+        group = pool.buckets[s]
+        for _ in range(min(3 - taken, len(group))):
+            nxt = []
+            for seq, p in draws:
+                free = [i for i in group if i not in seq]
+                total = sum(opts[i].weight for i in free) if weighted else len(free)
+                for i in free:
+                    nxt.append((seq + (i,), p * (opts[i].weight if weighted else 1) / total))
+            draws = nxt
+            taken += 1
+        if taken == 3:
+            break
+    out = []
+    for seq, p in draws:
+        menu = [catalog.titled(opts[i], age) for i in seq] or [catalog.titled(catalog.quiet_option(era, band), age)]
+        while len(menu) < 3:
+            menu.append(humble_filler_option(era, age, len(menu)))
+        out.append((menu, p))
+    return out
+
+def trigger_distribution(era: str, band: str, used: int) -> List[Tuple[Optional[tuple], float]]:
+    """maybe_env_trigger() outcomes as ((text, delta) or None, probability)."""
+    sampler = trigger_sampler(era, band)
+    free = [i for i, k in enumerate(sampler.keys) if not k & used]
+    if not free:
+        return [(None, 1.0)]
+    total = sum(sampler.weights[i] for i in free)
+    return [(None, 1.0 - ENV_TRIGGER_PROB)] + [
+        (sampler.items[i], ENV_TRIGGER_PROB * sampler.weights[i] / total) for i in free]
+
+class EndingDP:
+    """
+    Exact P(ending) under a policy. The policy's choice must be a function of
+    the state; random_policy is taken as a uniform pick. table maps a state
+    (era, age, chapter, stats, milestone bits, flags, used templates, used
+    triggers) to its ending distribution; queries raise RuntimeError rather
+    than grow it past max_states.
+    """
+
+    def __init__(self, policy: Policy = random_policy, max_states: int = 1000000):
+        self.policy = policy
+        self.max_states = max_states
+        self.table: Dict[tuple, Dict[str, float]] = {}
+        self._menus: Dict[tuple, List[Tuple[List[Option], float]]] = {}
+        self._choices: Dict[tuple, int] = {}     # (context without stats, menu #) -> choice, if stats unread
+        self._specials: Dict[tuple, Optional[str]] = {}
+        self._pages: Dict[tuple, str] = {}
+
+    def distribution(self, birth: str, era: str) -> Dict[str, float]:
+        s = starting_stats(birth)
+        return dict(self._value((era, 0, 0, (s.health, s.wealth, s.knowledge, s.karma, s.charisma), 0, 0, 0, 0)))
+
+    def _menus_at(self, era: str, band: str, age: int, used: int, flags: int):
+        ix = option_catalog().pool_index(era, band)
+        key = (era, band, age, used & ix.bit_mask, flags & ix.tag_mask)
+        menus = self._menus.get(key)
+        if menus is None:
+            menus = self._menus[key] = menu_distribution(era, band, age, used, flags)
+        return menus
+
+    def _options(self, state) -> List[Tuple[Option, float]]:
+        """Chosen option and its probability, summed over the menus that lead to it."""
+        era, age, chapter, stats, done, flags, used, trigs = state
+        band = current_band(age)
+        milestone = age in MILESTONES and not done >> MILESTONES.index(age) & 1
+        menus = [(build_milestone_menu(era, age, band), 1.0)] if milestone else self._menus_at(
+            era, band, age, used, flags)
+        context = (era, age, chapter, done, flags, used, trigs)
+        processed = {m for i, m in enumerate(MILESTONES) if done >> i & 1}
+        picked: Dict[int, List] = {}
+        for k, (menu, p) in enumerate(menus):
+            if self.policy is random_policy:
+                picks = [(o, p / len(menu)) for o in menu]
+            else:
+                idx = self._choices.get(context + (k,))
+                if idx is None:
+                    view = _PolicyView(era, age, chapter, flags, used, processed, menu, milestone, Stats(*stats))
+                    idx = _choose(self.policy, view)
+                    if not view.read_stats:
+                        self._choices[context + (k,)] = idx
+                picks = [(menu[idx], p)]
+            for o, q in picks:
+                entry = picked.setdefault(o.template_id, [o, 0.0])
+                entry[1] += q
+        return [(o, q) for o, q in picked.values()]
+
+    def _value(self, state) -> Dict[str, float]:
+        got = self.table.get(state)
+        if got is not None:
+            return got
+        out: Dict[str, float] = {}
+        succ: Dict[tuple, float] = {}
+        for opt, p in self._options(state):
+            self._resolve(state, opt, p, out, succ)
+        for nxt, p in succ.items():
+            for text, q in self._value(nxt).items():
+                out[text] = out.get(text, 0.0) + p * q
+        if len(self.table) >= self.max_states:
+            raise RuntimeError("EndingDP passed max_states={0}; exact answers need a shorter horizon "
+                               "(or use estimate_ending_distribution).".format(self.max_states))
+        self.table[state] = out
+        return out
+
+    def _resolve(self, state, opt: Option, p: float, out: Dict[str, float], succ: Dict[tuple, float]):
+        """Add the endings and next states one chosen option leads to, as LifeSimulation._resolve plays it."""
+        era, age, chapter, stats, done, flags, used, trigs = state
+        band = current_band(age)
+        chapter += 1
+        if opt.origin == "milestone":
+            done |= 1 << MILESTONES.index(age)
+        used |= opt.bit
+        flags |= opt.tag_mask
+        processed = {m for i, m in enumerate(MILESTONES) if done >> i & 1}
+        lo, hi = AGE_STEP_MIN_MAX
+        if age <= 2:
+            hi = max(2, hi - 2)
+        steps: Dict[int, float] = {}
+        for step in range(lo, hi + 1):
+            new_age = min(MAX_AGE, age + cap_age_step_to_milestone(age, step, processed))
+            steps[new_age] = steps.get(new_age, 0.0) + 1.0 / (hi - lo + 1)
+        triggers = trigger_distribution(era, band, trigs)
+
+        base = Stats(*stats).apply(opt.delta)
+        branches = [(base, p)]
+        if opt.swing_prob > 0 and sum(opt.delta.values()) < 0:
+            sp = opt.swing_prob
+            branches = [(base, p * (1 - sp)), (base.apply(SWING_UP), p * sp / 2), (base.apply(SWING_DOWN), p * sp / 2)]
+        rolled: Dict[tuple, float] = {}
+        for st, q in branches:
+            death = opt.risk_death
+            if "risk" in opt.tags_set and st.health <= 10:
+                death = min(1.0, death + 0.10)
+            for row, w in (((0,) + tuple(_stats_row(st))[1:], q * death), (tuple(_stats_row(st)), q * (1 - death))):
+                if w > 0:
+                    rolled[row] = rolled.get(row, 0.0) + w
+        spread = range(-VARIATION_SPREAD, VARIATION_SPREAD + 1)
+        w_var = 1.0 / len(spread) ** len(STATS_KEYS)
+        varied: Dict[tuple, float] = {}
+        for row, q in rolled.items():
+            for d in product(spread, repeat=len(STATS_KEYS)):
+                key = tuple(min(100, max(0, v + x)) for v, x in zip(row, d))
+                varied[key] = varied.get(key, 0.0) + q * w_var
+        for key, w in varied.items():
+            ending = self._special(key)
+            if ending:
+                out[ending] = out.get(ending, 0.0) + w
+                continue
+            for trig, t in triggers:
+                after, after_trigs = key, trigs
+                if trig is not None:
+                    after = tuple(_stats_row(Stats(*key).apply(trig[1])))
+                    after_trigs = trigs | trigger_bit(era, band, trig[0])
+                    ending = self._special(after)
+                    if ending:
+                        out[ending] = out.get(ending, 0.0) + w * t
+                        continue
+                for new_age, a in steps.items():
+                    if new_age >= MAX_AGE:
+                        ending = LONG_LIFE_ENDING
+                    elif chapter >= CHAPTER_LIMIT:
+                        ending = self._page(after, era)
+                    else:
+                        nxt = (era, new_age, chapter, after, done, flags, used, after_trigs)
+                        succ[nxt] = succ.get(nxt, 0.0) + w * t * a
+                        continue
+                    out[ending] = out.get(ending, 0.0) + w * t * a
+
+    def _special(self, row: tuple) -> Optional[str]:
+        got = self._specials.get(row, False)
+        if got is False:
+            got = self._specials[row] = check_special_endings(Stats(*row))
+        return got
+
+    def _page(self, row: tuple, era: str) -> str:
+        got = self._pages.get((row, era))
+        if got is None:
+            got = self._pages[row, era] = ending_for(Stats(*row), era)
+        return got
+
+@dataclass(frozen=True)
+class ChapterEvents:
+    """The stats-independent part of one chapter; hashable so story prefixes can be cached."""
+    delta: Tuple[int, ...]               # option delta, STATS_KEYS order
+    swing: Optional[Tuple[int, ...]]     # SWING_UP / SWING_DOWN row if the setback swung
+    risk_death: float
+    risky: bool                          # "risk" tag: +10% death while health <= 10
+    env: Optional[Tuple[int, ...]]       # env trigger delta, if one fired
+    end: Optional[str]                   # "final" (MAX_AGE) or "page" (chapter limit) after this chapter
+
+def variation_matrix():
+    """101x101 transition of one stat under random_variation(): row = before, column = after (clamped)."""
+    m = np.zeros((101, 101))
+    w = 1.0 / (2 * VARIATION_SPREAD + 1)
+    for v in range(101):
+        for d in range(-VARIATION_SPREAD, VARIATION_SPREAD + 1):
+            m[v, min(100, max(0, v + d))] += w
+    return m
+
+def shift_clamped(dist, k: int):
+    """Distribution(s) over 0..100 (last axis) after adding k and clamping, as Stats.apply does."""
+    if k == 0:
+        return dist.copy()
+    out = np.zeros_like(dist)
+    if k > 0:
+        out[..., k:] = dist[..., :-k]
+        out[..., 100] += dist[..., -k:].sum(axis=-1)
+    else:
+        out[..., :k] = dist[..., -k:]
+        out[..., 0] += dist[..., :-k].sum(axis=-1)
+    return out
+
+def death_roll(health_dist, risk_death: float, risky: bool):
+    """Health distribution(s) after resolve_outcome()'s death roll (dead -> 0)."""
+    p = np.minimum(1.0, risk_death + 0.10 * (risky & (np.arange(101) <= 10)))
+    out = health_dist * (1.0 - p)
+    out[..., 0] += (health_dist * p).sum(axis=-1)
+    return out
+
+class _StoryNode:
+    __slots__ = ("children", "state")
+
+    def __init__(self, state):
+        self.children: Dict[ChapterEvents, "_StoryNode"] = {}
+        self.state = state
+
+class EndingEstimator:
+    """
+    Exact ending probabilities for one given story (a list of ChapterEvents),
+    the building block of estimate_ending_distribution.
+    States after each story prefix live in a trie, so stories sharing
+    their first chapters reuse the work; the trie is dropped and rebuilt
+    once it holds max_nodes states.
+    """
+
+    def __init__(self, max_nodes: int = 200000):
+        if np is None:
+            raise RuntimeError("EndingEstimator requires NumPy (pip install numpy).")
+        self.variation = variation_matrix()
+        self.max_nodes = max_nodes
+        self._roots: Dict[Tuple[str, str], _StoryNode] = {}   # page endings differ by era
+        self._nodes = 0
+        self._page_cache: Dict[str, "np.ndarray"] = {}   # threshold -> stat rows that round below it
+        self._col = {k: i for i, k in enumerate(STATS_KEYS)}
+
+    def _root(self, birth: str, era: str) -> _StoryNode:
+        if (birth, era) not in self._roots:
+            start = starting_stats(birth)
+            dist = np.zeros((len(STATS_KEYS), 101))
+            for i, k in enumerate(STATS_KEYS):
+                dist[i, getattr(start, k)] = 1.0
+            self._roots[birth, era] = _StoryNode((1.0, dist, {}))
+        return self._roots[birth, era]
+
+    def distribution(self, birth: str, era: str, story: List[ChapterEvents]) -> Dict[str, float]:
+        """Exact P(ending) for a life of this birth/era that follows `story` while it lasts."""
+        if self._nodes > self.max_nodes:
+            self._roots.clear()
+            self._nodes = 0
+        node = self._root(birth, era)
+        for ev in story:
+            alive = node.state[0]
+            if alive == 0.0:
+                break
+            child = node.children.get(ev)
+            if child is None:
+                child = _StoryNode(self._advance(node.state, ev, era))
+                node.children[ev] = child
+                self._nodes += 1
+            node = child
+        return {text: float(p) for text, p in node.state[2].items()}
+
+    @staticmethod
+    def _shift(dist, delta):
+        return np.stack([shift_clamped(dist[i], k) for i, k in enumerate(delta)])
+
+    def _check(self, alive: float, dist, ends: Dict[str, float]):
+        """Absorb mass that hits a special ending; return (alive, dist conditioned on survival)."""
+        zero = dist[:, 0]
+        high = dist[:, ACHIEVEMENT_TARGET:].sum(axis=1)
+        live = dist[:, 1:ACHIEVEMENT_TARGET].sum(axis=1)
+        idx = self._col
+        none_before = 1.0
+        for key, text in ZERO_ENDINGS:
+            p = alive * none_before * zero[idx[key]]
+            if p:
+                ends[text] = ends.get(text, 0.0) + p
+            none_before *= 1.0 - zero[idx[key]]
+        # no stat is zero; earlier achievements must not fire, later stats just must not be zero
+        for pos, (key, text) in enumerate(ACHIEVEMENT_ENDINGS):
+            p = alive * high[idx[key]]
+            for j, (other, _t) in enumerate(ACHIEVEMENT_ENDINGS):
+                if j < pos:
+                    p *= live[idx[other]]
+                elif j > pos:
+                    p *= 1.0 - zero[idx[other]]
+            if p:
+                ends[text] = ends.get(text, 0.0) + p
+        alive = alive * float(np.prod(live))
+        out = np.zeros_like(dist)
+        if alive > 0.0:
+            out[:, 1:ACHIEVEMENT_TARGET] = dist[:, 1:ACHIEVEMENT_TARGET] / live[:, None]
+        return alive, out
+
+    def _advance(self, state, ev: ChapterEvents, era: str):
+        alive, dist, ends = state
+        ends = dict(ends)
+        dist = self._shift(dist, ev.delta)
+        if ev.swing:
+            dist = self._shift(dist, ev.swing)
+        if ev.risk_death > 0 or ev.risky:
+            dist[0] = death_roll(dist[0], ev.risk_death, ev.risky)
+        dist = dist @ self.variation
+        alive, dist = self._check(alive, dist, ends)
+        if alive > 0.0 and ev.env:
+            alive, dist = self._check(alive, self._shift(dist, ev.env), ends)
+        if alive > 0.0 and ev.end == "final":
+            ends[LONG_LIFE_ENDING] = ends.get(LONG_LIFE_ENDING, 0.0) + alive
+            alive = 0.0
+        elif alive > 0.0 and ev.end == "page":
+            for text, p in self._page_endings(dist, era).items():
+                ends[text] = ends.get(text, 0.0) + alive * p
+            alive = 0.0
+        return alive, dist, ends
+
+    def _page_endings(self, dist, era: str) -> Dict[str, float]:
+        """
+        ending_for() over independent per-stat distributions. Scores are
+        convolved on an exact integer scale; combinations landing exactly on
+        a threshold are re-checked with score() because float rounding
+        decides those in the real game.
+        """
+        weights = [Fraction(repr(SCORE_WEIGHTS[k])) for k in STATS_KEYS]
+        scale = 1
+        for w in weights:
+            scale = scale * w.denominator // gcd(scale, w.denominator)
+        iw = [int(w * scale) for w in weights]
+        total = np.ones(1)
+        for i in range(len(STATS_KEYS)):
+            spread = np.zeros(100 * iw[i] + 1)
+            spread[::iw[i]] = dist[i]
+            total = np.convolve(total, spread)
+        cdf_from = np.cumsum(total[::-1])[::-1]    # cdf_from[x] = P(scaled score >= x)
+
+        tiers = [(TOP_SCORE, ERA_TOP_ENDINGS[era])] if era in ERA_TOP_ENDINGS else []
+        tiers += SCORE_ENDINGS
+        out: Dict[str, float] = {}
+        prev = 0.0
+        for threshold, text in tiers:
+            if threshold == float("-inf"):
+                p_at_least = 1.0
+            else:
+                x = int(Fraction(threshold) * scale)
+                p_at_least = float(cdf_from[x]) if x < len(cdf_from) else 0.0
+                p_at_least -= self._float_ties_below(dist, threshold, iw, scale)
+            p = max(0.0, p_at_least - prev)
+            if p:
+                out[text] = out.get(text, 0.0) + p
+            prev = max(prev, p_at_least)
+        return out
+
+    def _float_ties_below(self, dist, threshold: float, iw: List[int], scale: int) -> float:
+        """Mass on stats whose exact score equals threshold but score() rounds below it."""
+        key = repr(threshold)
+        if key not in self._page_cache:
+            target = int(Fraction(threshold) * scale)
+            grids = np.meshgrid(*[np.arange(1, ACHIEVEMENT_TARGET)] * (len(STATS_KEYS) - 1), indexing="ij")
+            partial = sum(g * w for g, w in zip(grids, iw[:-1]))
+            rest = target - partial
+            ok = (rest % iw[-1] == 0) & (rest // iw[-1] >= 1) & (rest // iw[-1] < ACHIEVEMENT_TARGET)
+            combos = np.stack([g[ok] for g in grids] + [(rest // iw[-1])[ok]], axis=1)
+            below = [score(Stats(*map(int, c))) < threshold for c in combos]
+            self._page_cache[key] = combos[np.array(below, dtype=bool)] if below else combos
+        combos = self._page_cache[key]
+        if len(combos) == 0:
+            return 0.0
+        probs = np.ones(len(combos))
+        for i in range(len(STATS_KEYS)):
+            probs *= dist[i, combos[:, i]]
+        return float(probs.sum())
+
+def sample_story(birth: str, era: str, rng, policy: Policy = random_policy) -> List[ChapterEvents]:
+    """
+    One stats-independent story, mirroring LifeSimulation.step(). The policy
+    may draw from rng but not read stats (ValueError if it does).
+    """
+    age, chapter = 0, 0
+    flags = used_templates = used_trigs = 0
+    menus = MenuState()
+    processed: Set[int] = set()
+    story: List[ChapterEvents] = []
+    while True:
+        chapter += 1
+        band = current_band(age)
+        milestone = age in MILESTONES and age not in processed
+        if milestone:
+            menu = build_milestone_menu(era, age, band)
+        else:
+            menu = build_option_menu(era, band, age, None, used_templates, flags, rng, menus)
+        if policy is random_policy:
+            opt = menu[rng.randrange(len(menu))]
+        else:
+            opt = menu[_choose(policy, _PolicyView(era, age, chapter - 1, flags, used_templates, processed, menu,
+                                                   milestone, rng=rng))]
+        swing = None
+        if opt.swing_prob > 0 and sum(opt.delta.values()) < 0 and rng.random() < opt.swing_prob:
+            swing = tuple(_delta_row(SWING_UP if rng.random() < 0.5 else SWING_DOWN))
+        if opt.origin == "milestone":
+            processed.add(age)
+        used_templates |= opt.bit
+        flags |= opt.tag_mask
+        trig = maybe_env_trigger(era, age, used_trigs, rng)
+        if trig:
+            used_trigs |= trigger_bit(era, band, trig[0])
+        step = cap_age_step_to_milestone(age, random_age_step(age, rng), processed)
+        age = min(MAX_AGE, age + step)
+        end = "final" if age >= MAX_AGE else ("page" if chapter >= CHAPTER_LIMIT else None)
+        story.append(ChapterEvents(tuple(_delta_row(opt.delta)), swing, opt.risk_death, "risk" in opt.tags_set,
+                                   tuple(_delta_row(trig[1])) if trig else None, end))
+        if end:
+            return story
+
+def estimate_ending_distribution(birth: str, era: str, n_stories: int = 2000, seed: Optional[int] = None,
+                                 solver: Optional[EndingEstimator] = None,
+                                 policy: Policy = random_policy) -> Dict[str, Tuple[float, float]]:
+    """
+    Estimated P(ending), with its standard error, for lives of one birth/era
+    under a policy that does not read stats: the mean of the exact per-story
+    distributions over n_stories sampled stories (EndingDP is exact for any
+    policy, at a far higher cost). Pass the same solver to share cached
+    prefixes across queries.
+    """
+    solver = solver or EndingEstimator()
+    rng = random.Random(seed)
+    sums: Dict[str, float] = {}
+    sq: Dict[str, float] = {}
+    for _ in range(n_stories):
+        for text, p in solver.distribution(birth, era, sample_story(birth, era, rng, policy)).items():
+            sums[text] = sums.get(text, 0.0) + p
+            sq[text] = sq.get(text, 0.0) + p * p
+    out: Dict[str, Tuple[float, float]] = {}
+    for text, total in sums.items():
+        mean = total / n_stories
+        var = max(0.0, sq[text] / n_stories - mean * mean)
+        out[text] = (mean, (var / max(1, n_stories - 1)) ** 0.5)
+    return out
+
+# ------------- Policy Solver -------------
+#
+# Finite-horizon expectimax over a canonicalized state: (chapter, age) plus
+# each stat bucketed by POLICY_BUCKETS. Used templates and flags are left out
+# of the state, so menus are modelled as a uniform 3-option draw from the
+# (era, band) pool. Chance nodes (swing, death, +-3 variation, env trigger,
+# age step) are exact for the bucket's member values; because stats move
+# independently given the option, every expectation is a per-stat linear map
+# applied along one axis of the value tensor.
+#
+# The table is therefore a heuristic, not the expectimax optimum of the real
+# game: the model forgets which templates are used up, the flags that bias
+# menus, and where in its bucket a stat sits. Its start_values are model
+# values and measured play differs (tang, "achieve": rich 0.48 modelled vs
+# 0.52 played, poor 0.45 vs 0.33).
+
+POLICY_BUCKETS = (1, 3, 6, 11, 16, 22)   # lower edges of stat buckets over 1..ACHIEVEMENT_TARGET-1
+POLICY_OBJECTIVES = ("achieve", "score")  # P(any ACHIEVEMENT_ENDINGS) / expected final score()
+FILLER_SLOT = "filler"
+
+@dataclass(frozen=True)
+class _OptionModel:
+    delta: Tuple[int, ...]
+    risk_death: float
+    swing_prob: float
+    risky: bool
+
+    @staticmethod
+    def of(o: Option) -> "_OptionModel":
+        swing = o.swing_prob if sum(o.delta.values()) < 0 else 0.0
+        return _OptionModel(tuple(_delta_row(o.delta)), o.risk_death, swing, "risk" in o.tags_set)
+
+class PolicySolver:
+    """Value tensors per (chapter, age) are memoized in self.values (the transposition table)."""
+
+    def __init__(self, era: str, objective: str = "achieve", edges: Tuple[int, ...] = POLICY_BUCKETS):
+        if np is None:
+            raise RuntimeError("PolicySolver requires NumPy (pip install numpy).")
+        if objective not in POLICY_OBJECTIVES:
+            raise ValueError("objective must be one of {0}".format(", ".join(POLICY_OBJECTIVES)))
+        self.era = era
+        self.objective = objective
+        self.edges = tuple(edges)
+        self.n_buckets = len(self.edges)
+        top = list(self.edges[1:]) + [ACHIEVEMENT_TARGET]
+        self.bucket_of = np.full(101, -1, dtype=np.int64)    # value -> bucket, -1 outside 1..T-1
+        self.start = np.zeros((self.n_buckets, 101))          # uniform over the bucket's members
+        for b, (lo, hi) in enumerate(zip(self.edges, top)):
+            self.bucket_of[lo:hi] = b
+            self.start[b, lo:hi] = 1.0 / (hi - lo)
+        self.to_bucket = np.zeros((101, self.n_buckets))
+        alive = self.bucket_of >= 0
+        self.to_bucket[np.flatnonzero(alive), self.bucket_of[alive]] = 1.0
+        self.values_of = np.arange(101, dtype=float)
+        self.bucket_mean = self.start @ self.values_of
+        self.weights = [SCORE_WEIGHTS[k] for k in STATS_KEYS]
+        self.variation = variation_matrix()
+        self.values: Dict[Tuple[int, int], "np.ndarray"] = {}
+        self.q: Dict[Tuple[int, int], Tuple[List[str], "np.ndarray"]] = {}
+        self._catalog = option_catalog()
+
+    # --- tensor helpers ---
+
+    def _along(self, vec, axis: int):
+        shape = [1] * len(STATS_KEYS)
+        shape[axis] = self.n_buckets
+        return vec.reshape(shape)
+
+    def _outer(self, vecs):
+        out = self._along(vecs[0], 0)
+        for axis in range(1, len(vecs)):
+            out = out * self._along(vecs[axis], axis)
+        return out
+
+    def _terminal(self):
+        """Reward for a life that ends alive (MAX_AGE or the chapter limit) in each state."""
+        if self.objective == "achieve":
+            return np.zeros((self.n_buckets,) * len(STATS_KEYS))
+        return sum(w * self._along(self.bucket_mean, d) for d, w in enumerate(self.weights))
+
+    def _expect_check(self, cont, dists):
+        """
+        E[value] over the next check from every bucket state, where dists[d] is
+        the (buckets, 101) distribution of stat d and cont is the value tensor
+        of surviving states. Special endings pay out per the objective.
+        """
+        T = ACHIEVEMENT_TARGET
+        maps = [m @ self.to_bucket for m in dists]
+        zero = [m[:, 0] for m in dists]
+        live = [a.sum(axis=1) for a in maps]
+        out = cont
+        for a in maps:   # contract one axis per stat; five rotations restore the axis order
+            out = np.tensordot(out, a, axes=(0, 1))
+        if self.objective == "achieve":
+            # no stat at zero, and not all stats still in range -> some achievement fired
+            return out + self._outer([1.0 - z for z in zero]) - self._outer(live)
+        mean = [m @ self.values_of for m in dists]
+        mean_live = [m[:, 1:T] @ self.values_of[1:T] for m in dists]
+        ended = sum(w * self._along(mean[d], d) for d, w in enumerate(self.weights))
+        for d, w in enumerate(self.weights):
+            ended = ended - w * self._outer([mean_live[d] if e == d else live[e] for e in range(len(STATS_KEYS))])
+        return out + ended
+
+    def _resolve_dists(self, om: _OptionModel, swing: Optional[Dict[str, int]]):
+        swing_row = _delta_row(swing) if swing else [0] * len(STATS_KEYS)
+        dists = []
+        for d in range(len(STATS_KEYS)):
+            m = shift_clamped(shift_clamped(self.start, om.delta[d]), swing_row[d])
+            if d == 0 and (om.risk_death > 0 or om.risky):
+                m = death_roll(m, om.risk_death, om.risky)
+            dists.append(m @ self.variation)
+        return dists
+
+    # --- stages ---
+
+    def _age_steps(self, age: int) -> Dict[int, float]:
+        lo, hi = AGE_STEP_MIN_MAX
+        if age <= 2:
+            hi = max(2, hi - 2)
+        processed = {m for m in MILESTONES if m <= age}
+        out: Dict[int, float] = {}
+        for step in range(lo, hi + 1):
+            nxt = min(MAX_AGE, age + cap_age_step_to_milestone(age, step, processed))
+            out[nxt] = out.get(nxt, 0.0) + 1.0 / (hi - lo + 1)
+        return out
+
+    def _stage_options(self, age: int) -> Tuple[List[str], List[Option], bool]:
+        band = current_band(age)
+        if age in MILESTONES:
+            menu = build_milestone_menu(self.era, age, band)
+            return [str(o.template_id) for o in menu], menu, True
+        pool = list(self._catalog.menu_pool(self.era, band))
+        filler = humble_filler_option(self.era, age, 0)
+        return [str(o.template_id) for o in pool] + [FILLER_SLOT], pool + [filler], False
+
+    def value(self, chapter: int, age: int):
+        """Value tensor of a state at the start of `chapter`, before its menu is drawn."""
+        key = (chapter, age)
+        if key in self.values:
+            return self.values[key]
+        band = current_band(age)
+        # value of surviving the choice's check, before env and aging
+        after = 0.0
+        for nxt_age, p in self._age_steps(age).items():
+            if nxt_age >= MAX_AGE or chapter >= CHAPTER_LIMIT:
+                after = after + p * self._terminal()
+            else:
+                after = after + p * self.value(chapter + 1, nxt_age)
+        sampler = trigger_sampler(self.era, band)
+        if sampler.items:
+            env = sum(w * self._expect_check(after, [shift_clamped(self.start, k) for k in _delta_row(d)])
+                      for (_t, d), w in zip(sampler.items, sampler.weights)) / sum(sampler.weights)
+            after = (1.0 - ENV_TRIGGER_PROB) * after + ENV_TRIGGER_PROB * env
+
+        slots, opts, milestone = self._stage_options(age)
+        cache: Dict[_OptionModel, "np.ndarray"] = {}
+        qs = []
+        for o in opts:
+            om = _OptionModel.of(o)
+            if om not in cache:
+                q = (1.0 - om.swing_prob) * self._expect_check(after, self._resolve_dists(om, None))
+                if om.swing_prob:
+                    q = q + om.swing_prob / 2 * (self._expect_check(after, self._resolve_dists(om, SWING_UP))
+                                                 + self._expect_check(after, self._resolve_dists(om, SWING_DOWN)))
+                cache[om] = q
+            qs.append(cache[om])
+        q = np.stack(qs)
+        self.q[key] = (slots, q)
+
+        n = len(opts) - (0 if milestone else 1)     # real pool size
+        if milestone or n < 3:
+            v = q.max(axis=0)
+        else:
+            # menu = uniform 3-subset of the pool: the i-th best is the max w.p. C(n-1-i, 2) / C(n, 3)
+            ranked = -np.sort(-q[:n], axis=0)
+            w = [comb(n - 1 - i, 2) / comb(n, 3) for i in range(n - 2)]
+            v = sum(wi * ranked[i] for i, wi in enumerate(w))
+        self.values[key] = v
+        return v
+
+    def start_values(self) -> Dict[str, Optional[float]]:
+        """Model value of each birth's starting stats (their bucket state at chapter 1), None if off-table."""
+        v = self.value(1, 0)
+        out: Dict[str, Optional[float]] = {}
+        for birth, _label in BIRTHS:
+            start = starting_stats(birth)
+            state = tuple(int(self.bucket_of[getattr(start, k)]) for k in STATS_KEYS)
+            out[birth] = float(v[state]) if min(state) >= 0 else None
+        return out
+
+    def solve(self) -> "PolicyTable":
+        self.value(1, 0)
+        stages = sorted(self.q)
+        width = 1 if max(len(self.q[key][0]) for key in stages) <= 256 else 2   # big packs need u16 ranks
+        ranks = []
+        for key in stages:
+            slots, q = self.q[key]
+            order = np.argsort(-q.reshape(len(slots), -1), axis=0, kind="stable")
+            rank = np.empty_like(order)
+            np.put_along_axis(rank, order, np.arange(len(slots))[:, None], axis=0)
+            ranks.append(rank.T.astype("<u1" if width == 1 else "<u2").tobytes())
+        header = {
+            "era": self.era, "objective": self.objective, "edges": list(self.edges),
+            "target": ACHIEVEMENT_TARGET, "rank_width": width,
+            "stages": [[c, a, self.q[(c, a)][0]] for c, a in stages],
+            "start_values": self.start_values(),
+        }
+        return PolicyTable(header, b"".join(ranks))
+
+class PolicyTable:
+    """
+    Solved policy: for each (chapter, age) stage and bucketed stats, the rank
+    of every option slot (0 = best), as u8 or, past 256 slots, little-endian
+    u16 (header "rank_width"). best_choice() is a handful of dict and array
+    lookups. File layout: magic, u32 header length, JSON header, zlib body.
+    """
+    MAGIC = b"LRPOL1\n"
+
+    def __init__(self, header: dict, body: bytes):
+        self.header = header
+        self.body = body
+        self.ranks = array("B" if header.get("rank_width", 1) == 1 else "H", body)
+        if self.ranks.itemsize > 1 and sys.byteorder != "little":
+            self.ranks.byteswap()
+        self.era = header["era"]
+        edges = header["edges"]
+        self.n_slots_state = len(edges) ** len(STATS_KEYS)
+        top = list(edges[1:]) + [header["target"]]
+        self.bucket_of = [-1] * 101
+        for b, (lo, hi) in enumerate(zip(edges, top)):
+            for v in range(lo, hi):
+                self.bucket_of[v] = b
+        self.n_buckets = len(edges)
+        self.stages: Dict[Tuple[int, int], Tuple[int, Dict[str, int]]] = {}
+        offset = 0
+        for chapter, age, slots in header["stages"]:
+            self.stages[(chapter, age)] = (offset, {k: i for i, k in enumerate(slots)})
+            offset += self.n_slots_state * len(slots)
+
+    def save(self, path: str):
+        head = json.dumps(self.header, separators=(",", ":")).encode("utf-8")
+        with open(path, "wb") as fh:
+            fh.write(self.MAGIC + struct.pack("<I", len(head)) + head + zlib.compress(self.body, 9))
+
+    @classmethod
+    def load(cls, path: str) -> "PolicyTable":
+        with open(path, "rb") as fh:
+            data = fh.read()
+        if not data.startswith(cls.MAGIC):
+            raise ValueError("{0} is not a policy table.".format(path))
+        pos = len(cls.MAGIC)
+        (n,) = struct.unpack_from("<I", data, pos)
+        header = json.loads(data[pos + 4:pos + 4 + n].decode("utf-8"))
+        return cls(header, zlib.decompress(data[pos + 4 + n:]))
+
+    def best_choice(self, chapter: int, age: int, stats: Stats, menu: List[Option]) -> Optional[int]:
+        """0-based index of the best menu entry, or None if the state is outside the table."""
+        stage = self.stages.get((chapter, age))
+        if stage is None:
+            return None
+        offset, slot_of = stage
+        state = 0
+        for k in STATS_KEYS:
+            b = self.bucket_of[getattr(stats, k)]
+            if b < 0:
+                return None
+            state = state * self.n_buckets + b
+        base = offset + state * len(slot_of)
+        best, best_rank = None, len(slot_of)
+        for i, o in enumerate(menu):
+            slot = slot_of.get(str(o.template_id), slot_of.get(FILLER_SLOT))
+            if slot is None:
+                continue
+            rank = self.ranks[base + slot]
+            if rank < best_rank:
+                best, best_rank = i, rank
+        return best
+
+def table_policy(table: PolicyTable) -> Policy:
+    """Policy that follows a solved table and falls back to random_policy off-table (e.g. after a rift)."""
+    def policy(sim: LifeSimulation) -> int:
+        idx = None
+        if sim.era == table.era:
+            idx = table.best_choice(sim.chapter + 1, sim.age, sim.stats, sim.menu)
+        return idx if idx is not None else random_policy(sim)
+    return policy
+
+# ------------- Replays -------------
+#
+# A life is fully determined by its seed, the content it was played against
+# and the choice indices, so that is all a replay stores. File layout: MAGIC,
+# then one record per life, appended:
+#   varint seed | u64 content version | u8 birth, era, nation | varint chapters
+#   | choices packed 2 bits each (0..2 = menu index, 3 = rift), 4 per byte.
+
+REPLAY_MAGIC = b"LRRPL1\n"
+_REPLAY_HEAD = struct.Struct("<QBBB")
+_RIFT_CODE = 3
+_UNPACK_CHOICES = [tuple(RIFT if c == _RIFT_CODE else c for c in ((b >> 2 * i) & 3 for i in range(4)))
+                   for b in range(256)]
+
+_CONTENT_VERSION: Optional[int] = None
+
+def content_version() -> int:
+    """64-bit digest of everything that decides what a choice index means and does."""
+    global _CONTENT_VERSION
+    if _CONTENT_VERSION is None:
+        # Built-in eras are hashed in full; content packs by their digests, so no pack era is loaded here
+        cat = option_catalog()
+        eras = [k for k, _label in ERAS if k not in PACK_ERAS]
+        opts = [o for era in eras for band, _range in AGE_BANDS for o in cat.menu_pool(era, band)]
+        opts += [o for era in eras for age in MILESTONES for o in cat.milestone_menu(era, age)]
+        opts += [cat.quiet_option(era, band) for era in eras for band, _range in AGE_BANDS]
+        builtin = lambda table: {era: dict.__getitem__(table, era) for era in eras if dict.__contains__(table, era)}
+        content = {
+            "options": [[o.template_id, o.text, sorted(o.delta.items()), sorted(o.tags_set), sorted(o.requires),
+                         o.risk_death, o.swing_prob, o.origin] for o in opts],
+            "tables": [[e for e in ERAS if e[0] in eras], NATIONALITIES, BIRTHS, AGE_BANDS, BIRTH_MODS,
+                       builtin(ENV_TRIGGERS), TIME_RIFTS[:len(TIME_RIFTS) - len(PACK_RIFTS)],
+                       SCORE_WEIGHTS, SCORE_ENDINGS, builtin(ERA_TOP_ENDINGS), ZERO_ENDINGS, ACHIEVEMENT_ENDINGS,
+                       SWING_UP, SWING_DOWN],
+            "numbers": [CHAPTER_LIMIT, MAX_AGE, AGE_STEP_MIN_MAX, ENV_TRIGGER_PROB, MILESTONES,
+                        ACHIEVEMENT_TARGET, VARIATION_SPREAD, TOP_SCORE, MENU_DRAW_VERSION],
+        }
+        if CONTENT_PACKS:
+            content["packs"] = [pack.digest for pack in CONTENT_PACKS]
+        blob = json.dumps(content, sort_keys=True).encode("utf-8")
+        _CONTENT_VERSION = int.from_bytes(hashlib.blake2b(blob, digest_size=8).digest(), "little")
+    return _CONTENT_VERSION
+
+def _put_varint(out: bytearray, n: int):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+def _get_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    n = shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+@dataclass(frozen=True)
+class LifeReplay:
+    seed: int
+    version: int
+    birth: str
+    era: str
+    nation: str
+    choices: Tuple[int, ...]
+
+    def encode(self) -> bytes:
+        out = bytearray()
+        _put_varint(out, abs(self.seed))     # Random() seeds with abs() of an int anyway
+        out += _REPLAY_HEAD.pack(self.version, _BIRTH_KEYS.index(self.birth),
+                                 _ERA_KEYS.index(self.era), _NATION_KEYS.index(self.nation))
+        _put_varint(out, len(self.choices))
+        codes = [_RIFT_CODE if c == RIFT else c for c in self.choices]
+        for i in range(0, len(codes), 4):
+            b = 0
+            for j, c in enumerate(codes[i:i + 4]):
+                b |= c << 2 * j
+            out.append(b)
+        return bytes(out)
+
+def decode_replays(data: bytes) -> List[LifeReplay]:
+    if not data.startswith(REPLAY_MAGIC):
+        raise ValueError("Not a replay file.")
+    out = []
+    pos, end = len(REPLAY_MAGIC), len(data)
+    unpack = _UNPACK_CHOICES
+    while pos < end:
+        seed, pos = _get_varint(data, pos)
+        version, b, e, nat = _REPLAY_HEAD.unpack_from(data, pos)
+        pos += _REPLAY_HEAD.size
+        n, pos = _get_varint(data, pos)
+        nbytes = (n + 3) >> 2
+        choices = sum(map(unpack.__getitem__, data[pos:pos + nbytes]), ())[:n]
+        pos += nbytes
+        out.append(LifeReplay(seed, version, _BIRTH_KEYS[b], _ERA_KEYS[e], _NATION_KEYS[nat], choices))
+    return out
+
+def load_replays(path: str) -> List[LifeReplay]:
+    with open(path, "rb") as fh:
+        return decode_replays(fh.read())
+
+def append_replay(path: str, rec: LifeReplay):
+    """Append one life; a new or empty file gets the magic header first."""
+    with open(path, "ab") as fh:
+        if fh.tell() == 0:
+            fh.write(REPLAY_MAGIC)
+        fh.write(rec.encode())
+
+class ReplayRecorder(EventSink):
+    """Sink that appends every finished life to a replay file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.start: Optional[Tuple[int, str, str, str]] = None
+        self.choices: List[int] = []
+
+    def life_start(self, sim):
+        if sim.seed is None:
+            raise ValueError("Only lives created with seed= can be recorded.")
+        self.start = (sim.seed, sim.birth, sim.era, sim.nation)   # era before any rift
+        self.choices = []
+
+    def turn(self, sim, res):
+        self.choices.append(res.choice)
+
+    def life_end(self, sim):
+        seed, birth, era, nation = self.start
+        append_replay(self.path, LifeReplay(seed, content_version(), birth, era, nation, tuple(self.choices)))
+
+def replay_life(rec: LifeReplay, sink: Optional[EventSink] = None) -> "LifeSimulation":
+    """Re-drive the engine through a recorded life; raises ValueError if it no longer matches."""
+    if rec.version != content_version():
+        raise ValueError("Replay was recorded against content {0:016x}, this build is {1:016x}.".format(
+            rec.version, content_version()))
+    sim = LifeSimulation(rec.birth, rec.era, rec.nation, seed=rec.seed, sink=sink)
+    for i, choice in enumerate(rec.choices):
+        if sim.done:
+            raise ValueError("Replay diverged: the life ended after {0} of {1} chapters.".format(i, len(rec.choices)))
+        sim.step(choice)
+    if not sim.done:
+        raise ValueError("Replay is truncated: the life is still running.")
+    return sim
+
+# ------------- Benchmarks -------------
+#
+# Micro-benchmarks for the per-turn hot paths over every (era, band), with
+# fresh ("warm") and exhausted ("depleted") used-template / trigger sets,
+# plus seeded end-to-end lives on the null sink. Results are JSON so a run
+# can be saved as a baseline and later runs compared against it.
+
+BENCH_HIGHER_IS_BETTER = {"lives_per_sec"}
+
+def _band_ages() -> List[Tuple[str, int]]:
+    return [(band, lo + (min(hi, MAX_AGE - 1) - lo) // 2) for band, (lo, hi) in AGE_BANDS]
+
+def _bench_cases(rng) -> Dict[str, List[tuple]]:
+    """Argument tuples for each micro-benchmark, built from the real content."""
+    cat = option_catalog()
+    stats_pool = [starting_stats(b) for b, _label in BIRTHS] + [
+        Stats(health=3, wealth=12, knowledge=25, karma=8, charisma=15),
+        Stats(health=20, wealth=1, knowledge=9, karma=29, charisma=4),
+    ]
+    menus, applies, resolves, envs = [], [], [], []
+    for era, _label in ERAS:
+        for band, age in _band_ages():
+            pool = cat.menu_pool(era, band)
+            depleted = all_tags = trig_all = 0
+            for o in pool:
+                all_tags |= o.tag_mask
+            for o in pool[2:]:
+                depleted |= o.bit
+            for key in trigger_sampler(era, band).keys:
+                trig_all |= key
+            for st in stats_pool:
+                menus.append((era, band, age, st, 0, 0, rng))
+                menus.append((era, band, age, st, depleted, all_tags, rng))
+            envs.append((era, age, 0, rng))
+            envs.append((era, age, trig_all, rng))
+            for o in pool:
+                for st in stats_pool[:2]:
+                    applies.append((st, o.delta))
+                    resolves.append((o, st, rng))
+    ends = [(st,) for st in stats_pool] + [
+        (Stats(health=0, wealth=5, knowledge=5, karma=5, charisma=5),),
+        (Stats(health=9, wealth=5, knowledge=ACHIEVEMENT_TARGET, karma=5, charisma=5),),
+    ]
+    return {
+        "build_option_menu": menus,
+        "Stats.apply": applies,
+        "resolve_outcome": resolves,
+        "maybe_env_trigger": envs,
+        "check_special_endings": ends,
+    }
+
+BENCH_FUNCS: Dict[str, Callable] = {
+    "build_option_menu": build_option_menu,
+    "Stats.apply": Stats.apply,
+    "resolve_outcome": resolve_outcome,
+    "maybe_env_trigger": maybe_env_trigger,
+    "check_special_endings": check_special_endings,
+}
+
+def _time_ns(fn: Callable, cases: List[tuple], repeat: int, min_calls: int = 20000) -> float:
+    """Best-of-repeat mean ns per call, cycling through cases."""
+    loops = max(1, -(-min_calls // len(cases)))
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter_ns()
+        for _loop in range(loops):
+            for args in cases:
+                fn(*args)
+        best = min(best, (time.perf_counter_ns() - t0) / (loops * len(cases)))
+    return best
+
+def _bench_lives(n_lives: int, repeat: int, seed: int) -> Dict[str, float]:
+    best = float("inf")
+    turns = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter_ns()
+        res = run_batch(random_policy, n_lives, random.Random(seed))
+        best = min(best, time.perf_counter_ns() - t0)
+        turns = sum(res.age_counts)
+    # tracemalloc slows everything down, so memory gets its own (smaller) pass
+    sample = max(1, n_lives // 10)
+    rng = random.Random(seed)
+    tracemalloc.start()
+    peak = sampled_turns = 0
+    try:
+        for _ in range(sample):
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            sim = run_life(random_policy, pick(BIRTHS, rng)[0], pick(ERAS, rng)[0], rng)
+            peak += tracemalloc.get_traced_memory()[1] - base
+            sampled_turns += sim.chapter
+    finally:
+        tracemalloc.stop()
+    return {
+        "lives_per_sec": n_lives / (best / 1e9),
+        "ns_per_turn": best / turns,
+        "peak_bytes_per_turn": peak / sampled_turns,
+    }
+
+def run_benchmarks(repeat: int = 5, n_lives: int = 2000, seed: int = 1) -> dict:
+    cases = _bench_cases(random.Random(seed))
+    results = {name: {"ns_per_op": _time_ns(BENCH_FUNCS[name], cases[name], repeat)} for name in BENCH_FUNCS}
+    results["life"] = _bench_lives(n_lives, repeat, seed)
+    return {"python": sys.version.split()[0], "repeat": repeat, "lives": n_lives, "results": results}
+
+def compare_benchmarks(current: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Metrics that got worse than baseline by more than `tolerance` (a fraction)."""
+    regressions = []
+    for name, metrics in current["results"].items():
+        for metric, value in metrics.items():
+            old = baseline.get("results", {}).get(name, {}).get(metric)
+            if not old:
+                continue
+            change = (old - value) / old if metric in BENCH_HIGHER_IS_BETTER else (value - old) / old
+            if change > tolerance:
+                regressions.append("{0} {1}: {2:.1f} -> {3:.1f} ({4:+.0%})".format(name, metric, old, value, change))
+    return regressions
+
+def bench_main(args: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog="life_restart.py --bench", description="Hot-path benchmarks.")
+    ap.add_argument("--repeat", type=int, default=5, help="best-of-N repeats per benchmark")
+    ap.add_argument("--lives", type=int, default=2000, help="lives for the end-to-end benchmark")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--save", metavar="PATH", help="write results as a JSON baseline")
+    ap.add_argument("--baseline", metavar="PATH", help="compare against a saved baseline")
+    ap.add_argument("--tolerance", type=float, default=0.15, help="allowed slowdown before failing (fraction)")
+    opts = ap.parse_args(args)
+    current = run_benchmarks(opts.repeat, opts.lives, opts.seed)
+    for name, metrics in current["results"].items():
+        print("{0:<24} ".format(name) + "   ".join("{0}={1:,.1f}".format(k, v) for k, v in metrics.items()))
+    if opts.save:
+        with open(opts.save, "w", encoding="utf-8") as fh:
+            json.dump(current, fh, indent=2)
+    if opts.baseline:
+        with open(opts.baseline, encoding="utf-8") as fh:
+            regressions = compare_benchmarks(current, json.load(fh), opts.tolerance)
+        for line in regressions:
+            print("REGRESSION " + line)
+        if regressions:
+            return 1
+        print("No regressions beyond {0:.0%}.".format(opts.tolerance))
+    return 0
+
+# ------------- Leaderboard -------------
+#
+# Finished lives go to a SQLite table whose (score DESC, id) indexes serve
+# top-k per scope with an O(log n + k) index walk. Ranks come from Fenwick
+# trees of life counts per score slot: scores are whole tenths in
+# [0, LEADERBOARD_SLOTS), so an insert or a rank query costs O(log slots)
+# however many lives are stored. The per-slot counts are kept in the store
+# in the same transaction as the lives, and opening a leaderboard rebuilds
+# the trees from them without touching the lives table.
+
+LEADERBOARD_SLOTS = round(100 * sum(SCORE_WEIGHTS.values()) * SCORE_SCALE) + 1
+
+class ScoreTree:
+    """Fenwick tree of life counts per score slot (score x SCORE_SCALE)."""
+
+    __slots__ = ("tree", "total")
+
+    def __init__(self, counts: Optional[Dict[int, int]] = None):
+        tree = [0] * (LEADERBOARD_SLOTS + 1)
+        for s, n in (counts or {}).items():
+            tree[s + 1] += n
+        for i in range(1, len(tree)):     # linear-time build
+            j = i + (i & -i)
+            if j < len(tree):
+                tree[j] += tree[i]
+        self.tree = tree
+        self.total = sum(counts.values()) if counts else 0
+
+    def add(self, s: int, n: int = 1):
+        tree, i = self.tree, s + 1
+        while i < len(tree):
+            tree[i] += n
+            i += i & -i
+        self.total += n
+
+    def at_most(self, s: int) -> int:
+        """Lives scoring s or lower."""
+        tree, i, acc = self.tree, min(s, LEADERBOARD_SLOTS - 1) + 1, 0
+        while i > 0:
+            acc += tree[i]
+            i -= i & -i
+        return acc
+
+@dataclass(frozen=True)
+class Standing:
+    scope: str      # "all", "era:<key>" or "ending:<text>"
+    rank: int       # 1 + lives that scored strictly higher
+    total: int
+    below: int      # lives that scored strictly lower
+
+    @property
+    def percentile(self) -> float:
+        """Share of the scope's lives this score beats, in percent."""
+        return 100.0 * self.below / self.total if self.total else 0.0
+
+@dataclass
+class BoardEntry:
+    id: int
+    user: str
+    birth: str
+    era: str        # the era the life ended in (the one ending_for used)
+    ending: str
+    score: float
+    age: int
+
+def board_scope(era: Optional[str] = None, ending: Optional[str] = None) -> str:
+    if era is not None and ending is not None:
+        raise ValueError("Leaderboards are kept per era or per ending, not per pair.")
+    if era is not None:
+        return "era:" + era
+    return "all" if ending is None else "ending:" + ending
+
+class Leaderboard:
+    """
+    Persistent leaderboard of finished lives (in memory if path is None).
+    insert()/record() may be called from any thread; the server runs them on
+    the user store's pool.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS lives (id INTEGER PRIMARY KEY, user TEXT NOT NULL, birth TEXT NOT NULL, "
+        "era TEXT NOT NULL, ending TEXT NOT NULL, score INTEGER NOT NULL, age INTEGER NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS lives_by_score ON lives (score DESC, id)",
+        "CREATE INDEX IF NOT EXISTS lives_by_era ON lives (era, score DESC, id)",
+        "CREATE INDEX IF NOT EXISTS lives_by_ending ON lives (ending, score DESC, id)",
+        "CREATE TABLE IF NOT EXISTS score_counts (scope TEXT NOT NULL, score INTEGER NOT NULL, "
+        "n INTEGER NOT NULL, PRIMARY KEY (scope, score)) WITHOUT ROWID",
+    )
+    INSERT = "INSERT INTO lives (user, birth, era, ending, score, age) VALUES (?, ?, ?, ?, ?, ?)"
+    COUNT = ("INSERT INTO score_counts (scope, score, n) VALUES (?, ?, ?) "
+             "ON CONFLICT (scope, score) DO UPDATE SET n = n + excluded.n")
+    TOP = "SELECT id, user, birth, era, ending, score, age FROM lives{0} ORDER BY score DESC, id LIMIT ?"
+
+    def __init__(self, path: Optional[str] = None):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path or ":memory:", isolation_level=None, check_same_thread=False)
+        if path:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        for stmt in self.SCHEMA:
+            self._db.execute(stmt)
+        counts: Dict[str, Dict[int, int]] = {}
+        for scope, s, n in self._db.execute("SELECT scope, score, n FROM score_counts"):
+            counts.setdefault(scope, {})[s] = n
+        self.trees: Dict[str, ScoreTree] = {scope: ScoreTree(c) for scope, c in counts.items()}
+
+    @property
+    def total(self) -> int:
+        tree = self.trees.get("all")
+        return tree.total if tree else 0
+
+    def insert(self, rows: List[Tuple[str, str, str, str, int, int]]):
+        """Add lives as (user, birth, era, ending, score x SCORE_SCALE, age), in one transaction."""
+        counts: Dict[Tuple[str, int], int] = {}
+        for _user, _birth, era, ending, s, _age in rows:
+            if not 0 <= s < LEADERBOARD_SLOTS:
+                raise ValueError("Score {0} is outside the leaderboard's range.".format(s / SCORE_SCALE))
+            for scope in ("all", "era:" + era, "ending:" + ending):
+                counts[scope, s] = counts.get((scope, s), 0) + 1
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(self.INSERT, rows)
+                self._db.executemany(self.COUNT, [(scope, s, n) for (scope, s), n in counts.items()])
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            for (scope, s), n in counts.items():
+                tree = self.trees.get(scope)
+                if tree is None:
+                    tree = self.trees[scope] = ScoreTree()
+                tree.add(s, n)
+
+    def record(self, user: str, sim: LifeSimulation) -> List[Standing]:
+        """Store a finished life; returns its standing overall, in its era and among its ending."""
+        s = round(score(sim.stats) * SCORE_SCALE)
+        self.insert([(user, sim.birth, sim.era, sim.ending, s, sim.age)])
+        return [self.standing(s / SCORE_SCALE, scope) for scope in ("all", "era:" + sim.era, "ending:" + sim.ending)]
+
+    def standing(self, value: float, scope: str = "all") -> Standing:
+        """Where a score of `value` stands among the scope's recorded lives."""
+        s = round(value * SCORE_SCALE)
+        with self._lock:
+            tree = self.trees.get(scope)
+            if tree is None:
+                return Standing(scope, 1, 0, 0)
+            at_most = tree.at_most(s)
+            below = tree.at_most(s - 1)
+            return Standing(scope, tree.total - at_most + 1, tree.total, below)
+
+    def top(self, k: int = 10, era: Optional[str] = None, ending: Optional[str] = None) -> List[BoardEntry]:
+        where, args = [], []
+        for column, value in (("era", era), ("ending", ending)):
+            if value is not None:
+                where.append(column + " = ?")
+                args.append(value)
+        sql = self.TOP.format(" WHERE " + " AND ".join(where) if where else "")
+        with self._lock:
+            rows = self._db.execute(sql, args + [k]).fetchall()
+        return [BoardEntry(i, u, b, e, t, s / SCORE_SCALE, a) for i, u, b, e, t, s, a in rows]
+
+    def endings(self) -> List[str]:
+        return sorted(scope[len("ending:"):] for scope in self.trees if scope.startswith("ending:"))
+
+    def close(self):
+        self._db.close()
+
+def print_standing(out: "TextOut", standings: List[Standing]):
+    overall, in_era, with_ending = standings
+    out.print("\n--- Leaderboard ---")
+    out.print("Rank {0} of {1} overall, better than {2:.1f}% of recorded lives.".format(
+        overall.rank, overall.total, overall.percentile))
+    out.print("Rank {0} of {1} in {2}; rank {3} of {4} with this ending.".format(
+        in_era.rank, in_era.total, label_of(ERAS, in_era.scope[len("era:"):]), with_ending.rank, with_ending.total))
+
+def leaderboard_main(path: Optional[str], args: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog="life_restart.py --leaderboard PATH --top", description="Show the best recorded lives.")
+    ap.add_argument("--top", type=int, default=10, metavar="K")
+    ap.add_argument("--era", choices=[k for k, _label in ERAS])
+    ap.add_argument("--ending", metavar="TEXT", help="any unambiguous part of an ending's text")
+    opts = ap.parse_args(args)
+    if path is None:
+        ap.error("--top needs --leaderboard PATH")
+    board = Leaderboard(path)
+    try:
+        ending = None
+        if opts.ending is not None:
+            matches = [text for text in board.endings() if opts.ending.lower() in text.lower()]
+            if len(matches) != 1:
+                print("{0} recorded endings match {1!r}.".format(len(matches), opts.ending))
+                return 1
+            ending = matches[0]
+        entries = board.top(opts.top, opts.era, ending)
+        print("{0} lives recorded.".format(board.total))
+        for n, e in enumerate(entries, 1):
+            print("{0:>4}. {1:7.1f}  {2:<16} {3:<12} {4:<12} age {5:>3}  {6}".format(
+                n, e.score, e.user, e.birth, e.era, e.age, e.ending))
+    finally:
+        board.close()
+    return 0
+
+# ------------- UI Helpers (with clear effect preview) -------------
+#
+# The UI is I/O-free: helpers print into a TextOut buffer, and the ones that
+# need player input are generators that yield a prompt and receive the
+# answer line (compose them with `yield from`). GameSession drives them.
+
+@dataclass(frozen=True)
+class Blocking:
+    """
+    Yielded by a flow instead of a prompt: the driver runs fn(*args) (off the
+    event loop) and sends back the result. slow marks CPU-bound calls (password
+    hashing), which the server runs only a few at a time.
+    """
+    fn: Callable
+    args: tuple = ()
+    slow: bool = False
+
+    def run(self):
+        return self.fn(*self.args)
+
+class TextOut:
+    """print()-compatible output buffer."""
+
+    def __init__(self):
+        self.parts: List[str] = []
+
+    def print(self, *args, sep: str = " ", end: str = "\n"):
+        self.parts.append(sep.join(str(a) for a in args) + end)
+
+    def drain(self) -> str:
+        text = "".join(self.parts)
+        self.parts = []
+        return text
+
+def choose(out: TextOut, title: str, options: List[Tuple[str, str]]):
+    out.print("\n" + title)
+    for idx, (k, label) in enumerate(options, start=1):
+        out.print("  {0}) {1}".format(idx, label))
+    while True:
+        ans = (yield "Pick 1..{0}: ".format(len(options))).strip()
+        if ans.isdigit():
+            i = int(ans)
+            if 1 <= i <= len(options):
+                return options[i - 1][0]
+        out.print("Invalid choice, try again.")
+
+def choose_from_options(out: TextOut, menu: List[Option], allow_rift: bool = True, show: bool = True):
+    # Show preview of deltas & risk/swing BEFORE choosing
+    for idx, o in enumerate(menu if show else (), start=1):
+        total = sum(o.delta.values())
+        hint = " + " if total > 0 else (" - " if total < 0 else " ~ ")
+        preview = make_preview_text(o)
+        out.print(f"  {idx}){hint}{o.text}")
+        out.print(f"      Δ preview → {preview}")
+    prompt = "Choose 1..{0}{1}: ".format(len(menu), " (or 'r' for time rift)" if allow_rift else "")
+    while True:
+        ans = (yield prompt).strip().lower()
+        if allow_rift and ans == "r":
+            return Option("__RIFT__", {}, set(), set(), 0.0, 0.0, "dyn", template_id=RIFT_TEMPLATE_ID)
+        if ans.isdigit():
+            i = int(ans)
+            if 1 <= i <= len(menu):
+                return menu[i - 1]
+        out.print("Invalid choice, try again.")
+
+def print_stats(out: TextOut, stats: Stats, age: int):
+    out.print("Age: {0}   Stats: {1}".format(age, stats.pretty()))
+
+# ------------- Game Loop -------------
+
+def print_ending(out: TextOut, sim: LifeSimulation, log: TextLog):
+    if sim.ending_kind == "special":
+        out.print("\n=== Special Ending ===")
+        out.print(sim.ending)
+    elif sim.ending_kind == "final":
+        out.print("\n=== Final Ending ===")
+        out.print(sim.ending)
+    else:
+        out.print("\n=== Final Page ===")
+        out.print("Era at rest: {0}   Nation: {1}".format(label_of(ERAS, sim.era), label_of(NATIONALITIES, sim.nation)))
+        print_stats(out, sim.stats, sim.age)
+        out.print("\n" + sim.ending)
+    out.print("\n--- Life Log ---")
+    for line in log.lines():
+        out.print("* " + line)
+
+SESSION_MAGIC = b"LRSES1"
+
+class GameSession:
+    """
+    One whole game as a prompt-yielding generator, driven one input line at
+    a time with no terminal I/O: start() and feed() return everything printed
+    up to and including the next prompt. If the flow needs blocking work
+    first, `pending` is set and the driver hands its result to resume()
+    instead. play() wires it to stdin/stdout; the server runs many at once.
+
+    While the session waits on a chapter choice (`resumable`), checkpoint()
+    captures all of it and restore() rebuilds it at that same prompt, which
+    is how SessionManager spills idle sessions and parks abandoned lives.
+    """
+
+    def __init__(self, seed: Optional[int] = None, hints: Optional["PolicyTable"] = None,
+                 record: Optional[str] = None, profile: Optional[str] = None,
+                 users: Optional[UserStore] = None, saves: Optional["SessionManager"] = None,
+                 leaderboard: Optional[Leaderboard] = None):
+        if seed is None:
+            seed = random.SystemRandom().randrange(1 << 63)   # every session is replayable
+        self.seed = seed
+        self.hints = hints
+        self.record = record
+        self.profile = profile
+        self.users = users
+        self.saves = saves
+        self.leaderboard = leaderboard
+        self.out = TextOut()
+        self.exit_code: Optional[int] = None
+        self.prompt = ""
+        self.pending: Optional[Blocking] = None
+        self.user: Optional[str] = None
+        self.sim: Optional[LifeSimulation] = None
+        self.log: Optional[TextLog] = None
+        self.recorder: Optional[ReplayRecorder] = None
+        self.resumable = False
+        self._flow = self._game()
+
+    @property
+    def done(self) -> bool:
+        return self.exit_code is not None
+
+    def _advance(self, value) -> str:
+        try:
+            step = next(self._flow) if value is None else self._flow.send(value)
+        except StopIteration as stop:
+            self.exit_code, step = stop.value, ""
+        self.pending = step if isinstance(step, Blocking) else None
+        self.prompt = "" if self.pending else step
+        return self.out.drain() + self.prompt
+
+    def start(self) -> str:
+        return self._advance(None)
+
+    def feed(self, line: str) -> str:
+        if self.done or self.pending:
+            raise RuntimeError("This session is not waiting for input.")
+        return self._advance(line)
+
+    def resume(self, result) -> str:
+        if self.pending is None:
+            raise RuntimeError("This session has no pending call.")
+        return self._advance(result)
+
+    def _game(self):
+        out = self.out
+        prof = PROFILER if self.profile else None
+        if prof:
+            prof.reset()
+            prof.enabled = True
+
+        # Login/Register
+        if self.users is None:
+            self.users = UserStore()
+        login = yield from auth_flow(out, self.users)
+        if login is None:
+            return 1
+        self.user = login[0]
+
+        out.print("=== Life Restart Simulator (CLI) ===\n")
+
+        blob = (yield Blocking(self.saves.take, (self.user,))) if self.saves is not None else None
+        if blob is not None:
+            try:
+                self._load(blob)
+            except ValueError:
+                out.print("Your saved life belongs to another version of the game; starting a new one.")
+            else:
+                out.print("Resuming your unfinished life at chapter {0}.".format(self.sim.chapter + 1))
+                print_stats(out, self.sim.stats, self.sim.age)
+                return (yield from self._chapters(prof))
+
+        birth = yield from choose(out, "1) Choose your birth status", BIRTHS)
+        nation = yield from choose(out, "2) Choose your nationality", NATIONALITIES)
+        era = yield from choose(out, "3) Choose your starting era", ERAS)
+
+        # Random(seed) draws the same stream random.seed(seed) did, so `main <seed>` runs are unchanged
+        self.log = TextLog()
+        self.recorder = ReplayRecorder(self.record) if self.record else None
+        sink = TeeSink(self.log, self.recorder) if self.recorder else self.log
+        self.sim = LifeSimulation(birth, era, nation, seed=self.seed, sink=sink)
+        print_stats(out, self.sim.stats, self.sim.age)
+        return (yield from self._chapters(prof))
+
+    def _chapters(self, prof: Optional[PhaseProfiler] = None, redraw: bool = True):
+        """The chapter loop and the ending; redraw=False resumes silently at an already shown menu."""
+        out, sim, hints = self.out, self.sim, self.hints
+        while not sim.done:
+            t = prof.now() if prof else 0
+            menu = sim.menu
+            if redraw:
+                out.print("\n--- Chapter {0}: {1} years old ({2}) ---".format(sim.chapter + 1, sim.age, sim.band))
+                if hints is not None and sim.era == hints.era:
+                    best = hints.best_choice(sim.chapter + 1, sim.age, sim.stats, menu)
+                    if best is not None:
+                        out.print("Hint: option {0} ({1})".format(best + 1, hints.header["objective"]))
+            self.resumable = True
+            opt = yield from choose_from_options(out, menu, allow_rift=not sim.is_milestone, show=redraw)
+            self.resumable = False
+            redraw = True
+            idx = RIFT if opt.template_id == RIFT_TEMPLATE_ID else menu.index(opt)
+            if prof:
+                t = prof.lap("ui;input", t)   # menu display + waiting on the player
+            res = sim.step(idx)
+            if prof:
+                t = prof.now()
+
+            if res.rift:
+                label, next_era = res.rift
+                out.print("Time Rift: {0}".format(label))
+                out.print("You tumble into {0}!".format(label_of(ERAS, next_era)))
+                out.print("(Auto-picked after rift) {0}".format(res.option.text))
+
+            # Full breakdown for the player
+            out.print(res.option.text)
+            if res.note:
+                out.print("  Event note:", res.note)
+            out.print("  Result →", fmt_delta(res.net_option))
+            out.print("  Random variation →", fmt_delta(res.rnd))
+            out.print("  Total this turn →", fmt_delta(res.net_total))
+            print_stats(out, res.stats, res.age)
+
+            if res.env:
+                t_text, t_delta = res.env
+                out.print("\nEnvironment:", t_text)
+                out.print("  Environment impact →", fmt_delta(t_delta))
+                print_stats(out, res.env_stats, res.age)
+
+            if res.step:
+                out.print("Time passes: +{0} years. Age is now {1}.".format(res.step, sim.age))
+            if prof:
+                prof.lap("ui;render", t)
+
+        print_ending(out, sim, self.log)
+        if self.leaderboard is not None:
+            print_standing(out, (yield Blocking(self.leaderboard.record, (self.user, sim))))
+        if prof:
+            prof.enabled = False
+            out.print("\n--- Profile ---")
+            out.print(prof.summary())
+            with open(self.profile, "w", encoding="utf-8") as fh:
+                fh.write(prof.collapsed("play"))
+        return 0
+
+    def checkpoint(self) -> bytes:
+        """
+        Layout: MAGIC | varint seed | user, record path (varint len, utf-8)
+        | recorder: u8 start era, varint n, n x u8 choice (3 = rift), if recording
+        | varint len, zlib life-log lines | LifeSimulation.snapshot().
+        """
+        if not self.resumable:
+            raise RuntimeError("Only a session waiting on a chapter choice can be checkpointed.")
+        out = bytearray(SESSION_MAGIC)
+        _put_varint(out, abs(self.seed))
+        for text in (self.user, self.record or ""):
+            raw = text.encode("utf-8")
+            _put_varint(out, len(raw))
+            out += raw
+        if self.recorder is not None:
+            out.append(_ERA_KEYS.index(self.recorder.start[2]))
+            _put_varint(out, len(self.recorder.choices))
+            out += bytes(_RIFT_CODE if c == RIFT else c for c in self.recorder.choices)
+        log = zlib.compress("\n".join(self.log.lines()).encode("utf-8"), 1)
+        _put_varint(out, len(log))
+        out += log
+        out += self.sim.snapshot()
+        return bytes(out)
+
+    def _load(self, blob: bytes):
+        if not blob.startswith(SESSION_MAGIC):
+            raise ValueError("Not a session checkpoint.")
+        self.seed, pos = _get_varint(blob, len(SESSION_MAGIC))
+        texts = []
+        for _ in range(2):
+            size, pos = _get_varint(blob, pos)
+            texts.append(str(blob[pos:pos + size], "utf-8"))
+            pos += size
+        self.user, self.record = texts[0], texts[1] or None
+        if self.record:
+            self.recorder = ReplayRecorder(self.record)
+            start_era = _ERA_KEYS[blob[pos]]
+            n, pos = _get_varint(blob, pos + 1)
+            self.recorder.choices = [RIFT if c == _RIFT_CODE else c for c in blob[pos:pos + n]]
+            pos += n
+        size, pos = _get_varint(blob, pos)
+        lines = zlib.decompress(blob[pos:pos + size]).decode("utf-8").split("\n")
+        self.log = TextLog(history=lines)
+        sink = TeeSink(self.log, self.recorder) if self.recorder else self.log
+        self.sim = LifeSimulation.restore(blob[pos + size:], sink=sink)
+        if self.recorder:
+            self.recorder.start = (self.sim.seed, self.sim.birth, start_era, self.sim.nation)
+
+    @classmethod
+    def restore(cls, blob: bytes, **kwargs) -> "GameSession":
+        """Rebuild a checkpointed session at its chapter prompt (nothing is printed again)."""
+        session = cls(seed=0, **kwargs)
+        session._load(blob)
+        session._flow = session._chapters(redraw=False)
+        session.start()
+        return session
+
+class SessionManager:
+    """
+    Keeps the `resident` most recently active GameSessions in memory and
+    spills colder ones, as checkpoints, to a SQLite table (in memory if path
+    is None; a checkpoint is still a fraction of a live session). get()
+    brings a spilled session back before its next move. A life whose player
+    left mid-game is parked under the user name until they log in again.
+    Store writes are queued in order; with `defer` set (GameServer hands
+    them to the user store's pool) they run off the caller's thread, and
+    every read applies the queue first, so it sees all earlier writes.
+    """
+
+    SCHEMA = "CREATE TABLE IF NOT EXISTS sessions (key TEXT PRIMARY KEY, blob BLOB NOT NULL)"
+    LOOKUP = "SELECT blob FROM sessions WHERE key = ?"
+    STORE = "INSERT OR REPLACE INTO sessions (key, blob) VALUES (?, ?)"
+    DELETE = "DELETE FROM sessions WHERE key = ?"
+    RENAME = "UPDATE OR REPLACE sessions SET key = ? WHERE key = ?"
+
+    def __init__(self, resident: int = 1000, path: Optional[str] = None, **session_kwargs):
+        self.resident = resident
+        self.session_kwargs = session_kwargs     # e.g. hints, for restored sessions
+        self.live: "OrderedDict[str, GameSession]" = OrderedDict()
+        self.spilled: Dict[str, str] = {}        # key -> user, for sessions held only in the store
+        self.spills = self.restores = 0
+        self.defer: Optional[Callable[[Callable[[], None]], object]] = None   # runs flush() elsewhere
+        self._writes: List[Tuple[str, tuple]] = []
+        self._lock = threading.Lock()            # take(), fetch() and flush() run on the user store's pool
+        self._db = sqlite3.connect(path or ":memory:", isolation_level=None, check_same_thread=False)
+        if path:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(self.SCHEMA)
+        self._db.execute("DELETE FROM sessions WHERE key LIKE 'live:%'")   # spills die with their process
+
+    def _write(self, sql: str, params: tuple):
+        with self._lock:
+            self._writes.append((sql, params))
+        if self.defer is None:
+            self.flush()
+        else:
+            self.defer(self.flush)
+
+    def _apply_writes(self):
+        writes, self._writes = self._writes, []
+        for sql, params in writes:
+            self._db.execute(sql, params)
+
+    def flush(self):
+        """Apply the queued store writes."""
+        with self._lock:
+            self._apply_writes()
+
+    def _pop_blob(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            self._apply_writes()
+            row = self._db.execute(self.LOOKUP, (key,)).fetchone()
+            if row is not None:
+                self._db.execute(self.DELETE, (key,))
+        return row[0] if row else None
+
+    def add(self, key: str, session: GameSession):
+        self.live[key] = session
+        self._evict()
+
+    def fetch(self, key: str) -> Optional[bytes]:
+        """Remove and return the checkpoint of spilled key, for get() (safe on any thread)."""
+        return self._pop_blob("live:" + key)
+
+    def get(self, key: str, blob: Optional[bytes] = None) -> GameSession:
+        """The live session for key, restored if it was spilled (from blob, if fetch() already ran)."""
+        session = self.live.get(key)
+        if session is not None:
+            self.live.move_to_end(key)
+            return session
+        self.spilled.pop(key)
+        session = GameSession.restore(blob if blob is not None else self.fetch(key), **self.session_kwargs)
+        self.restores += 1
+        self.add(key, session)
+        return session
+
+    def _evict(self):
+        # the newest session is never spilled: its caller is about to use it
+        scans = len(self.live) - 1
+        while len(self.live) > self.resident and scans > 0:
+            scans -= 1
+            key, session = next(iter(self.live.items()))
+            if not session.resumable:
+                self.live.move_to_end(key)     # logging in or mid-move; try the next one
+                continue
+            self._write(self.STORE, ("live:" + key, session.checkpoint()))
+            del self.live[key]
+            self.spilled[key] = session.user
+            self.spills += 1
+
+    def close(self, key: str):
+        """Forget a connection's session; a life left mid-game is parked for its user."""
+        session = self.live.pop(key, None)
+        if session is not None:
+            self.park(session)
+            return
+        user = self.spilled.pop(key, None)
+        if user is not None:
+            self._write(self.RENAME, ("user:" + user, "live:" + key))
+
+    def park(self, session: GameSession):
+        if session.resumable and session.user:
+            self._write(self.STORE, ("user:" + session.user, session.checkpoint()))
+
+    def take(self, user: str) -> Optional[bytes]:
+        """Remove and return the life parked for user, if any."""
+        return self._pop_blob("user:" + user)
+
+    def shutdown(self):
+        """Park every live and spilled session, then close the store."""
+        self.defer = None
+        for key in list(self.live) + list(self.spilled):
+            self.close(key)
+        with self._lock:
+            self._apply_writes()
+            self._db.close()
+
+def play(seed: int = None, hints: Optional["PolicyTable"] = None, record: Optional[str] = None,
+         profile: Optional[str] = None, users: Optional[str] = None, saves: Optional[str] = None,
+         leaderboard: Optional[str] = None) -> int:
+    store = UserStore(users)
+    board = Leaderboard(leaderboard) if leaderboard else None
+    manager = SessionManager(path=saves, hints=hints, leaderboard=board) if saves else None
+    session = GameSession(seed, hints=hints, record=record, profile=profile, users=store, saves=manager,
+                          leaderboard=board)
+    text = session.start()
+    try:
+        while True:
+            while session.pending:
+                text += session.resume(session.pending.run())
+            sys.stdout.write(text)
+            if session.done:
+                return session.exit_code
+            sys.stdout.flush()
+            text = session.feed(input())
+    except (EOFError, KeyboardInterrupt):
+        if manager is not None and session.resumable:
+            manager.park(session)      # picked up again at the next login
+            sys.stdout.write("\nYour life is saved; log in again to continue.\n")
+        raise
+    finally:
+        if manager is not None:
+            manager.shutdown()
+        if board is not None:
+            board.close()
+        store.close()
+
+# ------------- Game Server (asyncio) -------------
+#
+# Line protocol over TCP: the server sends game text whose last line is the
+# prompt (prompts end in ": "), the client answers with one line, and the
+# connection closes when the game ends. Every connection owns a GameSession,
+# which owns its LifeSimulation and Random -- the module-global random is
+# never touched, so sessions cannot disturb each other.
+
+SERVER_MAX_LINE = 256          # longest accepted input line, bytes
+SERVER_IDLE_TIMEOUT = 300.0    # seconds of silence before a session is dropped
+SERVER_GC_EVERY = 5000         # finished sessions between full collections (see GameServer.serve)
+SERVER_HASH_SLOTS = max(1, (os.cpu_count() or 2) // 2)   # password hashes in flight; the rest of the CPU serves moves
+PROMPT_END = ": "
+
+def _wire(text: str) -> bytes:
+    return (text if text.endswith("\n") else text + "\n").encode("utf-8")
+
+class GameServer:
+    """
+    Serves GameSessions on one event loop. Per-session memory is bounded:
+    output is flushed every move, input lines are capped at SERVER_MAX_LINE
+    and the life log holds at most CHAPTER_LIMIT turns. Only the
+    sessions.resident most recently active sessions stay in memory; the
+    rest wait as checkpoints in the SessionManager's store, which is read
+    and written on the user store's pool, never on the loop.
+    """
+
+    def __init__(self, max_sessions: int = 10000, idle_timeout: float = SERVER_IDLE_TIMEOUT,
+                 root_seed: Optional[int] = None, users: Optional[UserStore] = None,
+                 sessions: Optional[SessionManager] = None, leaderboard: Optional[Leaderboard] = None,
+                 hash_slots: int = SERVER_HASH_SLOTS):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.root_seed = root_seed      # set for reproducible sessions: session n plays derive_seed(root, n)
+        self.users = users if users is not None else UserStore()
+        self.sessions = sessions if sessions is not None else SessionManager(max_sessions, leaderboard=leaderboard)
+        self.leaderboard = leaderboard
+        self.hash_slots = asyncio.Semaphore(hash_slots)
+        self.last_seen: Dict[asyncio.StreamWriter, float] = {}
+        self.served = self.finished = 0
+        self.reaper: Optional[asyncio.Task] = None
+
+    @property
+    def active(self) -> int:
+        return len(self.last_seen)
+
+    async def _reap_idle(self):
+        """One sweeper for all sessions, so a move costs no timer or task of its own."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(min(1.0, self.idle_timeout / 4))
+            cutoff = loop.time() - self.idle_timeout
+            for writer, seen in list(self.last_seen.items()):
+                if seen < cutoff:
+                    writer.write(b"\nIdle timeout, goodbye.\n")
+                    writer.close()     # the session's pending readline() then sees EOF
+
+    async def _settle(self, session: GameSession, text: str) -> str:
+        """
+        Run the session's blocking calls on the user store's pool. Slow ones
+        (password hashes) wait for one of hash_slots first, so a login storm
+        cannot take every core away from the sessions that are playing.
+        """
+        loop = asyncio.get_running_loop()
+        while session.pending:
+            call = session.pending
+            if call.slow:
+                async with self.hash_slots:
+                    result = await loop.run_in_executor(self.users.pool, call.run)
+            else:
+                result = await loop.run_in_executor(self.users.pool, call.run)
+            text += session.resume(result)
+        return text
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        if self.active >= self.max_sessions:
+            writer.write(b"Server is full, try again later.\n")
+            writer.close()
+            return
+        loop = asyncio.get_running_loop()
+        self.last_seen[writer] = loop.time()
+        n, self.served = self.served, self.served + 1
+        seed = derive_seed(self.root_seed, n) if self.root_seed is not None else None
+        key = str(n)
+        session = GameSession(seed, users=self.users, saves=self.sessions, leaderboard=self.leaderboard)
+        self.sessions.add(key, session)
+        try:
+            writer.write(_wire(await self._settle(session, session.start())))
+            while not session.done:
+                await writer.drain()
+                try:
+                    line = await reader.readline()
+                except ValueError:           # longer than SERVER_MAX_LINE
+                    writer.write(b"\nLine too long, goodbye.\n")
+                    break
+                if not line:
+                    break
+                self.last_seen[writer] = loop.time()
+                blob = None
+                if key in self.sessions.spilled:     # spilled while idle: read it back off the loop
+                    blob = await loop.run_in_executor(self.users.pool, self.sessions.fetch, key)
+                session = self.sessions.get(key, blob)
+                text = session.feed(line.decode("utf-8", "replace").rstrip("\r\n"))
+                writer.write(_wire(await self._settle(session, text)))
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            del self.last_seen[writer]
+            self.sessions.close(key)
+            self.finished += 1
+            if self.finished % SERVER_GC_EVERY == 0:
+                gc.collect()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def start(self, host: str, port: int) -> asyncio.AbstractServer:
+        """Listen on host:port (0 picks a free port) with the idle sweeper running; self.reaper is its task."""
+        content_version()   # builds the built-in eras up front so no session's first move pays for it
+        loop = asyncio.get_running_loop()
+        self.sessions.defer = lambda flush: loop.run_in_executor(self.users.pool, flush)
+        server = await asyncio.start_server(self.handle, host, port, limit=SERVER_MAX_LINE,
+                                            backlog=min(self.max_sessions, 4096))
+        self.reaper = asyncio.create_task(self._reap_idle())
+        return server
+
+    async def serve(self, host: str, port: int):
+        server = await self.start(host, port)
+        # Full collections over thousands of live sessions stall the loop for 100ms+.
+        # Sessions leave almost no cyclic garbage (~8 objects each), so the automatic
+        # collector is off and handle() runs one every SERVER_GC_EVERY sessions.
+        gc.freeze()
+        gc.disable()
+        print("Serving on {0}".format(", ".join(str(sock.getsockname()) for sock in server.sockets)))
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.reaper.cancel()
+            gc.enable()
+
+async def _load_client(host: str, port: int, user: str, think: float, latencies: List[float],
+                       logins: List[float]):
+    """
+    Play one game with random answers. Records seconds from each game answer
+    to the next prompt in latencies, and the register/login answers (which
+    wait on password hashing) separately in logins.
+    """
+    rng = random.Random(user)
+    script = [user, "pw"] * 2
+    prompt_end = (PROMPT_END + "\n").encode("utf-8")
+    await asyncio.sleep(rng.uniform(0, 2 * think))    # players arrive spread out, not in one burst
+    reader, writer = await asyncio.open_connection(host, port, limit=1 << 16)
+    t0, move = None, False
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            if not line.endswith(prompt_end):
+                continue
+            if t0 is not None:
+                (latencies if move else logins).append(time.perf_counter() - t0)
+            await asyncio.sleep(rng.uniform(0, 2 * think))
+            move = not script
+            answer = script.pop(0) if script else str(rng.randint(1, 3))
+            writer.write((answer + "\n").encode("utf-8"))
+            t0 = time.perf_counter()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+async def run_load(host: str, port: int, sessions: int, think: float) -> Tuple[List[float], List[float]]:
+    """Run `sessions` concurrent scripted games against a server; returns (move, login) latencies."""
+    latencies: List[float] = []
+    logins: List[float] = []
+    run = random.SystemRandom().randrange(1 << 32)     # usernames must be new to the server
+    await asyncio.gather(*(_load_client(host, port, "load{0:08x}-{1}".format(run, i), think, latencies, logins)
+                           for i in range(sessions)))
+    return latencies, logins
+
+def server_main(args: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog="life_restart.py --serve", description="Multi-session TCP game server.")
+    mode = ap.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--serve", action="store_true", help="run the server")
+    mode.add_argument("--load", action="store_true", help="load-test a running server")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=9001)
+    ap.add_argument("--max-sessions", type=int, default=10000)
+    ap.add_argument("--idle-timeout", type=float, default=SERVER_IDLE_TIMEOUT, help="seconds")
+    ap.add_argument("--seed", type=int, default=None, help="root seed for reproducible sessions")
+    ap.add_argument("--users", metavar="PATH", help="SQLite account store (in memory if omitted)")
+    ap.add_argument("--scrypt-n", type=int, default=1 << 14, help="scrypt cost for new password hashes")
+    ap.add_argument("--hash-slots", type=int, default=SERVER_HASH_SLOTS, help="password hashes run at once")
+    ap.add_argument("--resident", type=int, default=1000, help="sessions kept in memory; idle ones beyond are spilled")
+    ap.add_argument("--saves", metavar="PATH", help="SQLite store for spilled and parked sessions (in memory if omitted)")
+    ap.add_argument("--leaderboard", metavar="PATH", help="SQLite leaderboard that ranks every finished life")
+    ap.add_argument("--sessions", type=int, default=1000, help="concurrent games for --load")
+    ap.add_argument("--think", type=float, default=0.5, help="mean player think time for --load, seconds")
+    opts = ap.parse_args(args)
+    if opts.serve:
+        users = UserStore(opts.users, opts.scrypt_n)
+        board = Leaderboard(opts.leaderboard) if opts.leaderboard else None
+        sessions = SessionManager(opts.resident, opts.saves, leaderboard=board)
+        server = GameServer(opts.max_sessions, opts.idle_timeout, opts.seed, users, sessions, board, opts.hash_slots)
+        try:
+            asyncio.run(server.serve(opts.host, opts.port))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sessions.shutdown()
+            if board is not None:
+                board.close()
+            users.close()
+        return 0
+    gc.disable()    # the generator's own collection pauses would show up as server latency
+    t0 = time.perf_counter()
+    lat, logins = asyncio.run(run_load(opts.host, opts.port, opts.sessions, opts.think))
+    lat.sort()
+    logins.sort()
+    if not lat:
+        print("No moves completed.")
+        return 1
+    q = lambda xs, f: xs[min(len(xs) - 1, int(f * len(xs)))] * 1e3
+    print("{0} sessions, {1} moves in {2:.1f}s   latency ms: p50 {3:.2f}  p99 {4:.2f}  p99.9 {5:.2f}  max {6:.2f}".format(
+        opts.sessions, len(lat), time.perf_counter() - t0, q(lat, 0.5), q(lat, 0.99), q(lat, 0.999), lat[-1] * 1e3))
+    if logins:
+        print("{0} register/login answers (password hashing)   latency ms: p50 {1:.2f}  p99 {2:.2f}".format(
+            len(logins), q(logins, 0.5), q(logins, 0.99)))
+    return 0
+
+def replay_main(path: str) -> int:
+    """Print every life in a replay file as the player saw its ending."""
+    for i, rec in enumerate(load_replays(path)):
+        log = TextLog()
+        sim = replay_life(rec, sink=log)
+        out = TextOut()
+        out.print("\n##### Life {0} (seed {1}, {2} chapters) #####".format(i + 1, rec.seed, len(rec.choices)))
+        print_ending(out, sim, log)
+        sys.stdout.write(out.drain())
+    return 0
+
+def main(argv: List[str]) -> int:
+    hints = record = profile = users = saves = leaderboard = None
+    # Interactive options (and --pack, for every mode) come first; any other --flag hands over to the batch CLI
+    while len(argv) >= 3 and argv[1] in ("--pack", "--hints", "--record", "--replay", "--profile-out", "--users",
+                                         "--saves", "--leaderboard"):
+        flag, value = argv[1], argv[2]
+        argv = argv[:1] + argv[3:]
+        if flag == "--pack":
+            load_content_pack(value)
+        elif flag == "--replay":
+            return replay_main(value)
+        elif flag == "--hints":
+            hints = PolicyTable.load(value)
+        elif flag == "--profile-out":
+            profile = value
+        elif flag == "--users":
+            users = value
+        elif flag == "--saves":
+            saves = value
+        elif flag == "--leaderboard":
+            leaderboard = value
+        else:
+            record = value
+    if len(argv) >= 2 and argv[1] == "--query":
+        return history_main(argv[1:])
+    if len(argv) >= 2 and argv[1] == "--top":
+        return leaderboard_main(leaderboard, argv[1:])
+    if len(argv) >= 2 and argv[1] == "--bench":
+        return bench_main(argv[2:])
+    if len(argv) >= 2 and argv[1] in ("--serve", "--load"):
+        return server_main(argv[1:])
+    if len(argv) >= 2 and argv[1].startswith("--"):
+        return batch_main(argv[1:])
     if len(argv) >= 2 and argv[1].isdigit():
         seed = int(argv[1])
     else:
         seed = None
-    return play(seed=seed)
+    return play(seed=seed, hints=hints, record=record, profile=profile, users=users, saves=saves,
+                leaderboard=leaderboard)
 
 if __name__ == "__main__":
     raise SystemExit(main(sys.argv))
@@ -0,0 +1,19 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "9001_final_project.py")
+
+def load_game(name: str = "life_restart"):
+    """A fresh copy of the game module (packs and caches are module state, so tests that add eras take their own)."""
+    spec = importlib.util.spec_from_file_location(name, SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module       # dataclasses and pickling look the module up by name
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.fixture(scope="session")
+def game():
+    return load_game()
@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+from conftest import load_game
+
+g = load_game("life_restart_aggregates")
+
+
+def chunks(xs, sizes):
+    out, i = [], 0
+    for n in sizes:
+        out.append(xs[i:i + n])
+        i += n
+    return out + [xs[i:]]
+
+
+def test_merged_moments_equal_one_pass():
+    rng = random.Random(1)
+    xs = [rng.randint(-500, 2000) for _ in range(5000)]
+    whole = g.Moments()
+    for x in xs:
+        whole.add(x)
+    merged = g.Moments()
+    for part in reversed(chunks(xs, [1, 700, 0, 2300])):
+        m = g.Moments()
+        for x in part:
+            m.add(x)
+        merged.merge(m)
+    assert (merged.n, merged.s1, merged.s2) == (whole.n, whole.s1, whole.s2)
+    mean = sum(xs) / len(xs)
+    assert whole.mean == pytest.approx(mean)
+    assert whole.variance == pytest.approx(sum((x - mean) ** 2 for x in xs) / (len(xs) - 1))
+
+
+@pytest.mark.parametrize("max_buckets", [512, 300])
+def test_sketch_merge_and_quantile_error(max_buckets):
+    rng = random.Random(2)
+    xs = [0] * 50 + [rng.lognormvariate(3, 1.5) for _ in range(20000)]
+    rng.shuffle(xs)
+    whole = g.QuantileSketch(0.01, max_buckets)
+    for x in xs:
+        whole.add(x)
+    merged = g.QuantileSketch(0.01, max_buckets)
+    for part in chunks(xs, [3000, 1, 9000, 4000]):
+        sketch = g.QuantileSketch(0.01, max_buckets)
+        for x in part:
+            sketch.add(x)
+        merged.merge(sketch)
+    assert merged.to_json() == whole.to_json()
+    exact = sorted(xs)
+    # once buckets fold, accuracy is only promised above the lowest bucket kept
+    floor = min(whole.buckets) if len(whole.buckets) == max_buckets else float("-inf")
+    checked = 0
+    for q in (0.0, 0.001, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 0.999, 1.0):
+        truth = exact[int(q * (len(xs) - 1))]
+        if truth and g.ceil(g.log(truth) / whole._log_gamma) <= floor:
+            continue
+        checked += 1
+        assert abs(whole.quantile(q) - truth) <= 0.01 * truth + 1e-9, q
+    assert checked >= 6
+
+
+def test_shard_aggregates_merge_to_the_single_pass():
+    lives = 300
+    single = g.run_batch(g.random_policy, lives, None, aggregate=True, root_seed=4).aggregate
+    sharded = g.run_parallel_batch(lives, 4, shard_size=37, aggregate=True).aggregate
+    assert sharded.n_lives == single.n_lives == lives
+    assert sharded.to_json() == single.to_json()
+    backwards = g.LifeAggregate()
+    for start in reversed(range(0, lives, 100)):
+        backwards.merge(g.run_batch(g.random_policy, 100, None, aggregate=True, root_seed=4,
+                                    first_life=start).aggregate)
+    assert backwards.to_json() == single.to_json()
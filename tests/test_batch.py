@@ -0,0 +1,20 @@
+from conftest import load_game
+
+g = load_game("life_restart_batch")
+
+
+def test_results_do_not_depend_on_workers_or_shard_size():
+    runs = [g.run_parallel_batch(700, 11, workers=w, shard_size=s) for w, s in ((1, 700), (1, 64), (2, 100), (3, 333))]
+    first = runs[0].to_json()
+    assert first["n_lives"] == 700
+    for res in runs[1:]:
+        assert res.to_json() == first
+
+
+def test_batch_life_regenerates_every_life_of_a_run():
+    run = g.run_parallel_batch(200, 11, shard_size=64)
+    again = g.BatchResult()
+    for index in range(200):
+        sim = g.batch_life(11, index)
+        again.add_life(sim.ending, sim.stats)
+    assert (again.ending_counts, again.stat_sums) == (run.ending_counts, run.stat_sums)
@@ -0,0 +1,37 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+from conftest import SCRIPT
+
+
+def run_cli(*args):
+    return subprocess.run([sys.executable, SCRIPT] + list(args), capture_output=True, text=True, timeout=60)
+
+
+def test_sweep_rejects_unknown_parameter(tmp_path):
+    spec = tmp_path / "sweep.json"
+    spec.write_text(json.dumps({"grid": {"risk.risk.death": [1, 2]}}))
+    proc = run_cli("--sweep", str(spec), "--lives", "10")
+    assert proc.returncode == 2
+    assert "Unknown sweep parameter 'risk.risk.death'" in proc.stderr
+    assert "Traceback" not in proc.stderr
+
+
+def test_query_rejects_bad_predicates(tmp_path):
+    pytest.importorskip("numpy")
+    store = str(tmp_path / "hist")
+    assert run_cli("--lives", "20", "--seed", "1", "--history", store).returncode == 0
+    for expr, message in (("bogus", "Not a predicate"), ("nope==1", "Unknown history column 'nope'"),
+                          ("age<abc", "expected a number")):
+        proc = run_cli("--query", store, "--where", expr)
+        assert proc.returncode == 2 and message in proc.stderr and "Traceback" not in proc.stderr
+    proc = run_cli("--query", store, "--agg", "score")
+    assert proc.returncode == 2 and "Unknown history column 'score'" in proc.stderr
+
+
+def test_top_needs_a_leaderboard():
+    proc = run_cli("--top", "5")
+    assert proc.returncode == 2 and "--top needs --leaderboard PATH" in proc.stderr
@@ -0,0 +1,79 @@
+import pytest
+
+from conftest import load_game
+
+np = pytest.importorskip("numpy")
+g = load_game("life_restart_endings")
+
+
+@pytest.fixture
+def rules():
+    """Shrink the game so exact enumeration stays fast; restored afterwards."""
+    saved = g.CHAPTER_LIMIT, g.VARIATION_SPREAD, g.TOP_SCORE, g.ACHIEVEMENT_TARGET
+    yield g
+    g.CHAPTER_LIMIT, g.VARIATION_SPREAD, g.TOP_SCORE, g.ACHIEVEMENT_TARGET = saved
+
+
+def lowest_stat_policy(sim):
+    """Reads stats: feed whichever stat is lowest right now."""
+    low = min(g.STATS_KEYS, key=lambda k: getattr(sim.stats, k))
+    return g._argmax(sim.menu, lambda o: o.delta.get(low, 0))
+
+
+def assert_matches_batch(exact, policy_name, lives, seed, birth="poor", era="tang"):
+    assert sum(exact.values()) == pytest.approx(1.0)
+    res = g.run_parallel_batch(lives, seed, shard_size=lives, policy_name=policy_name, birth=birth, era=era)
+    for text in set(exact) | set(res.ending_counts):
+        p = exact.get(text, 0.0)
+        se = max((p * (1 - p) / lives) ** 0.5, 1.0 / lives)
+        assert abs(res.ending_counts.get(text, 0) / lives - p) <= 5 * se, text
+
+
+@pytest.mark.parametrize("policy_name", ["random", "greedy", "lowest_stat"])
+def test_exact_dp_matches_batch_frequencies(rules, policy_name):
+    g.POLICIES["lowest_stat"] = lowest_stat_policy
+    g.CHAPTER_LIMIT, g.VARIATION_SPREAD = 4, 0       # swings, deaths, env triggers and age steps stay random
+    g.ACHIEVEMENT_TARGET, g.TOP_SCORE = 14, 40       # so achievements and the era top ending are in reach
+    exact = g.EndingDP(g.POLICIES[policy_name]).distribution("poor", "tang")
+    assert len(exact) >= 3
+    assert_matches_batch(exact, policy_name, 20000, 7)
+
+
+def test_exact_dp_covers_full_variation(rules):
+    g.CHAPTER_LIMIT = 1
+    exact = g.EndingDP(g.random_policy).distribution("middle", "modern")
+    assert_matches_batch(exact, "random", 20000, 8, birth="middle", era="modern")
+
+
+def test_dp_table_is_shared_and_bounded(rules):
+    g.CHAPTER_LIMIT, g.VARIATION_SPREAD = 3, 0
+    dp = g.EndingDP(g.greedy_policy)
+    first = dp.distribution("rich", "habsburg")
+    size = len(dp.table)
+    assert dp.distribution("rich", "habsburg") == first and len(dp.table) == size
+    with pytest.raises(RuntimeError):
+        g.EndingDP(g.greedy_policy, max_states=5).distribution("rich", "habsburg")
+    with pytest.raises(ValueError):
+        g.EndingDP(g.rift_policy).distribution("rich", "habsburg")
+
+
+def test_story_estimate_takes_a_policy_and_agrees_with_dp(rules):
+    g.CHAPTER_LIMIT, g.VARIATION_SPREAD = 4, 0
+    exact = g.EndingDP(g.greedy_policy).distribution("poor", "tang")
+    est = g.estimate_ending_distribution("poor", "tang", 3000, seed=1, policy=g.greedy_policy)
+    for text in set(exact) | set(est):
+        mean, se = est.get(text, (0.0, 0.0))
+        assert abs(mean - exact.get(text, 0.0)) <= 5 * se + 0.01, text
+    with pytest.raises(ValueError):
+        g.estimate_ending_distribution("poor", "tang", 10, seed=1, policy=lowest_stat_policy)
+
+
+def test_story_cache_keeps_eras_apart(rules):
+    g.TOP_SCORE = 40          # low enough that each era's top ending is reachable
+    story = g.sample_story("rich", "tang", g.random.Random(3))
+    shared = g.EndingEstimator()
+    tang = shared.distribution("rich", "tang", story)
+    modern = shared.distribution("rich", "modern", story)
+    assert modern == g.EndingEstimator().distribution("rich", "modern", story)
+    assert g.ERA_TOP_ENDINGS["modern"] in modern and g.ERA_TOP_ENDINGS["tang"] not in modern
+    assert g.ERA_TOP_ENDINGS["tang"] in tang
@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+from conftest import load_game
+
+g = load_game("life_restart_history")
+np = pytest.importorskip("numpy")
+
+
+class Rows(g.EventSink):
+    """Brute-force copy of what the history store should hold."""
+
+    def __init__(self):
+        self.rows = []
+        self.life = -1
+
+    def life_start(self, sim):
+        self.life += 1
+
+    def turn(self, sim, r):
+        stats = r.env_stats or r.stats
+        self.rows.append({"life": self.life, "chapter": r.chapter, "age": r.age, "era": sim.era,
+                          "wealth": stats.wealth, "ending": r.ending, "template": r.option.template_id})
+
+
+def _write(path, rows, seed, n_lives):
+    writer = g.HistoryWriter(path, chunk_rows=64)
+    try:
+        rng = random.Random(seed)
+        for _ in range(n_lives):
+            g.play_batch_life(g.random_policy, rng, sink=g.TeeSink(writer, rows))
+    finally:
+        writer.close()
+
+
+def test_append_reopen_and_query_match_brute_force(tmp_path):
+    path = str(tmp_path / "hist")
+    rows = Rows()
+    _write(path, rows, 1, 60)
+    _write(path, rows, 2, 40)       # a second writer numbers its lives on from the first
+    data = rows.rows
+    era = data[0]["era"]
+    with g.HistoryStore(path) as store:
+        assert store.n_rows == len(data)
+        assert store.scanned[1] > 1
+        where = [("era", "==", era), ("age", "<", 30)]
+        match = [r for r in data if r["era"] == era and r["age"] < 30]
+        assert store.count(where) == len(match)
+        assert store.lives(where).tolist() == sorted({r["life"] for r in match})
+        agg = store.aggregate("wealth", where)["all"]
+        assert (agg["n"], agg["min"], agg["max"]) == (
+            len(match), min(r["wealth"] for r in match), max(r["wealth"] for r in match))
+        assert agg["mean"] == pytest.approx(sum(r["wealth"] for r in match) / len(match))
+        ended = [r for r in data if r["ending"]]
+        assert store.count([("ending", "!=", 0)]) == len(ended) == 100
+        first_ending = ended[0]["ending"]
+        assert store.lives([("ending", "==", first_ending)]).tolist() == sorted(
+            {r["life"] for r in ended if r["ending"] == first_ending})
+        late = [r for r in data if r["age"] >= 50]
+        early = {}
+        for r in data:
+            if r["age"] < 20:
+                early.setdefault(r["life"], r["chapter"])
+        want = sorted({r["life"] for r in late if r["life"] in early and r["chapter"] > early[r["life"]]})
+        assert want and store.lives([("age", ">=", 50)], after=[("age", "<", 20)]).tolist() == want
+
+
+def test_text_equality_matches_whole_texts(tmp_path):
+    path = str(tmp_path / "hist")
+    rows = Rows()
+    _write(path, rows, 3, 80)
+    with g.HistoryStore(path) as store:
+        text = store.texts[rows.rows[0]["template"]]     # a template is stored with the first text it showed
+        ids = {tid for tid, t in store.texts.items() if t == text}
+        want = sum(1 for r in rows.rows if r["template"] in ids)
+        assert store.count([("template", "~", text)]) == want
+        assert store.count([("template", "==", text)]) == want > 0
+        assert store.count([("template", "!=", text)]) == len(rows.rows) - want
+        assert store.count([("template", "==", "no such text")]) == 0
+
+
+def test_predicate_splits_on_the_first_operator():
+    assert g.parse_history_predicate("age<=30") == ("age", "<=", 30)
+    assert g.parse_history_predicate("age >= -2") == ("age", ">=", -2)
+    assert g.parse_history_predicate("ending~a<b") == ("ending", "~", "a<b")
+    assert g.parse_history_predicate("template==x != y") == ("template", "==", "x != y")
+    assert g.parse_history_predicate("env~=>") == ("env", "~", "=>")
+    with pytest.raises(ValueError):
+        g.parse_history_predicate("age 30")
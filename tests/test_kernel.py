@@ -0,0 +1,31 @@
+import pytest
+
+from conftest import load_game
+
+g = load_game("life_restart_kernel")
+
+LIVES = 8000
+
+
+def _categories(res):
+    out = dict.fromkeys(g.ENDING_CATEGORIES, 0)
+    for ending, c in res.ending_counts.items():
+        out[g.ending_category(ending)] += c
+    return out
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_kernel_agrees_with_scalar_engine_in_distribution(seed):
+    pytest.importorskip("numpy")
+    scalar = g.run_parallel_batch(LIVES, seed, shard_size=LIVES)
+    kernel = g.run_parallel_batch(LIVES, seed, shard_size=LIVES, vectorized=True)
+    assert scalar.n_lives == kernel.n_lives == LIVES
+    # The kernel matches the rules in distribution only, so compare with a wide two-proportion z bound
+    s, k = _categories(scalar), _categories(kernel)
+    for cat in g.ENDING_CATEGORIES:
+        p = (s[cat] + k[cat]) / (2 * LIVES)
+        se = (2 * p * (1 - p) / LIVES) ** 0.5
+        assert abs(s[cat] - k[cat]) / LIVES <= 5 * se + 1e-9, cat
+    assert abs(scalar.mean_score - kernel.mean_score) < 2.0
+    chapters = sum(scalar.age_counts) / LIVES, sum(kernel.age_counts) / LIVES
+    assert abs(chapters[0] - chapters[1]) < 0.05 * chapters[0]
@@ -0,0 +1,43 @@
+import random
+
+from conftest import load_game
+
+g = load_game("life_restart_leaderboard")
+
+
+def test_score_tree_matches_brute_force():
+    rng = random.Random(4)
+    scores = [rng.choice([0, 1, 17, g.LEADERBOARD_SLOTS - 1]) if rng.random() < 0.2 else
+              rng.randrange(g.LEADERBOARD_SLOTS) for _ in range(3000)]
+    built = g.ScoreTree({s: scores[:1500].count(s) for s in set(scores[:1500])})
+    for s in scores[1500:]:
+        built.add(s)
+    assert built.total == len(scores)
+    for probe in [-1, 0, 1, 16, 17, g.LEADERBOARD_SLOTS - 1, g.LEADERBOARD_SLOTS + 50] + scores[:200]:
+        assert built.at_most(probe) == sum(1 for s in scores if s <= probe)
+
+
+def test_standings_match_brute_force_and_survive_reopen(tmp_path):
+    path = str(tmp_path / "board.sqlite")
+    rng = random.Random(9)
+    eras = [k for k, _label in g.ERAS[:3]]
+    rows = [("u{0}".format(i), "rich", rng.choice(eras), rng.choice(["a", "b"]), rng.randrange(0, 1500), 40)
+            for i in range(500)]
+    board = g.Leaderboard(path)
+    board.insert(rows[:300])
+    board.insert(rows[300:])
+    board.close()
+    board = g.Leaderboard(path)
+    try:
+        for value in (0.0, 12.3, 55.5, 149.9, 200.0):
+            s = round(value * g.SCORE_SCALE)
+            for scope, keep in (("all", lambda r: True), ("era:" + eras[1], lambda r: r[2] == eras[1]),
+                                ("ending:b", lambda r: r[3] == "b")):
+                scores = [r[4] for r in rows if keep(r)]
+                assert board.standing(value, scope) == g.Standing(
+                    scope, 1 + sum(x > s for x in scores), len(scores), sum(x < s for x in scores))
+        top = board.top(5, era=eras[0])
+        want = sorted((r for r in rows if r[2] == eras[0]), key=lambda r: -r[4])[:5]
+        assert [e.score for e in top] == [r[4] / g.SCORE_SCALE for r in want]
+    finally:
+        board.close()
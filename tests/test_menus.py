@@ -0,0 +1,69 @@
+import random
+from itertools import permutations
+
+from conftest import load_game
+
+g = load_game("life_restart_menus")
+
+ERA, BAND, AGE = "tang", "young_adult", 20
+
+
+def reference_menus(opts, used, flags):
+    """Exact menu distribution of the pre-incremental draw: shuffle, stable sort by bias, first three."""
+    pool = [o for o in opts if not o.bit & used]
+    dist = {}
+    perms = list(permutations(pool))
+    for perm in perms:
+        menu = tuple(o.template_id for o in sorted(perm, key=lambda o: -g.bias_score(o, flags))[:3])
+        dist[menu] = dist.get(menu, 0) + 1 / len(perms)
+    return dist
+
+
+def chi_square(counts, dist, n):
+    assert set(counts) <= set(dist)
+    return sum((counts.get(m, 0) - n * p) ** 2 / (n * p) for m, p in dist.items())
+
+
+def grow_masks(opts, rng, steps):
+    """(used, flags) masks that only grow, the way a life's do."""
+    tags = sorted({o.tag_mask | o.req_mask for o in opts} - {0})
+    used = flags = 0
+    for _ in range(steps):
+        free = [o for o in opts if not o.bit & used]
+        if len(free) > 5 and rng.random() < 0.5:
+            used |= rng.choice(free).bit
+        else:
+            flags |= rng.choice(tags)
+        yield used, flags
+
+
+def test_incremental_pool_matches_a_rebuilt_one():
+    opts = g.option_catalog().pool_index(ERA, BAND).opts
+    state = g.MenuState()
+    for step, (used, flags) in enumerate(grow_masks(opts, random.Random(3), 8)):
+        pool = state.pool(ERA, BAND, used, flags)
+        fresh = g._MenuPool(pool.index, used, flags)
+        assert pool.score == fresh.score and pool.buckets == fresh.buckets
+        seeded = [o.template_id for o in g.build_option_menu(ERA, BAND, AGE, None, used, flags,
+                                                             random.Random(step), state)]
+        scratch = [o.template_id for o in g.build_option_menu(ERA, BAND, AGE, None, used, flags,
+                                                              random.Random(step))]
+        assert seeded == scratch
+
+
+def test_menu_frequencies_match_the_shuffle_draw():
+    opts = g.option_catalog().pool_index(ERA, BAND).opts
+    state, rng, n = g.MenuState(), random.Random(11), 12000
+    masks = list(grow_masks(opts, random.Random(5), 4))
+    masks = [(0, 0)] + masks[1::2]
+    for used, flags in masks:
+        dist = reference_menus(opts, used, flags)
+        df = len(dist) - 1
+        bound = df + 5 * (2 * df) ** 0.5      # about five standard deviations of a chi-square
+        for menu_state in (state, None):       # incremental, then bucketed from scratch each call
+            counts = {}
+            for _ in range(n):
+                menu = g.build_option_menu(ERA, BAND, AGE, None, used, flags, rng, menu_state)
+                key = tuple(o.template_id for o in menu)
+                counts[key] = counts.get(key, 0) + 1
+            assert chi_square(counts, dist, n) < bound, (used, flags, menu_state)
@@ -0,0 +1,50 @@
+import json
+import os
+import subprocess
+import sys
+
+from conftest import SCRIPT, load_game
+
+PACK = {
+    "name": "norse", "format": 1,
+    "eras": {"viking": {
+        "label": "Viking Age Scandinavia",
+        "flavor": {k: "Viking " + k + "." for k in
+                   ("study", "work", "retire", "risk", "health", "network", "rest", "chores")},
+        "top_ending": "Skalds sing your saga.",
+        "events": {"child": [["You learn the runes.", {"knowledge": 2}]]},
+        "triggers": {"adult": [["A raid goes wrong.", {"wealth": -2}, 3]]},
+    }},
+    "rifts": [["A raven opens a door in the sky.", "other"]],
+}
+
+def write_pack(tmp_path) -> str:
+    path = tmp_path / "norse.json"
+    path.write_text(json.dumps(PACK), encoding="utf-8")
+    return str(path)
+
+def test_pack_compiles_to_cache_and_loads_lazily(tmp_path):
+    game = load_game("life_restart_pack")
+    path, cache = write_pack(tmp_path), str(tmp_path / "cache")
+    pack = game.load_content_pack(path, cache)
+    assert os.path.exists(pack.cache)
+    assert ("viking", "Viking Age Scandinavia") in game.ERAS
+    assert "viking" in game._PENDING_ERAS          # the body is read on first use
+    assert game.load_pack_era("viking")
+    assert game.ENV_TRIGGERS["viking"]["adult"] == [("A raid goes wrong.", {"wealth": -2})]
+    assert game.ERA_TOP_ENDINGS["viking"] == "Skalds sing your saga."
+
+    # a second registration reads the compiled cache, not the pack
+    again = load_game("life_restart_pack2").ContentPack(path, cache)
+    assert again.cache == pack.cache and again._image is None
+    assert again.read_era("viking") == pack.read_era("viking")
+
+def test_pack_flag_leaves_pack_file_alone(tmp_path):
+    path = write_pack(tmp_path)
+    before = open(path, "rb").read()
+    answers = "\n".join(["u", "p", "u", "p", "1", "1", "1"] + ["1"] * 40) + "\n"
+    env = dict(os.environ, LIFE_RESTART_CACHE=str(tmp_path / "cache"))
+    run = subprocess.run([sys.executable, SCRIPT, "--pack", path, "42"], input=answers, text=True,
+                         capture_output=True, env=env, cwd=str(tmp_path), timeout=120)
+    assert run.returncode == 0, run.stderr
+    assert open(path, "rb").read() == before
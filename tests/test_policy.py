@@ -0,0 +1,80 @@
+import re
+
+import pytest
+
+from conftest import load_game
+
+np = pytest.importorskip("numpy")
+g = load_game("life_restart_policy")
+
+
+@pytest.fixture(scope="module")
+def solved():
+    solver = g.PolicySolver("tang")
+    return solver, solver.solve()
+
+
+def test_table_survives_save_and_load(solved, tmp_path):
+    _solver, table = solved
+    path = str(tmp_path / "tang.pol")
+    table.save(path)
+    loaded = g.PolicyTable.load(path)
+    assert loaded.header == table.header and loaded.body == table.body
+    rng = g.random.Random(2)
+    for _ in range(50):
+        sim = g.LifeSimulation(rng.choice(["rich", "middle", "poor"]), "tang", rng=rng)
+        while not sim.done:
+            want = table.best_choice(sim.chapter + 1, sim.age, sim.stats, sim.menu)
+            assert loaded.best_choice(sim.chapter + 1, sim.age, sim.stats, sim.menu) == want
+            sim.step(want if want is not None else g.random_policy(sim))
+
+
+def test_model_value_is_close_to_measured_play(solved, tmp_path):
+    """The table is a heuristic over a simplified model; bound how far its start values drift from play."""
+    _solver, table = solved
+    path = str(tmp_path / "tang.pol")
+    table.save(path)
+    lives = 3000
+    for birth, model in table.header["start_values"].items():
+        res = g.run_parallel_batch(lives, 5, shard_size=lives, birth=birth, era="tang", policy_file=path)
+        played = sum(c for e, c in res.ending_counts.items() if g.ending_category(e) == "achievement") / lives
+        random_play = g.run_parallel_batch(lives, 5, shard_size=lives, birth=birth, era="tang")
+        baseline = sum(c for e, c in random_play.ending_counts.items()
+                       if g.ending_category(e) == "achievement") / lives
+        assert abs(played - model) < 0.2, birth
+        assert played > baseline, birth
+
+
+def test_wide_stages_store_u16_ranks(solved):
+    solver, _table = solved
+    chapter, age = min(solver.q)
+    slots = ["slot{0}".format(i) for i in range(300)]
+    shape = solver.q[(chapter, age)][1].shape[1:]
+    q = np.random.default_rng(0).random((300,) + shape)
+    solver.q[(chapter, age)] = (slots, q)
+    try:
+        table = solver.solve()
+    finally:
+        del solver.values[(1, 0)]
+        solver.q.clear()
+    assert table.header["rank_width"] == 2
+    offset, slot_of = table.stages[(chapter, age)]
+    state = (0,) * len(g.STATS_KEYS)
+    best = int(np.argmax(q[(slice(None),) + state]))
+    assert table.ranks[offset + slot_of[slots[best]]] == 0
+    assert max(table.ranks) == 299
+
+
+def test_hints_are_shown_in_play(solved):
+    _solver, table = solved
+    session = g.GameSession(seed=3, hints=table, users=g.UserStore(scrypt_n=1 << 4))
+    text = session.start()
+    era = 1 + [k for k, _label in g.ERAS].index("tang")
+    for answer in ["u", "p", "u", "p", "1", "1", str(era)]:
+        text = session.feed(answer)
+        while session.pending:
+            text += session.resume(session.pending.run())
+    hint = re.search(r"Hint: option (\d) \(achieve\)", text)
+    assert hint is not None
+    sim = session.sim
+    assert int(hint.group(1)) == table.best_choice(sim.chapter + 1, sim.age, sim.stats, sim.menu) + 1
@@ -0,0 +1,37 @@
+import pytest
+
+from conftest import load_game
+from test_cli import run_cli
+
+g = load_game("life_restart_rare")
+
+
+def test_splitting_agrees_with_plain_monte_carlo():
+    # "richest" ends about 1 middle-born Tang life in 230 under the random policy
+    est = g.run_rare("richest", 200, 10, 7, birth="middle", era="tang")
+    lives = 20000
+    res = g.run_parallel_batch(lives, 5, shard_size=lives, birth="middle", era="tang")
+    p = res.ending_counts.get(est.ending, 0) / lives
+    assert 0.001 < p < 0.02
+    se = (est.stderr ** 2 + p * (1 - p) / lives) ** 0.5
+    assert abs(est.mean - p) <= 4.5 * se
+    lo, hi = est.interval()
+    assert lo < est.mean < hi and len(est.levels) > 1
+
+
+def test_unreachable_score_tier_is_exactly_zero(monkeypatch):
+    assert g.max_alive_score() == pytest.approx(g.score(g.Stats(29, 29, 29, 29, 29)))
+    est = g.run_rare("steady life", 50, 3, 1)
+    assert est.runs == [0.0, 0.0, 0.0] and est.chapters == 0 and "147.9" in est.unreachable
+    assert g.rare_unreachable(g.ERA_TOP_ENDINGS["tang"], "modern") == "only tang lives can end on it"
+    monkeypatch.setattr(g, "ACHIEVEMENT_TARGET", 60)      # stats may now climb past 180 points
+    assert g.rare_unreachable(g.SCORE_ENDINGS[0][1]) is None
+
+
+def test_cli_reports_bad_targets():
+    proc = run_cli("--rare", "no such ending", "--lives", "10")
+    assert proc.returncode == 2 and "no ending matches" in proc.stderr and "Traceback" not in proc.stderr
+    proc = run_cli("--rare", "Ending:", "--lives", "10")
+    assert proc.returncode == 2 and "endings match 'Ending:'" in proc.stderr and "Traceback" not in proc.stderr
+    proc = run_cli("--rare", "steady life", "--lives", "10", "--runs", "2")
+    assert proc.returncode == 0 and "P = 0 exactly" in proc.stdout
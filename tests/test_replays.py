@@ -0,0 +1,33 @@
+from conftest import load_game
+
+g = load_game("life_restart_replays")
+
+
+def test_encode_decode_round_trip():
+    recs = [
+        g.LifeReplay(0, g.content_version(), "rich", "tang", "custom", ()),
+        g.LifeReplay(2 ** 63 - 1, 2 ** 64 - 1, "poor", g.ERAS[-1][0], g.NATIONALITIES[-1][0],
+                     (0, 1, 2, g.RIFT, 2, 1, 0)),      # multi-byte varint, a rift, a partial last byte
+        g.LifeReplay(300, 7, "middle", "habsburg", "custom", (1,) * 131),
+    ]
+    data = g.REPLAY_MAGIC + b"".join(r.encode() for r in recs)
+    assert g.decode_replays(data) == recs
+
+
+def test_recorded_lives_replay_to_the_same_ending(tmp_path):
+    path = str(tmp_path / "lives.rpl")
+    rng = g.random.Random(5)     # the player's choices come from outside the life, as at the keyboard
+    played = []
+    for i in range(40):
+        sim = g.LifeSimulation(g.BIRTHS[i % len(g.BIRTHS)][0], g.ERAS[i % len(g.ERAS)][0],
+                               seed=rng.randrange(1 << 40), sink=g.ReplayRecorder(path))
+        while not sim.done:
+            rift = not sim.is_milestone and rng.random() < 0.05
+            sim.step(g.RIFT if rift else rng.randrange(len(sim.menu)))
+        played.append(sim)
+    recs = g.load_replays(path)
+    assert len(recs) == len(played)
+    assert any(g.RIFT in rec.choices for rec in recs)
+    for rec, sim in zip(recs, played):
+        again = g.replay_life(rec)
+        assert (again.ending, again.stats, again.age, again.chapter) == (sim.ending, sim.stats, sim.age, sim.chapter)
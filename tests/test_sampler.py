@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from conftest import load_game
+
+g = load_game("life_restart_sampler")
+
+
+def frequencies(draw, n):
+    counts = {}
+    for _ in range(n):
+        x = draw()
+        counts[x] = counts.get(x, 0) + 1
+    return counts
+
+
+def assert_fits(counts, weights, n):
+    """Chi-square over the positive-weight items within about five standard deviations; zero weights never drawn."""
+    total = sum(weights.values())
+    assert all(counts.get(x, 0) == 0 for x, w in weights.items() if not w)
+    cells = {x: w / total for x, w in weights.items() if w}
+    assert set(counts) <= set(cells)
+    stat = sum((counts.get(x, 0) - n * p) ** 2 / (n * p) for x, p in cells.items())
+    df = len(cells) - 1
+    assert stat < df + 5 * (2 * df) ** 0.5 + 1
+
+
+@pytest.mark.parametrize("weights", [
+    [5.0, 0.0, 1.0, 3.0, 0.0, 11.0],
+    [0.0, 0.0, 2.0],
+    [0.25] * 4 + [1.0] * 8,        # past SAMPLER_SCAN_LIMIT: used entries are rejected, not scanned
+])
+def test_alias_table_frequencies(weights):
+    items = ["e{0}".format(i) for i in range(len(weights))]
+    sampler = g.WeightedSampler(items, weights, [1 << i for i in range(len(items))])
+    rng, n = random.Random(7), 40000
+    assert_fits(frequencies(lambda: sampler.draw(rng), n), dict(zip(items, weights)), n)
+    used = 1 << (len(items) - 1)
+    left = dict(zip(items[:-1], weights[:-1]))
+    if sum(left.values()):
+        assert_fits(frequencies(lambda: sampler.draw(rng, used), n), left, n)
+    else:
+        assert sampler.draw(rng, used) is None        # only zero-weight entries remain
+
+
+def test_single_key_and_empty_tables():
+    rng = random.Random(1)
+    one = g.WeightedSampler(["only"], [3.0], [1])
+    assert {one.draw(rng) for _ in range(20)} == {"only"}
+    assert one.draw(rng, 1) is None
+    assert g.WeightedSampler(["only"], [0.5]).index(rng) == 0
+    assert g.WeightedSampler([]).draw(rng) is None
+
+
+@pytest.mark.parametrize("weights", [[0.0, 0.0], [1.0, -1.0], [1.0, float("inf")], [float("nan")]])
+def test_rejects_bad_weights(weights):
+    with pytest.raises(ValueError):
+        g.WeightedSampler(range(len(weights)), weights)
+
+
+def test_equal_weights_consume_the_pick_stream():
+    items = list(range(5))
+    a, b = random.Random(3), random.Random(3)
+    sampler = g.WeightedSampler(items, [2.0] * 5)
+    assert [sampler.draw(a) for _ in range(50)] == [g.pick(items, b) for _ in range(50)]
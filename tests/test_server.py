@@ -0,0 +1,98 @@
+import asyncio
+
+from conftest import load_game
+
+g = load_game("life_restart_server")
+
+ROOT = 5
+
+
+async def read_prompt(reader):
+    """Everything up to the next prompt, or to EOF."""
+    out = b""
+    while True:
+        line = await reader.readline()
+        out += line
+        if not line or line.endswith((g.PROMPT_END + "\n").encode("utf-8")):
+            return out.decode("utf-8")
+
+
+async def play(port, name, answers, hold=None):
+    """Play answers in order; with hold, wait for it to be set once the life is under way."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    text = await read_prompt(reader)
+    for i, answer in enumerate(answers):
+        if hold is not None and i == 9:
+            await hold.wait()
+        writer.write((answer + "\n").encode("utf-8"))
+        page = await read_prompt(reader)
+        text += page
+        if not page.endswith(g.PROMPT_END + "\n"):
+            break
+    writer.close()
+    return text
+
+
+def offline(n, answers):
+    """The transcript session n of a ROOT-seeded server writes for these answers."""
+    session = g.GameSession(g.derive_seed(ROOT, n), users=g.UserStore(scrypt_n=1 << 4))
+    text = g._wire(session.start()).decode("utf-8")
+    for answer in answers:
+        if session.done:
+            break
+        out = session.feed(answer)
+        while session.pending:
+            out += session.resume(session.pending.run())
+        text += g._wire(out).decode("utf-8")
+    return text
+
+
+def answers(name):
+    return [name, "p", name, "p", "1", "2", "1"] + [str(1 + i % 3) for i in range(40)]
+
+
+async def scenario():
+    users = g.UserStore(scrypt_n=1 << 4)
+    sessions = g.SessionManager(resident=1)       # the two games keep spilling each other
+    server = g.GameServer(idle_timeout=0.6, root_seed=ROOT, users=users, sessions=sessions)
+    listener = await server.start("127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    try:
+        bob_joined = asyncio.Event()
+        first = asyncio.ensure_future(play(port, "ann", answers("ann"), bob_joined))
+        while "0" not in sessions.live or not sessions.live["0"].resumable:
+            await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(play(port, "bob", answers("bob")))
+        while server.served < 2:
+            await asyncio.sleep(0.01)
+        bob_joined.set()                              # ann's game was spilled to make room for bob's
+        games = await asyncio.gather(first, second)
+
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        await read_prompt(reader)
+        writer.write(b"x" * (g.SERVER_MAX_LINE + 10) + b"\n")
+        too_long = (await reader.read()).decode("utf-8")
+        writer.close()
+
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        await read_prompt(reader)
+        idle = (await asyncio.wait_for(reader.read(), 5)).decode("utf-8")
+        writer.close()
+        while server.active:
+            await asyncio.sleep(0.01)
+        return games, too_long, idle, sessions.spills, sessions.restores
+    finally:
+        listener.close()
+        await listener.wait_closed()
+        server.reaper.cancel()
+        sessions.shutdown()
+        users.close()
+
+
+def test_server_plays_concurrent_sessions_and_drops_bad_clients():
+    games, too_long, idle, spills, restores = asyncio.run(scenario())
+    assert games == [offline(0, answers("ann")), offline(1, answers("bob"))]
+    assert all("Registration successful" in text for text in games)
+    assert spills > 0 and restores > 0
+    assert "Line too long, goodbye." in too_long
+    assert "Idle timeout, goodbye." in idle
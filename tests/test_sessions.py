@@ -0,0 +1,65 @@
+import pytest
+
+from conftest import load_game
+
+g = load_game("life_restart_sessions")
+
+LOGIN = ["u", "p", "u", "p", "1", "1", "1"]
+
+
+@pytest.fixture
+def users():
+    return g.UserStore(scrypt_n=1 << 4)
+
+
+def feed(session, line):
+    text = session.feed(line)
+    while session.pending:
+        text += session.resume(session.pending.run())
+    return text
+
+
+def started(users, seed, **kwargs):
+    session = g.GameSession(seed=seed, users=users, **kwargs)
+    session.start()
+    for answer in LOGIN + ["3", "3"]:
+        feed(session, answer)
+    assert session.resumable
+    return session
+
+
+@pytest.mark.parametrize("seed", [0, 2, 4])
+def test_restored_session_plays_on_identically(users, seed):
+    session = started(users, seed)
+    restored = g.GameSession.restore(session.checkpoint(), users=users)
+    assert restored.prompt == session.prompt and restored.user == "u"
+    n = 0
+    while not session.done:
+        answer = str(1 + n % 3)
+        n += 1
+        assert feed(restored, answer) == feed(session, answer)
+    assert restored.exit_code == session.exit_code == 0
+
+
+def test_restored_session_keeps_recording(users, tmp_path):
+    path = str(tmp_path / "lives.rpl")
+    restored = g.GameSession.restore(started(users, 0, record=path).checkpoint(), users=users)
+    while not restored.done:
+        feed(restored, "1")
+    (rec,) = g.load_replays(path)
+    assert g.replay_life(rec).stats == restored.sim.stats
+
+
+def test_manager_spills_and_parks(users):
+    manager = g.SessionManager(resident=1)
+    first, second = started(users, 0), started(users, 2)
+    manager.add("a", first)
+    manager.add("b", second)
+    assert list(manager.live) == ["b"] and manager.spills == 1
+    back = manager.get("a")
+    assert back is not first and back.prompt == first.prompt and manager.restores == 1
+    manager.close("a")                        # a player leaving mid-life is parked under their name
+    parked = manager.take("u")
+    assert parked is not None and manager.take("u") is None
+    assert g.GameSession.restore(parked, users=users).sim.stats == first.sim.stats
+    manager.shutdown()
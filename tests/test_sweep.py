@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from conftest import load_game
+from test_cli import run_cli
+
+g = load_game("life_restart_sweep")
+
+
+@pytest.mark.parametrize("name, value, message", [
+    ("achievement_target", None, "takes a number, got None"),
+    ("achievement_target", [None], "takes a number, got [None]"),
+    ("env_trigger_prob", True, "takes a number, got True"),
+    ("env_trigger_prob", float("nan"), "takes a number"),
+    ("achievement_target", 12.5, "takes integers"),
+    ("achievement_target", float("inf"), "takes integers"),
+    ("achievement_target", 0, "must lie in [2, 100], got 0"),
+    ("age_step_max", 0, "must lie in [1, 100]"),
+    ("risk.dyn_risk.death", 1.5, "must lie in [0, 1]"),
+    ("birth.poor.health", -10, "must lie in [-9, 90], got -10"),
+])
+def test_normalize_point_rejects_bad_values(name, value, message):
+    with pytest.raises(ValueError) as info:
+        g.normalize_point({name: value})
+    assert message in str(info.value)
+
+
+def test_equal_points_share_a_cache_key():
+    setup = {"root": 1, "policy": "random"}
+    a = g.normalize_point({"achievement_target": 30.0, "env_trigger_prob": 0.5, "birth.rich.wealth": 10})
+    b = g.normalize_point({"env_trigger_prob": 0.5})
+    assert a == b == {"env_trigger_prob": 0.5}
+    assert g.SweepCache.key(a, setup) == g.SweepCache.key(b, setup)
+    assert g.SweepCache.key(a, setup) != g.SweepCache.key(a, dict(setup, root=2))
+    assert g.SweepCache.key(g.normalize_point({"achievement_target": 30}), setup) == g.SweepCache.key({}, setup)
+
+
+def test_cached_points_extend_to_a_fresh_run(tmp_path):
+    points = [{}, {"achievement_target": 20}, {"achievement_target": 20.0}]
+    cache = g.SweepCache(str(tmp_path / "sweep.sqlite"))
+    try:
+        short = g.run_sweep(points, 40, 9, cache=cache)
+        grown = g.run_sweep(points, 100, 9, cache=cache)      # plays lives 40..99 only
+    finally:
+        cache.close()
+    fresh = g.run_sweep(points, 100, 9)
+    for s, a, b in zip(short, grown, fresh):
+        assert a.scores == b.scores and a.ending_counts == b.ending_counts
+        assert a.scores[:40] == s.scores and a.n_lives == 100
+    assert grown[1].scores == grown[2].scores and grown[0].scores != grown[1].scores
+    cache = g.SweepCache(str(tmp_path / "sweep.sqlite"))
+    try:
+        assert [p.scores for p in g.run_sweep(points, 60, 9, cache=cache)] == [p.scores[:60] for p in fresh]
+    finally:
+        cache.close()
+
+
+def test_cli_rejects_malformed_specs(tmp_path):
+    spec = tmp_path / "sweep.json"
+    for body, message in (({"grid": {"achievement_target": [None]}}, "takes a number, got None"),
+                          ({"grid": {"achievement_target": [0]}}, "must lie in [2, 100]"),
+                          ({"grid": {"achievement_target": 25}}, "must be a list"),
+                          ({"random": {"env_trigger_prob": [0.1]}}, "[lo, hi] ranges"),
+                          ([1, 2], "a sweep spec is a JSON object")):
+        spec.write_text(json.dumps(body))
+        proc = run_cli("--sweep", str(spec), "--lives", "10")
+        assert proc.returncode == 2 and message in proc.stderr and "Traceback" not in proc.stderr
@@ -0,0 +1,49 @@
+from conftest import load_game
+from test_cli import run_cli
+
+g = load_game("life_restart_tournament")
+
+ENTRANTS = ["random", "greedy", "study", "cautious"]
+
+
+def report(entries, capsys):
+    g.print_tournament_report(entries, "achieve")
+    return capsys.readouterr().out
+
+
+def test_rankings_do_not_depend_on_workers_or_shard_size(capsys):
+    runs = [g.run_tournament(ENTRANTS, 30, 21, workers=w, shard_size=s) for w, s in ((1, 30), (2, 7), (3, 11))]
+    first = runs[0]
+    assert [e.name for e in first] == ENTRANTS
+    assert all(e.total.n_lives == 30 * len(g.BIRTHS) * len(g.ERAS) for e in first)
+    text = report(first, capsys)
+    for entries in runs[1:]:
+        assert [e.to_json() for e in entries] == [e.to_json() for e in first]
+        assert [e.rank_key("achieve") for e in entries] == [e.rank_key("achieve") for e in first]
+        assert report(entries, capsys) == text
+    again = g.run_tournament(ENTRANTS, 30, 21, workers=2, shard_size=7)
+    assert report(again, capsys) == text
+    assert report(g.run_tournament(ENTRANTS, 30, 22), capsys) != text
+
+
+def test_entrants_share_luck_within_a_start():
+    # life #k of a start plays on one seed for every entrant: a policy that copies
+    # another's choices must reproduce its results exactly
+    g.POLICIES["greedy_copy"] = g.POLICIES["greedy"]
+    try:
+        greedy, copy = g.run_tournament(["greedy", "greedy_copy"], 20, 5)
+    finally:
+        del g.POLICIES["greedy_copy"]
+    assert greedy.to_json() == dict(copy.to_json(), name="greedy")
+
+
+def test_cli_output_does_not_depend_on_workers(tmp_path):
+    outs = []
+    for w in (1, 2):
+        path = str(tmp_path / "t{0}.json".format(w))
+        proc = run_cli("--tournament", "random", "greedy", "study", "--lives", "12", "--shard-size", "5",
+                       "--seed", "4", "--workers", str(w), "--json", path)
+        assert proc.returncode == 0
+        with open(path, encoding="utf-8") as fh:
+            outs.append((proc.stdout, fh.read()))
+    assert outs[0] == outs[1]
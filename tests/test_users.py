@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from conftest import load_game
+
+g = load_game("life_restart_users")
+
+
+def store(**kwargs):
+    users = g.UserStore(scrypt_n=1 << 4, **kwargs)
+    users.hashes = 0
+    slow = users._hash
+
+    def counted(*args):
+        users.hashes += 1
+        return slow(*args)
+    users._hash = counted
+    return users
+
+
+def test_register_and_verify(tmp_path):
+    path = str(tmp_path / "users.sqlite")
+    users = store(path=path)
+    assert users.register("ann", "pw") and not users.register("ann", "other")
+    assert users.verify("ann", "pw") and not users.verify("ann", "PW") and not users.verify("bob", "pw")
+    users.close()
+    reopened = g.UserStore(path, scrypt_n=1 << 5)      # rows keep the cost they were hashed with
+    assert reopened.verify("ann", "pw") and not reopened.verify("ann", "other")
+    reopened.close()
+
+
+def test_login_cache_expires_and_evicts_least_recently_used():
+    users = store(cache_size=2, cache_ttl=0.5)
+    for name in ("a", "b"):
+        users.register(name, "pw")
+    hashed = users.hashes
+    assert users.verify("a", "pw") and users.verify("b", "pw") and users.hashes == hashed
+    assert not users.verify("a", "wrong") and users.hashes == hashed + 1     # a miss still hashes
+    assert users.verify("a", "pw")           # a hit makes a the most recently used
+    users.register("c", "pw")                # so b is the one evicted
+    hashed = users.hashes
+    assert users.verify("a", "pw") and users.verify("c", "pw") and users.hashes == hashed
+    assert users.verify("b", "pw") and users.hashes == hashed + 1
+    time.sleep(0.6)
+    hashed = users.hashes
+    assert users.verify("b", "pw") and users.hashes == hashed + 1
+    users.close()
+
+
+def test_concurrent_registrations_of_one_name():
+    users = store(workers=8)
+    users.exists = lambda name: False         # every thread gets past the check to the INSERT
+    barrier = threading.Barrier(8)
+
+    def register(i):
+        barrier.wait()
+        return users.register("ann", "pw{0}".format(i))
+
+    won = list(users.pool.map(register, range(8)))
+    assert won.count(True) == 1
+    winner = won.index(True)
+    assert [users.verify("ann", "pw{0}".format(i)) for i in range(8)] == [i == winner for i in range(8)]
+    users.close()
+
+
+@pytest.mark.parametrize("password, greeting", [("pw", "Welcome back, ann."), ("nope", "Username already exists.")])
+def test_existing_name_at_register(password, greeting):
+    users = store()
+    users.register("ann", "pw")
+    session = g.GameSession(seed=0, users=users)
+    text = session.start()
+    for line in ["ann", password] + (["ann", "pw"] if password == "pw" else []):
+        text += session.feed(line)
+        while session.pending:
+            text += session.resume(session.pending.run())
+    assert greeting in text
+    assert ("Login successful." in text) == (password == "pw")
+    users.close()